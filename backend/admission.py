@@ -0,0 +1,211 @@
+"""
+Admission control: per-user rate limits, per-user concurrency caps and
+load shedding
+
+Applied by require_auth right after the JWT is verified, before the
+handler touches MongoDB. A user over their token bucket or with too many
+requests in flight gets 429, and the process sheds all authenticated work
+with 503 once it is overloaded. Both carry Retry-After, and are decided
+in memory under one short lock, so rejecting costs microseconds.
+
+Limits are enforced per worker process: with N gunicorn workers (and
+replicas) a user may get up to N times the configured rate and in-flight
+cap in aggregate. That is the price of keeping admission free of any
+network round trip; the per-user cap defaults to half a worker's threads so
+that one user can never occupy a whole worker.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Callable, Dict, Optional
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+
+# Token bucket per user: sustained requests per second, and burst size
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "20"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "40"))
+
+# Requests of one user handled at once by this process (0: no cap). The
+# default leaves at least half of a worker's threads to other users.
+_WORKER_THREADS = int(os.getenv("GUNICORN_THREADS", "4"))
+USER_MAX_IN_FLIGHT = int(
+    os.getenv("USER_MAX_IN_FLIGHT", str(max(1, _WORKER_THREADS // 2)))
+)
+
+# Shed authenticated requests while this process already handles this many
+# (0: off), or when a request waited longer than SHED_MAX_QUEUE_MS between
+# the proxy and the app, per the X-Request-Start header (0: off)
+SHED_MAX_IN_FLIGHT = int(os.getenv("SHED_MAX_IN_FLIGHT", "0"))
+SHED_MAX_QUEUE_MS = float(os.getenv("SHED_MAX_QUEUE_MS", "0"))
+
+# Users whose bucket is remembered; idle ones beyond this are forgotten
+ADMISSION_MAX_USERS = int(os.getenv("ADMISSION_MAX_USERS", "10000"))
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is not admitted.
+
+    Attributes:
+        status: 429 for a user over their limits, 503 when shedding load
+        retry_after: Whole seconds the client should wait
+    """
+
+    def __init__(self, message: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _UserState:
+    __slots__ = ("tokens", "refilled_at", "in_flight")
+
+    def __init__(self, now: float):
+        self.tokens = RATE_LIMIT_BURST
+        self.refilled_at = now
+        self.in_flight = 0
+
+
+def queue_time_ms(
+    header: Optional[str], now: Optional[float] = None
+) -> Optional[float]:
+    """Milliseconds since the proxy received the request, from X-Request-Start.
+
+    Accepts ``t=<epoch>`` or a bare epoch in seconds (nginx ``$msec``),
+    milliseconds or microseconds. Returns None when absent or malformed.
+    """
+    if not header:
+        return None
+    value = header.strip()
+    if value.startswith("t="):
+        value = value[2:]
+    try:
+        start = float(value)
+    except ValueError:
+        return None
+
+    if start > 1e14:  # microseconds
+        start /= 1e6
+    elif start > 1e11:  # milliseconds
+        start /= 1e3
+    return max(((now or time.time()) - start) * 1000, 0.0)
+
+
+class AdmissionController:
+    """Token buckets and in-flight counts of every user in this process."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Start with no users and no requests in flight (also used after fork)."""
+        self._lock = threading.Lock()
+        self._users: "OrderedDict[str, _UserState]" = OrderedDict()
+        self._in_flight = 0
+        self.rate_limited = 0
+        self.concurrency_limited = 0
+        self.shed = 0
+
+    def admit(
+        self, user_id: str, queue_ms: Optional[float] = None
+    ) -> Callable[[], None]:
+        """Admit one request of ``user_id`` or raise AdmissionRejected.
+
+        Args:
+            user_id: Authenticated caller
+            queue_ms: Time the request spent queued before reaching the app
+
+        Returns:
+            A function to call when the request has finished; calls after
+            the first do nothing
+        """
+        if not ADMISSION_ENABLED:
+            return _noop
+
+        if (
+            SHED_MAX_QUEUE_MS > 0
+            and queue_ms is not None
+            and queue_ms > SHED_MAX_QUEUE_MS
+        ):
+            self.shed += 1
+            raise AdmissionRejected("Server is overloaded, retry shortly", 503, 1)
+
+        now = time.monotonic()
+        with self._lock:
+            if SHED_MAX_IN_FLIGHT > 0 and self._in_flight >= SHED_MAX_IN_FLIGHT:
+                self.shed += 1
+                raise AdmissionRejected("Server is overloaded, retry shortly", 503, 1)
+
+            state = self._users.get(user_id)
+            if state is None:
+                state = self._users[user_id] = _UserState(now)
+                self._evict()
+            else:
+                self._users.move_to_end(user_id)
+
+            if USER_MAX_IN_FLIGHT > 0 and state.in_flight >= USER_MAX_IN_FLIGHT:
+                self.concurrency_limited += 1
+                raise AdmissionRejected("Too many concurrent requests", 429, 1)
+
+            state.tokens = min(
+                RATE_LIMIT_BURST,
+                state.tokens + (now - state.refilled_at) * RATE_LIMIT_PER_SECOND,
+            )
+            state.refilled_at = now
+            if state.tokens < 1:
+                self.rate_limited += 1
+                raise AdmissionRejected(
+                    "Rate limit exceeded",
+                    429,
+                    math.ceil((1 - state.tokens) / RATE_LIMIT_PER_SECOND),
+                )
+
+            state.tokens -= 1
+            state.in_flight += 1
+            self._in_flight += 1
+
+        released = False
+
+        def release():
+            nonlocal released
+            with self._lock:
+                if released:
+                    return
+                released = True
+                state.in_flight -= 1
+                self._in_flight -= 1
+
+        return release
+
+    def _evict(self):
+        # Oldest first; users with requests in flight stay
+        excess = len(self._users) - ADMISSION_MAX_USERS
+        if excess <= 0:
+            return
+        for user_id in list(islice(self._users, excess)):
+            if self._users[user_id].in_flight == 0:
+                del self._users[user_id]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "users": len(self._users),
+                "rate_limited": self.rate_limited,
+                "concurrency_limited": self.concurrency_limited,
+                "shed": self.shed,
+            }
+
+
+def _noop():
+    pass
+
+
+# Process-wide controller shared by every request handler
+admission = AdmissionController()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=admission.reset)
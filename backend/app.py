@@ -1,411 +1,501 @@
 import logging
 import os
-import time
 from datetime import datetime
-from typing import Any, Dict
 from functools import wraps
 
-from bson import ObjectId
-from flask import Flask, jsonify, request, send_from_directory
+import click
+from flask import Flask, g, request, send_from_directory
 from flask_cors import CORS
-import jwt
-from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT
-from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 from dotenv import load_dotenv
 load_dotenv()
 
+from admission import AdmissionRejected, admission, queue_time_ms
+from auth import authenticate
+from batch import BATCH_MAX_OPERATIONS
+from database import get_database, wait_for_database
+from library_version import (
+    RevisionConflictError,
+    make_document_etag,
+    make_etag,
+    revisions_from_etags,
+)
+from listing import (
+    InvalidListingError,
+    listing_body,
+    listing_variant,
+    parse_listing_query,
+)
+from metrics import PROMETHEUS_MIMETYPE, instrument_flask, registry
+from projection import REVISION_PROJECTION
+from repository import InvalidResponseIdError, ResponseRepository
+from result_cache import result_cache
+from schema import SCHEMA_VERSION, current_schema_version, migrate
+from suggest import DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS
+from serialization import dumps, json_response, response_row, response_rows
+from startup import STARTUP_RETRY_AFTER_SECONDS, startup
+from streaming import (
+    NDJSON_MIMETYPE,
+    json_array_chunks,
+    ndjson_chunks,
+    wants_ndjson,
+)
+from sync import (
+    InvalidSyncTokenError,
+    decode_sync_token,
+    encode_sync_token,
+)
+from token_cache import token_cache
+from usage import usage_buffer
+
 app = Flask(__name__)
 CORS(app)
+instrument_flask(app)
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
-JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-jwt-secret")
-JWT_ALGORITHM = "HS256"
 
 print("DB URL Loaded:", bool(os.getenv("DATABASE_URL")))
 
 
-def get_db_connection(max_retries: int = 5, base_delay: float = 1.0):
-    """Create a MongoDB database connection with automatic retry logic.
+def get_db_connection():
+    """Return the MongoDB database backed by the process-wide client pool.
+
+    No ping is issued here; connectivity is verified once at startup in
+    the background (see startup.py), so each request pays only for its own
+    queries.
 
-    Args:
-        max_retries: Maximum number of connection attempts
-        base_delay: Base delay between retries (exponential backoff)
-        
     Returns:
         MongoDB database instance
     """
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url:
-        raise ValueError("DATABASE_URL environment variable is required")
-    db_name = os.getenv("MONGODB_DB_NAME", "cannerai_db")
-
-    # MongoDB connection with retry logic
-    for attempt in range(max_retries + 1):
-        try:
-            client = MongoClient(db_url, serverSelectionTimeoutMS=5000)
-            
-            # Test the connection
-            client.admin.command('ping')
-            
-            # Get the database
-            db = client[db_name]
-
-            if attempt > 0:
-                logging.info(
-                    f"✅ MongoDB connection established after {attempt} retries"
-                )
-            return db
-
-        except (ConnectionFailure, ServerSelectionTimeoutError) as e:
-            if attempt == max_retries:
-                logging.error(
-                    f"❌ Failed to connect to MongoDB after {max_retries} attempts: {e}"
-                )
-                raise
-
-            delay = base_delay * (2**attempt)  # Exponential backoff
-            logging.warning(
-                f"⚠️  MongoDB connection attempt {attempt + 1} failed, retrying in {delay}s: {e}"
-            )
-            time.sleep(delay)
+    return get_database()
 
 
-def init_db(max_retries: int = 10):
-    """Initialize the database with required collections and indexes.
+@app.before_request
+def require_ready():
+    """Answer 503 until this process has reached MongoDB (see startup.py).
 
-    Args:
-        max_retries: Maximum number of initialization attempts
+    The server binds before the database is reachable, so autoscaled
+    replicas start taking traffic as soon as their bootstrap completes.
     """
-    for attempt in range(max_retries + 1):
-        try:
-            db = get_db_connection()
-
-            # Ensure canned_responses collection exists
-            if 'canned_responses' not in db.list_collection_names():
-                db.create_collection('canned_responses')
-            
-            # Ensure indexes exist
-            collection = db['canned_responses']
-            
-            # Text index for full-text search
-            try:
-                collection.create_index(
-                    [('title', TEXT), ('content', TEXT)],
-                    name='idx_canned_responses_text_search',
-                    weights={'title': 2, 'content': 1},
-                    default_language='english'
-                )
-            except Exception:
-                pass  # Index might already exist
-            
-            # Other indexes
-            collection.create_index([('tags', ASCENDING)], name='idx_canned_responses_tags', background=True)
-            collection.create_index([('user_id', ASCENDING)], name='idx_canned_responses_user_id', background=True)
-            collection.create_index([('created_at', DESCENDING)], name='idx_canned_responses_created_at', background=True)
-            collection.create_index([('updated_at', DESCENDING)], name='idx_canned_responses_updated_at', background=True)
-
-            if attempt > 0:
-                logging.info(
-                    f"✅ Database initialized (MongoDB) after {attempt} retries"
-                )
-            else:
-                logging.info("✅ Database initialized (MongoDB)")
-            return
-
-        except Exception as e:
-            if attempt == max_retries:
-                logging.error(
-                    f"❌ Failed to initialize database after {max_retries} attempts: {e}"
-                )
-                raise
-
-            delay = 2**attempt  # Exponential backoff
-            logging.warning(
-                f"⚠️  Database initialization attempt {attempt + 1} failed, retrying in {delay}s: {e}"
-            )
-            time.sleep(delay)
+    startup.start()
+    if startup.ready or request.path in ("/api/health", "/metrics") or request.method == "OPTIONS":
+        return None
 
+    response = json_response({"error": "Service is starting, retry shortly"})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(STARTUP_RETRY_AFTER_SECONDS)
+    return response
 
-def dict_from_doc(doc) -> Dict[str, Any]:
-    """Convert a MongoDB document to a dictionary."""
-    tags = doc.get("tags", [])
-    if tags is None:
-        tags = []
 
-    return {
-        "id": str(doc["_id"]),  # ObjectId to string for JSON
-        "title": doc["title"],
-        "content": doc["content"],
-        "tags": tags,
-        "user_id": doc.get("user_id"),
-        "created_at": doc["created_at"].isoformat() if doc.get("created_at") else None,
-        "updated_at": doc["updated_at"].isoformat() if doc.get("updated_at") else None,
-    }
+@app.teardown_request
+def release_admission(exc):
+    """Free the admission slot taken by require_auth, however the request ended.
 
+    A streamed body is only sent after teardown, so its slot is freed when
+    the server closes the response instead, unless the request failed and
+    that response is never sent. Releasing twice is harmless.
+    """
+    release = g.pop("admission_release", None)
+    if release is not None and (exc is not None or not g.pop("admission_streamed", False)):
+        release()
 
-# ==================== JWT Authentication ====================
 
-def verify_jwt(token: str) -> dict:
-    """Verify and decode a JWT token."""
-    try:
-        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        return payload
-    except jwt.ExpiredSignatureError:
-        raise ValueError("Token has expired")
-    except jwt.InvalidTokenError:
-        raise ValueError("Invalid token")
+@app.cli.command("migrate")
+@click.option("--check", is_flag=True, help="Only report whether migrations are pending.")
+def migrate_command(check: bool):
+    """Bring the MongoDB schema to SCHEMA_VERSION (indexes and backfills)."""
+    db = wait_for_database()
+    version = current_schema_version(db)
+    click.echo(f"Schema version {version}, expected {SCHEMA_VERSION}")
+    if check:
+        raise SystemExit(0 if version >= SCHEMA_VERSION else 1)
 
+    applied = migrate(db)
+    click.echo(f"Applied migrations: {', '.join(map(str, applied))}" if applied else "Schema is up to date")
+
+
+# ==================== JWT Authentication ====================
 
 def require_auth(f):
     """Decorator to protect routes with JWT authentication."""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get("Authorization")
-        
-        if not auth_header:
-            return jsonify({"error": "No authorization header"}), 401
-        
         try:
-            # Extract Bearer token
-            token = auth_header.replace("Bearer ", "")
-            payload = verify_jwt(token)
-            
-            # Add user info to request context
-            request.user_id = payload["user_id"]
-            
-            return f(*args, **kwargs)
+            payload = authenticate(request.headers.get("Authorization"))
         except ValueError as e:
-            return jsonify({"error": str(e)}), 401
+            return json_response({"error": str(e)}), 401
+
+        # Add user info to request context
+        request.user_id = payload["user_id"]
+
+        # Per-user limits and load shedding, before any database work; the
+        # slot is freed by release_admission() once the request is over
+        try:
+            g.admission_release = admission.admit(
+                request.user_id, queue_time_ms(request.headers.get("X-Request-Start"))
+            )
+        except AdmissionRejected as e:
+            response = json_response({"error": str(e)}, status=e.status)
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response
+
+        # Called outside the try so a ValueError in the handler is not a 401
+        response = app.make_response(f(*args, **kwargs))
+        if response.is_streamed:
+            # Sent after teardown, so it counts as in flight until closed
+            g.admission_streamed = True
+            response.call_on_close(g.admission_release)
+        return response
     
     return decorated_function
 
 
+def conditional_on_library_version(f):
+    """Decorator adding ETag / If-None-Match support and result caching.
+
+    The ETag is derived from the user's library version, which every write
+    bumps, and for listings showing or sorted by usage also from the usage
+    version, which usage flushes bump. A matching If-None-Match is answered
+    with 304 Not Modified after a single lookup in library_versions, without
+    querying canned_responses. Otherwise the encoded body is served from the
+    in-process result cache when it was produced at the same version,
+    skipping both the query and JSON encoding. The version lookup itself is
+    one MongoDB round trip on every request, cache hits included: writes in
+    other workers must be seen, so it is not held in process. Must be
+    applied below @require_auth.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        user_id = request.user_id
+        ndjson = wants_ndjson(request.accept_mimetypes)
+        variant = listing_variant(request.full_path, ndjson)
+        try:
+            uses_usage = parse_listing_query(request.args, ndjson).uses_usage
+        except InvalidListingError:
+            return f(*args, **kwargs)  # the view answers 400
+
+        # Read the version before the data so a concurrent write can only
+        # make the tag stale-low (forcing a refetch), never hide a change.
+        version = user_responses().library_versions().listing_version(uses_usage)
+        etag = make_etag(user_id, version, variant)
+
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            body = result_cache.get(user_id, variant, version)
+            if body is not None:
+                response = app.response_class(body, mimetype="application/json")
+            else:
+                response = app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                if not response.is_streamed:
+                    result_cache.put(user_id, variant, version, response.get_data())
+
+        response.set_etag(etag)
+        response.vary.add("Accept")
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    return decorated_function
+
+
 # ==================== JWT Verification (Auth handled by FastAPI) ====================
 # Flask only verifies JWT tokens - all auth logic is in FastAPI backend
 
 
 # ==================== Protected Endpoints (Require JWT) ====================
 
-@app.route("/api/templates", methods=["GET"])
-@require_auth
-def get_templates():
-    """Get user-specific canned messages. Protected endpoint."""
-    user_id = request.user_id
-    search = request.args.get("search", "")
+def user_responses() -> ResponseRepository:
+    """The responses of the authenticated user. Use below @require_auth."""
+    return ResponseRepository(get_db_connection(), request.user_id)
 
-    db = get_db_connection()
-    collection = db['canned_responses']
 
-    # Filter by user_id
-    base_query = {'user_id': user_id}
+def list_user_responses(user_id: str):
+    """Shared implementation of GET /api/templates and GET /api/responses.
 
-    if search:
-        try:
-            # Text search with user filter
-            query = {**base_query, '$text': {'$search': search}}
-            cursor = collection.find(query).sort('created_at', DESCENDING)
-            responses = [dict_from_doc(doc) for doc in cursor]
-        except Exception:
-            # Fallback to regex
-            query = {
-                **base_query,
-                '$or': [
-                    {'title': {'$regex': search, '$options': 'i'}},
-                    {'content': {'$regex': search, '$options': 'i'}},
-                    {'tags': {'$regex': search, '$options': 'i'}}
-                ]
-            }
-            cursor = collection.find(query).sort('created_at', DESCENDING)
-            responses = [dict_from_doc(doc) for doc in cursor]
-    else:
-        cursor = collection.find(base_query).sort('created_at', DESCENDING)
-        responses = [dict_from_doc(doc) for doc in cursor]
+    Without ``limit``/``cursor`` the whole library is returned as a JSON
+    array (legacy clients). With either parameter the result is a page
+    ``{"items": [...], "next_cursor": ...}`` ordered by (created_at, _id).
+
+    Unpaginated results can be streamed straight from the cursor, as a JSON
+    array with ``stream=true`` or as NDJSON with ``Accept: application/x-ndjson``.
+
+    ``fields=id,title,tags`` and ``preview=<n>`` are pushed down to MongoDB as
+    a projection; GET /api/responses/<id> still returns full content.
 
-    return jsonify(responses)
+    ``search`` matches any substring of title, content or tags through the
+    trigram index (or whole words with SEARCH_ENGINE=text). ``sort=relevance``
+    returns only the top ``limit`` (default SEARCH_DEFAULT_LIMIT) matches,
+    best first, each with its ``score``; the default is SEARCH_RANKING
+    (``recent``, every match).
+    """
+    try:
+        query = parse_listing_query(request.args, wants_ndjson(request.accept_mimetypes))
+    except InvalidListingError as e:
+        return json_response({"error": str(e)}), 400
+
+    docs, next_cursor = ResponseRepository(get_db_connection(), user_id).listing(query)
+
+    fields = query.fields
+    if query.stream:
+        def serialize(doc):
+            return dumps(response_row(doc, fields))
+
+        if query.ndjson:
+            return app.response_class(ndjson_chunks(docs, serialize), mimetype=NDJSON_MIMETYPE)
+        return app.response_class(json_array_chunks(docs, serialize), mimetype="application/json")
+
+    return json_response(listing_body(response_rows(docs, fields), query, next_cursor))
+
+
+@app.route("/api/templates", methods=["GET"])
+@require_auth
+@conditional_on_library_version
+def get_templates():
+    """Get user-specific canned messages. Protected endpoint."""
+    return list_user_responses(request.user_id)
 
 
 @app.route("/api/responses", methods=["GET"])
 @require_auth
+@conditional_on_library_version
 def get_responses():
     """Get user-specific responses. Protected endpoint."""
-    user_id = request.user_id
-    search = request.args.get("search", "")
+    return list_user_responses(request.user_id)
+
 
-    db = get_db_connection()
-    collection = db['canned_responses']
+@app.route("/api/responses/changes", methods=["GET"])
+@require_auth
+def get_response_changes():
+    """Get responses changed or deleted since a sync token. Protected endpoint.
 
-    # Filter by user_id
-    base_query = {'user_id': user_id}
+    Query params:
+        since: Token from a previous reply; omit for a full snapshot
+    """
+    token = request.args.get("since")
+
+    try:
+        since = decode_sync_token(token) if token else None
+    except InvalidSyncTokenError as e:
+        return json_response({"error": str(e)}), 400
+
+    docs, deleted, full_resync, synced_at = user_responses().changes(since)
+
+    return json_response(
+        {
+            "changes": response_rows(docs),
+            "deleted": deleted,
+            "full_resync": full_resync,
+            "sync_token": encode_sync_token(synced_at),
+        }
+    )
 
-    if search:
-        # MongoDB text search or regex for partial matching
-        try:
-            # Try text search first (faster with index)
-            query = {**base_query, '$text': {'$search': search}}
-            cursor = collection.find(query).sort('created_at', DESCENDING)
-            responses = [dict_from_doc(doc) for doc in cursor]
-        except Exception:
-            # Fallback to regex if text index not available
-            query = {
-                **base_query,
-                '$or': [
-                    {'title': {'$regex': search, '$options': 'i'}},
-                    {'content': {'$regex': search, '$options': 'i'}},
-                    {'tags': {'$regex': search, '$options': 'i'}}
-                ]
-            }
-            cursor = collection.find(query).sort('created_at', DESCENDING)
-            responses = [dict_from_doc(doc) for doc in cursor]
-    else:
-        cursor = collection.find(base_query).sort('created_at', DESCENDING)
-        responses = [dict_from_doc(doc) for doc in cursor]
 
-    return jsonify(responses)
+@app.route("/api/responses/suggest", methods=["GET"])
+@require_auth
+def suggest_responses():
+    """Autocomplete responses by title, tag or content prefix. Protected endpoint.
+
+    Query params:
+        prefix: Text typed so far
+        limit: Maximum number of suggestions (default 5, max 20)
+    """
+    prefix = request.args.get("prefix", "")
+
+    try:
+        limit = int(request.args.get("limit", DEFAULT_SUGGESTIONS))
+    except ValueError:
+        return json_response({"error": "limit must be a positive integer"}), 400
+    if limit < 1:
+        return json_response({"error": "limit must be a positive integer"}), 400
+
+    index = user_responses().suggest_index()
+    return json_response(index.search(prefix, min(limit, MAX_SUGGESTIONS)))
 
 
 @app.route("/api/responses/<response_id>", methods=["GET"])
 @require_auth
 def get_response(response_id: str):
-    """Get a single response by ID. Protected endpoint."""
-    user_id = request.user_id
-    db = get_db_connection()
-    collection = db['canned_responses']
+    """Get a single response by ID. Protected endpoint.
 
+    The ETag is the document revision; send it back as If-Match on PATCH.
+    """
+    repository = user_responses()
     try:
-        doc = collection.find_one({'_id': ObjectId(response_id), 'user_id': user_id})
-    except Exception:
-        return jsonify({"error": "Invalid response ID"}), 400
+        if request.if_none_match:
+            # Revalidation only needs the revision; the body is loaded for a 200
+            current = repository.get(response_id, REVISION_PROJECTION)
+            if current and request.if_none_match.contains(make_document_etag(current)):
+                response = app.response_class(status=304)
+                response.set_etag(make_document_etag(current))
+                response.headers["Cache-Control"] = "private, no-cache"
+                return response
+        doc = repository.get(response_id)
+    except InvalidResponseIdError as e:
+        return json_response({"error": str(e)}), 400
 
     if not doc:
-        return jsonify({"error": "Response not found"}), 404
+        return json_response({"error": "Response not found"}), 404
 
-    return jsonify(dict_from_doc(doc))
+    etag = make_document_etag(doc)
+    response = json_response(response_row(doc))
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
 
 
 @app.route("/api/responses", methods=["POST"])
 @require_auth
 def create_response():
     """Create a new response. Protected endpoint."""
-    user_id = request.user_id
     data = request.get_json()
 
     if not data or "title" not in data or "content" not in data:
-        return jsonify({"error": "Title and content are required"}), 400
-
-    title = data["title"]
-    content = data["content"]
-    tags = data.get("tags", [])
-
-    db = get_db_connection()
-    collection = db['canned_responses']
-
-    now = datetime.utcnow()
-    doc = {
-        'title': title,
-        'content': content,
-        'tags': tags,
-        'user_id': user_id,
-        'created_at': now,
-        'updated_at': now
-    }
-    
-    result = collection.insert_one(doc)
-    doc['_id'] = result.inserted_id
+        return json_response({"error": "Title and content are required"}), 400
+
+    doc = user_responses().create(data["title"], data["content"], data.get("tags", []))
+
+    response = json_response(response_row(doc), status=201)
+    response.set_etag(make_document_etag(doc))
+    return response
+
 
-    return jsonify(dict_from_doc(doc)), 201
+@app.route("/api/responses/batch", methods=["POST"])
+@require_auth
+def batch_responses():
+    """Create, update and delete many responses at once. Protected endpoint.
+
+    Request: { "ordered": true, "operations": [
+        { "op": "create", "title": "...", "content": "...", "tags": [] },
+        { "op": "update", "id": "...", "title": "..." },
+        { "op": "delete", "id": "..." } ] }
+    Response: { "results": [ { "index": 0, "op": "create", "status": 201, "response": {...} }, ... ] }
+    """
+    data = request.get_json()
+
+    if not data or not isinstance(data.get("operations"), list):
+        return json_response({"error": "operations must be a list"}), 400
+
+    operations = data["operations"]
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return json_response({"error": f"At most {BATCH_MAX_OPERATIONS} operations per batch"}), 400
+
+    results = user_responses().apply_batch(operations, ordered=bool(data.get("ordered", True)))
+    for result in results:
+        if result.get("response") is not None:
+            result["response"] = response_row(result["response"])
+
+    return json_response({"results": results})
 
 
 @app.route("/api/responses/<response_id>", methods=["PATCH"])
 @require_auth
 def update_response(response_id: str):
     """Update an existing response (partial update). Protected endpoint."""
-    user_id = request.user_id
     data = request.get_json()
 
     if not data:
-        return jsonify({"error": "No data provided"}), 400
+        return json_response({"error": "No data provided"}), 400
 
-    db = get_db_connection()
-    collection = db['canned_responses']
+    # When If-Match is sent, the client's revision is checked in the same
+    # round trip as the write
+    revisions = None
+    if request.if_match and not request.if_match.star_tag:
+        revisions = revisions_from_etags(request.if_match, response_id)
 
     try:
-        object_id = ObjectId(response_id)
-    except Exception:
-        return jsonify({"error": "Invalid response ID"}), 400
-
-    # Check if response exists and belongs to user
-    existing = collection.find_one({'_id': object_id, 'user_id': user_id})
-    
-    if not existing:
-        return jsonify({"error": "Response not found"}), 404
+        doc = user_responses().update(response_id, data, revisions)
+    except InvalidResponseIdError as e:
+        return json_response({"error": str(e)}), 400
+    except RevisionConflictError:
+        return json_response({"error": "Response was modified by another request"}), 412
 
-    # Build update document
-    update_fields = {'updated_at': datetime.utcnow()}
+    if doc is None:
+        return json_response({"error": "Response not found"}), 404
 
-    if "title" in data:
-        update_fields['title'] = data["title"]
+    response = json_response(response_row(doc))
+    response.set_etag(make_document_etag(doc))
+    return response
 
-    if "content" in data:
-        update_fields['content'] = data["content"]
 
-    if "tags" in data:
-        update_fields['tags'] = data["tags"]
+@app.route("/api/responses/<response_id>/use", methods=["POST"])
+@require_auth
+def use_response(response_id: str):
+    """Count one use of a response, e.g. an insertion by the extension. Protected endpoint.
 
-    # Update the document
-    collection.update_one(
-        {'_id': object_id},
-        {'$set': update_fields}
-    )
-    
-    # Fetch updated document
-    doc = collection.find_one({'_id': object_id})
+    Answers 202 at once: uses are buffered in this process and written in
+    bulk every few seconds (see usage.py), so usage_count and
+    sort=most_used catch up shortly after. Unknown ids are not reported.
+    """
+    try:
+        user_responses().record_use(response_id)
+    except InvalidResponseIdError as e:
+        return json_response({"error": str(e)}), 400
 
-    return jsonify(dict_from_doc(doc))
+    return "", 202
 
 
 @app.route("/api/responses/<response_id>", methods=["DELETE"])
 @require_auth
 def delete_response(response_id: str):
     """Delete a response. Protected endpoint."""
-    user_id = request.user_id
-    db = get_db_connection()
-    collection = db['canned_responses']
-
     try:
-        object_id = ObjectId(response_id)
-    except Exception:
-        return jsonify({"error": "Invalid response ID"}), 400
+        deleted = user_responses().delete(response_id)
+    except InvalidResponseIdError as e:
+        return json_response({"error": str(e)}), 400
 
-    result = collection.delete_one({'_id': object_id, 'user_id': user_id})
-    
-    if result.deleted_count == 0:
-        return jsonify({"error": "Response not found"}), 404
+    if not deleted:
+        return json_response({"error": "Response not found"}), 404
 
     return "", 204
 
 
 @app.route("/api/health", methods=["GET"])
 def health_check():
-    """Health check endpoint with database connectivity test."""
+    """Health check endpoint with database connectivity test.
+
+    Reports ``ready: false`` (503) while the startup bootstrap is pending.
+    """
+    if not startup.ready:
+        return (
+            json_response(
+                {
+                    "status": "starting",
+                    "ready": False,
+                    "timestamp": datetime.now().isoformat(),
+                    "database": "MongoDB",
+                    "startup": startup.stats(),
+                }
+            ),
+            503,
+        )
+
     try:
         # Test database connection
-        db = get_db_connection(max_retries=1)  # Quick test, don't wait long
+        db = get_db_connection()
         db.command('ping')
 
-        return jsonify(
+        return json_response(
             {
                 "status": "healthy",
+                "ready": True,
                 "timestamp": datetime.now().isoformat(),
                 "database": "MongoDB",
                 "database_connected": True,
+                "startup": startup.stats(),
+                "result_cache": result_cache.stats(),
+                "auth_cache": token_cache.stats(),
+                "usage": usage_buffer.stats(),
+                "admission": admission.stats(),
             }
         )
     except Exception as e:
         return (
-            jsonify(
+            json_response(
                 {
                     "status": "unhealthy",
+                    "ready": True,
                     "timestamp": datetime.now().isoformat(),
                     "database": "MongoDB",
                     "database_connected": False,
@@ -416,6 +506,27 @@ def health_check():
         )
 
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Request and MongoDB command metrics of this process, for Prometheus."""
+    return app.response_class(registry.render(), content_type=PROMETHEUS_MIMETYPE)
+
+
+def create_app(start: bool = True) -> Flask:
+    """Return the Flask app, ready to bind.
+
+    Entry point for WSGI servers (see wsgi.py and gunicorn.conf.py). The
+    database bootstrap runs in the background (see startup.py), so this
+    returns immediately; requests get 503 until the process is ready.
+
+    Args:
+        start: Begin the bootstrap now rather than on the first request
+    """
+    if start:
+        startup.start()
+    return app
+
+
 if __name__ == "__main__":
     # Configure logging
     logging.basicConfig(
@@ -431,12 +542,15 @@ if __name__ == "__main__":
     logging.info(f"🔧 Database: {db_name}")
 
     try:
-        # Initialize database with retry logic
+        # Database bootstrap continues in the background
         logging.info("🔄 Initializing database...")
-        init_db()
+        create_app()
 
-        logging.info("🚀 Starting Flask server on http://0.0.0.0:5000")
-        app.run(debug=True, host="0.0.0.0", port=5000)
+        # Development server only; see wsgi.py for production serving.
+        # The debugger follows FLASK_DEBUG.
+        port = int(os.getenv("PORT", "5000"))
+        logging.info(f"🚀 Starting Flask development server on http://0.0.0.0:{port}")
+        app.run(host="0.0.0.0", port=port)
 
     except Exception as e:
         logging.error(f"❌ Failed to start application: {e}")
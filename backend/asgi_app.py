@@ -0,0 +1,371 @@
+"""
+Async (ASGI) variant of the read API, built on Starlette and Motor
+
+Serves the hot read paths of app.py, plus the extension code exchange,
+without blocking a worker thread on each MongoDB round trip:
+
+    GET  /api/responses, GET /api/templates
+    GET  /api/health, GET /metrics (MongoDB command metrics only)
+    POST /auth/extension/exchange-code
+
+Query parsing (listing.py), search (search.py), serialization, ETags,
+the result cache and JWT verification are shared with the Flask app, so
+both return identical bodies and ETags.
+
+This is not a complete API: writes, single responses, /suggest, /changes
+and /batch are only served by app.py. Run it next to the Flask app, behind
+a proxy that sends the routes above here and every other route to Flask.
+
+Run with (requires requirements-async.txt):
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5001 --workers 4
+"""
+
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Any
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from admission import AdmissionRejected, admission, queue_time_ms
+from auth import JWT_EXPIRATION_HOURS, authenticate, generate_jwt
+from auth_codes import create_async_auth_code_store
+from database import client_options, close_client, database_name
+from library_version import get_library_versions_async, make_etag
+from listing import (
+    InvalidListingError,
+    listing_body,
+    listing_variant,
+    parse_listing_query,
+)
+from metrics import PROMETHEUS_MIMETYPE, registry
+from motor.motor_asyncio import AsyncIOMotorClient
+from repository import FindSpec, ResponseRepository
+from result_cache import result_cache
+from search import ranked_search_async, run_search_async
+from serialization import JSON_MIMETYPE, dumps, response_row, response_rows
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from startup import STARTUP_RETRY_AFTER_SECONDS, startup
+from streaming import (
+    NDJSON_MIMETYPE,
+    json_array_chunks_async,
+    ndjson_chunks_async,
+    prime_cursor_async,
+    wants_ndjson,
+)
+from token_cache import token_cache
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header, parse_etags, quote_etag
+
+
+def json_body(obj: Any, status: int = 200) -> Response:
+    """Build a response whose body is ``obj`` encoded with dumps()."""
+    return Response(dumps(obj), status_code=status, media_type=JSON_MIMETYPE)
+
+
+def _wants_ndjson(request: Request) -> bool:
+    return wants_ndjson(parse_accept_header(request.headers.get("accept"), MIMEAccept))
+
+
+def _full_path(request: Request) -> str:
+    # Same form as Flask's request.full_path, so ETags match across both apps
+    return f"{request.url.path}?{request.url.query}"
+
+
+class ReadinessMiddleware:
+    """Answer 503 until this process has reached MongoDB (see startup.py)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] == "http"
+            and not startup.ready
+            and scope["path"] not in ("/api/health", "/metrics")
+            and scope["method"] != "OPTIONS"
+        ):
+            response = json_body({"error": "Service is starting, retry shortly"}, 503)
+            response.headers["Retry-After"] = str(STARTUP_RETRY_AFTER_SECONDS)
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+def require_auth(handler):
+    """Async counterpart of app.require_auth; sets ``request.state.user_id``."""
+
+    @wraps(handler)
+    async def decorated_function(request: Request):
+        try:
+            payload = authenticate(request.headers.get("authorization"))
+        except ValueError as e:
+            return json_body({"error": str(e)}, 401)
+
+        request.state.user_id = payload["user_id"]
+        try:
+            release = admission.admit(
+                request.state.user_id,
+                queue_time_ms(request.headers.get("x-request-start")),
+            )
+        except AdmissionRejected as e:
+            response = json_body({"error": str(e)}, e.status)
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response
+
+        # A streamed body is sent after this returns, so it is not counted
+        try:
+            return await handler(request)
+        finally:
+            release()
+
+    return decorated_function
+
+
+def conditional_on_library_version(handler):
+    """Async counterpart of app.conditional_on_library_version."""
+
+    @wraps(handler)
+    async def decorated_function(request: Request):
+        user_id = request.state.user_id
+        ndjson = _wants_ndjson(request)
+        variant = listing_variant(_full_path(request), ndjson)
+        try:
+            uses_usage = parse_listing_query(request.query_params, ndjson).uses_usage
+        except InvalidListingError:
+            return await handler(request)  # answered with 400
+
+        versions = await get_library_versions_async(request.app.state.db, user_id)
+        version = versions.listing_version(uses_usage)
+        etag = make_etag(user_id, version, variant)
+
+        if parse_etags(request.headers.get("if-none-match")).contains(etag):
+            response = Response(status_code=304)
+        else:
+            body = result_cache.get(user_id, variant, version)
+            if body is not None:
+                response = Response(body, media_type=JSON_MIMETYPE)
+            else:
+                response = await handler(request)
+                if response.status_code != 200:
+                    return response
+                if not isinstance(response, StreamingResponse):
+                    result_cache.put(user_id, variant, version, response.body)
+
+        response.headers["ETag"] = quote_etag(etag)
+        response.headers["Vary"] = "Accept"
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    return decorated_function
+
+
+async def find_user_responses(repository: ResponseRepository, spec: FindSpec):
+    """Async ResponseRepository.find(): run ``spec`` on Motor as a page, a full list or a stream."""
+    found = spec.cursor(repository.collection)
+    if spec.stream:
+        return await prime_cursor_async(found), None
+    return spec.result(await found.to_list(None))
+
+
+async def list_user_responses(request: Request) -> Response:
+    """Shared implementation of GET /api/templates and GET /api/responses.
+
+    Same parameters and output as app.list_user_responses().
+    """
+    try:
+        query = parse_listing_query(request.query_params, _wants_ndjson(request))
+    except InvalidListingError as e:
+        return json_body({"error": str(e)}, 400)
+
+    # Queries are built, and scoped to the user, by the repository
+    repository = ResponseRepository(request.app.state.db, request.state.user_id)
+
+    async def find(clause):
+        return await find_user_responses(
+            repository, repository.listing_spec(query, clause)
+        )
+
+    if query.relevance:
+        docs = await ranked_search_async(
+            repository.collection,
+            repository.scoped(),
+            query.search,
+            query.top_k,
+            query.projection,
+            query.preview,
+        )
+        next_cursor = None
+    elif query.has_search:
+        docs, next_cursor = await run_search_async(query.search, find)
+    else:
+        docs, next_cursor = await find(None)
+
+    fields = query.fields
+    if query.stream:
+
+        def serialize(doc):
+            return dumps(response_row(doc, fields))
+
+        if query.ndjson:
+            return StreamingResponse(
+                ndjson_chunks_async(docs, serialize), media_type=NDJSON_MIMETYPE
+            )
+        return StreamingResponse(
+            json_array_chunks_async(docs, serialize), media_type=JSON_MIMETYPE
+        )
+
+    return json_body(listing_body(response_rows(docs, fields), query, next_cursor))
+
+
+@require_auth
+@conditional_on_library_version
+async def get_templates(request: Request) -> Response:
+    """Get user-specific canned messages. Protected endpoint."""
+    return await list_user_responses(request)
+
+
+@require_auth
+@conditional_on_library_version
+async def get_responses(request: Request) -> Response:
+    """Get user-specific responses. Protected endpoint."""
+    return await list_user_responses(request)
+
+
+async def exchange_extension_code(request: Request) -> Response:
+    """Exchange a single-use authorization code for a JWT.
+
+    Request: { "auth_code": "abc123..." }
+    Response: { "jwt_token": "eyJ...", "user_id": "123", "expires_in": 86400 }
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+
+    auth_code = data.get("auth_code") if isinstance(data, dict) else None
+    if not auth_code:
+        return json_body({"error": "auth_code is required"}, 400)
+
+    code_data = await request.app.state.auth_codes.consume(auth_code)
+    if not code_data:
+        return json_body(
+            {"error": "Invalid, expired or already used authorization code"}, 401
+        )
+    if code_data.expired:
+        return json_body({"error": "Authorization code has expired"}, 401)
+
+    return json_body(
+        {
+            "jwt_token": generate_jwt(code_data.user_id),
+            "user_id": code_data.user_id,
+            "expires_in": JWT_EXPIRATION_HOURS * 3600,  # seconds
+        }
+    )
+
+
+async def health_check(request: Request) -> Response:
+    """Health check endpoint with database connectivity test."""
+    if not startup.ready:
+        return json_body(
+            {
+                "status": "starting",
+                "ready": False,
+                "timestamp": datetime.now().isoformat(),
+                "database": "MongoDB",
+                "startup": startup.stats(),
+            },
+            503,
+        )
+
+    try:
+        await request.app.state.db.command("ping")
+
+        return json_body(
+            {
+                "status": "healthy",
+                "ready": True,
+                "timestamp": datetime.now().isoformat(),
+                "database": "MongoDB",
+                "database_connected": True,
+                "startup": startup.stats(),
+                "result_cache": result_cache.stats(),
+                "auth_cache": token_cache.stats(),
+                "admission": admission.stats(),
+            }
+        )
+    except Exception as e:
+        return json_body(
+            {
+                "status": "unhealthy",
+                "ready": True,
+                "timestamp": datetime.now().isoformat(),
+                "database": "MongoDB",
+                "database_connected": False,
+                "error": str(e),
+            },
+            503,
+        )
+
+
+async def metrics(request: Request) -> Response:
+    """MongoDB command metrics of this process, for Prometheus."""
+    return Response(registry.render(), media_type=PROMETHEUS_MIMETYPE)
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    """Create this process's Motor client and start the database bootstrap.
+
+    The bootstrap (connectivity and schema check, see startup.py) uses the
+    sync driver on a background thread, exactly as the Flask app does, so
+    the server binds without waiting for MongoDB.
+    """
+    db_url = os.getenv("DATABASE_URL")
+    if not db_url:
+        raise ValueError("DATABASE_URL environment variable is required")
+
+    startup.start()
+
+    client = AsyncIOMotorClient(db_url, **client_options())
+    app.state.db = client[database_name()]
+    app.state.auth_codes = create_async_auth_code_store(lambda: app.state.db)
+    logging.info("✅ ASGI app created its MongoDB client")
+    try:
+        yield
+    finally:
+        client.close()
+        close_client()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/templates", get_templates, methods=["GET"]),
+        Route("/api/responses", get_responses, methods=["GET"]),
+        Route(
+            "/auth/extension/exchange-code", exchange_extension_code, methods=["POST"]
+        ),
+        Route("/api/health", health_check, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+    ],
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_methods=["*"],
+            allow_headers=["*"],
+        ),
+        Middleware(ReadinessMiddleware),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,62 @@
+"""
+JWT issuing and verification shared by the Flask app and the ASGI app
+
+Auth logic (login, sessions) lives in the FastAPI backend; this service only
+verifies the JWTs it issues, plus the extension code exchange.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+import jwt
+from token_cache import token_cache
+
+JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "dev-jwt-secret")
+JWT_ALGORITHM = "HS256"
+JWT_EXPIRATION_HOURS = 24
+
+
+def generate_jwt(user_id: str) -> str:
+    """Generate a JWT token for the user."""
+    payload = {
+        "user_id": user_id,
+        "exp": datetime.utcnow() + timedelta(hours=JWT_EXPIRATION_HOURS),
+        "iat": datetime.utcnow(),
+    }
+    return jwt.encode(payload, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+
+
+def _decode_jwt(token: str) -> dict:
+    """Verify the signature and expiry of a JWT and return its payload."""
+    try:
+        payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
+        return payload
+    except jwt.ExpiredSignatureError:
+        raise ValueError("Token has expired")
+    except jwt.InvalidTokenError:
+        raise ValueError("Invalid token")
+
+
+def verify_jwt(token: str) -> dict:
+    """Verify and decode a JWT token.
+
+    Verified tokens are cached until their ``exp``, so repeat requests with
+    the same token skip signature checking; see token_cache.py.
+    """
+    return token_cache.verify(token, _decode_jwt)
+
+
+def authenticate(auth_header: Optional[str]) -> dict:
+    """Verify the ``Authorization: Bearer <token>`` header of a request.
+
+    Raises:
+        ValueError: With a client-facing message if the header is missing
+            or the token is invalid, expired or revoked
+    """
+    if not auth_header:
+        raise ValueError("No authorization header")
+
+    # Extract Bearer token
+    token = auth_header.replace("Bearer ", "")
+    return verify_jwt(token)
@@ -0,0 +1,251 @@
+"""
+Short-lived, single-use extension auth codes behind a pluggable store
+
+The in-memory store suits a single process; the MongoDB store lets any
+worker or node exchange a code issued by another one.
+"""
+
+import hashlib
+import heapq
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from pymongo import ASCENDING
+
+AUTH_CODE_TTL_SECONDS = int(os.getenv("AUTH_CODE_TTL_SECONDS", "600"))
+# "mongo" (shared between processes) or "memory" (single process only)
+AUTH_CODE_STORE = os.getenv("AUTH_CODE_STORE", "mongo")
+
+AUTH_CODES_COLLECTION = "extension_auth_codes"
+
+# Documents are removed by MongoDB's TTL monitor once expires_at has passed
+_TTL_INDEX_KEYS = [("expires_at", ASCENDING)]
+_TTL_INDEX_OPTIONS = {"name": "idx_extension_auth_codes_ttl", "expireAfterSeconds": 0}
+
+
+class AuthCode(NamedTuple):
+    """A consumed auth code."""
+
+    user_id: str
+    expires_at: datetime
+
+    @property
+    def expired(self) -> bool:
+        return datetime.utcnow() >= self.expires_at
+
+
+def _code_key(code: str) -> str:
+    # Codes are bearer secrets; only their hash is stored
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+def _code_document(code: str, user_id: str, ttl_seconds: int) -> dict:
+    now = datetime.utcnow()
+    return {
+        "_id": _code_key(code),
+        "user_id": user_id,
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=ttl_seconds),
+    }
+
+
+class AuthCodeStore(ABC):
+    """Interface of an auth-code store."""
+
+    @abstractmethod
+    def put(self, code: str, user_id: str, ttl_seconds: int = AUTH_CODE_TTL_SECONDS):
+        """Store ``code`` for ``user_id`` until it expires."""
+
+    @abstractmethod
+    def consume(self, code: str) -> Optional[AuthCode]:
+        """Atomically remove ``code`` and return it.
+
+        Returns:
+            The code, possibly expired, or None if it is unknown or was
+            already consumed. At most one concurrent caller gets it.
+        """
+
+
+class AsyncAuthCodeStore(ABC):
+    """Interface of an auth-code store for the ASGI app.
+
+    The awaitable counterpart of AuthCodeStore, with the same semantics.
+    """
+
+    @abstractmethod
+    async def put(
+        self, code: str, user_id: str, ttl_seconds: int = AUTH_CODE_TTL_SECONDS
+    ):
+        """Store ``code`` for ``user_id`` until it expires."""
+
+    @abstractmethod
+    async def consume(self, code: str) -> Optional[AuthCode]:
+        """Atomically remove ``code`` and return it (see AuthCodeStore.consume)."""
+
+
+class MemoryAuthCodeStore(AuthCodeStore):
+    """Process-local store; expired codes are dropped from a min-heap.
+
+    Each put() and consume() first pops the codes whose expiry has passed,
+    costing O(log n) per expired code instead of scanning every code.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        # key -> (user_id, expires_at as wall time, deadline on clock)
+        self._codes: Dict[str, Tuple[str, datetime, float]] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def put(self, code: str, user_id: str, ttl_seconds: int = AUTH_CODE_TTL_SECONDS):
+        key = _code_key(code)
+        deadline = self._clock() + ttl_seconds
+        with self._lock:
+            self._purge_expired()
+            self._codes[key] = (
+                user_id,
+                datetime.utcnow() + timedelta(seconds=ttl_seconds),
+                deadline,
+            )
+            heapq.heappush(self._expiry_heap, (deadline, key))
+
+    def consume(self, code: str) -> Optional[AuthCode]:
+        with self._lock:
+            self._purge_expired()
+            entry = self._codes.pop(_code_key(code), None)
+        if entry is None:
+            return None
+        return AuthCode(entry[0], entry[1])
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def _purge_expired(self):
+        now = self._clock()
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            deadline, key = heapq.heappop(heap)
+            entry = self._codes.get(key)
+            # Skip heap entries for codes consumed or re-issued since
+            if entry is not None and entry[2] == deadline:
+                del self._codes[key]
+
+
+class MongoAuthCodeStore(AuthCodeStore):
+    """Store shared by every process, in a TTL-indexed MongoDB collection.
+
+    consume() is a single find_one_and_delete, so a code can be exchanged
+    once across all workers. The TTL monitor removes expired codes in the
+    background (roughly once a minute), so consume() still reports expiry
+    itself via AuthCode.expired.
+    """
+
+    def __init__(self, get_db: Callable[[], object]):
+        self._get_db = get_db
+        self._indexed = False
+
+    def _collection(self):
+        return self._get_db()[AUTH_CODES_COLLECTION]
+
+    def ensure_indexes(self):
+        """Create the TTL index that deletes codes once they expire."""
+        self._collection().create_index(_TTL_INDEX_KEYS, **_TTL_INDEX_OPTIONS)
+
+    def put(self, code: str, user_id: str, ttl_seconds: int = AUTH_CODE_TTL_SECONDS):
+        if not self._indexed:
+            # Once per process, on first use rather than at import time
+            self.ensure_indexes()
+            self._indexed = True
+
+        self._collection().insert_one(_code_document(code, user_id, ttl_seconds))
+
+    def consume(self, code: str) -> Optional[AuthCode]:
+        doc = self._collection().find_one_and_delete(
+            {"_id": _code_key(code)}, projection={"user_id": 1, "expires_at": 1}
+        )
+        if doc is None:
+            return None
+        return AuthCode(doc["user_id"], doc["expires_at"])
+
+
+class AsyncMongoAuthCodeStore(AsyncAuthCodeStore):
+    """MongoAuthCodeStore for the ASGI app, on a Motor database.
+
+    Same collection and document format, so codes issued by the Flask app
+    can be exchanged through the ASGI app and vice versa.
+    """
+
+    def __init__(self, get_db: Callable[[], object]):
+        self._get_db = get_db
+        self._indexed = False
+
+    def _collection(self):
+        return self._get_db()[AUTH_CODES_COLLECTION]
+
+    async def put(
+        self, code: str, user_id: str, ttl_seconds: int = AUTH_CODE_TTL_SECONDS
+    ):
+        if not self._indexed:
+            await self._collection().create_index(_TTL_INDEX_KEYS, **_TTL_INDEX_OPTIONS)
+            self._indexed = True
+
+        await self._collection().insert_one(_code_document(code, user_id, ttl_seconds))
+
+    async def consume(self, code: str) -> Optional[AuthCode]:
+        doc = await self._collection().find_one_and_delete(
+            {"_id": _code_key(code)}, projection={"user_id": 1, "expires_at": 1}
+        )
+        if doc is None:
+            return None
+        return AuthCode(doc["user_id"], doc["expires_at"])
+
+
+class AsyncMemoryAuthCodeStore(AsyncAuthCodeStore):
+    """Awaitable facade over MemoryAuthCodeStore, which never blocks."""
+
+    def __init__(self, store: Optional[MemoryAuthCodeStore] = None):
+        self._store = store or MemoryAuthCodeStore()
+
+    async def put(
+        self, code: str, user_id: str, ttl_seconds: int = AUTH_CODE_TTL_SECONDS
+    ):
+        self._store.put(code, user_id, ttl_seconds)
+
+    async def consume(self, code: str) -> Optional[AuthCode]:
+        return self._store.consume(code)
+
+
+def create_auth_code_store(
+    get_db: Callable[[], object], kind: str = AUTH_CODE_STORE
+) -> AuthCodeStore:
+    """Build the store selected by AUTH_CODE_STORE.
+
+    Args:
+        get_db: Returns the MongoDB database (only used by the mongo store)
+        kind: "mongo" or "memory"
+    """
+    if kind == "memory":
+        return MemoryAuthCodeStore()
+    if kind == "mongo":
+        return MongoAuthCodeStore(get_db)
+    raise ValueError(f"Unknown AUTH_CODE_STORE: {kind}")
+
+
+def create_async_auth_code_store(
+    get_db: Callable[[], object], kind: str = AUTH_CODE_STORE
+) -> AsyncAuthCodeStore:
+    """Build the async store selected by AUTH_CODE_STORE for the ASGI app.
+
+    Args:
+        get_db: Returns the Motor database (only used by the mongo store)
+        kind: "mongo" or "memory"
+    """
+    if kind == "memory":
+        return AsyncMemoryAuthCodeStore()
+    if kind == "mongo":
+        return AsyncMongoAuthCodeStore(get_db)
+    raise ValueError(f"Unknown AUTH_CODE_STORE: {kind}")
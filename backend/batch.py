@@ -0,0 +1,287 @@
+"""
+Batched create/update/delete of canned responses using MongoDB bulk writes
+"""
+
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from search import DOCUMENT_PROJECTION, search_gram_updates
+from serialization import utcnow
+
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", "1000"))
+
+UPDATABLE_FIELDS = ("title", "content", "tags")
+
+# (title, content, tags, now) -> new document without _id
+NewDocument = Callable[[str, str, List[str], datetime], Dict[str, Any]]
+
+# One result per operation, in request order; None until decided
+_Results = List[Optional[Dict[str, Any]]]
+
+
+class BatchValidationError(ValueError):
+    """Raised when a single batch operation is malformed."""
+
+
+class _PlannedOperation:
+    """One validated operation and the pymongo request that executes it."""
+
+    __slots__ = ("index", "kind", "request", "object_id", "doc")
+
+    def __init__(self, index: int, kind: str, request, object_id=None, doc=None):
+        self.index = index
+        self.kind = kind
+        self.request = request
+        self.object_id = object_id
+        self.doc = doc
+
+
+def _tags(op: Dict[str, Any]) -> List[str]:
+    """The tags of a create or update, with a missing or null list stored as
+    [] as in ResponseRepository.create.
+
+    Raises:
+        BatchValidationError: If ``tags`` is not a list of strings
+    """
+    tags = op.get("tags") or []
+    if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+        raise BatchValidationError("tags must be a list of strings")
+    return tags
+
+
+def _object_id(op: Dict[str, Any]) -> ObjectId:
+    """The target of an update or delete.
+
+    ``ObjectId(None)`` would mint a fresh id, so a missing ``id`` is rejected
+    here rather than reported later as not found.
+
+    Raises:
+        BatchValidationError: If ``id`` is missing or not a valid ObjectId string
+    """
+    response_id = op.get("id")
+    if response_id is None:
+        raise BatchValidationError("id is required")
+    if not isinstance(response_id, str) or not ObjectId.is_valid(response_id):
+        raise BatchValidationError("Invalid response ID")
+    return ObjectId(response_id)
+
+
+def _plan_operation(
+    index: int,
+    op: Any,
+    user_id: Optional[str],
+    now: datetime,
+    new_document: NewDocument,
+) -> _PlannedOperation:
+    """Validate one client operation and build its bulk write request.
+
+    Raises:
+        BatchValidationError: If the operation is malformed
+    """
+    if not isinstance(op, dict):
+        raise BatchValidationError("Operation must be an object")
+
+    kind = op.get("op")
+    if kind == "create":
+        if "title" not in op or "content" not in op:
+            raise BatchValidationError("Title and content are required")
+        doc = new_document(op["title"], op["content"], _tags(op), now)
+        doc["_id"] = ObjectId()
+        return _PlannedOperation(index, kind, InsertOne(doc), doc["_id"], doc)
+
+    if kind not in ("update", "delete"):
+        raise BatchValidationError("op must be one of create, update, delete")
+
+    object_id = _object_id(op)
+
+    owned = {"_id": object_id, "user_id": user_id}
+    if kind == "delete":
+        return _PlannedOperation(index, kind, DeleteOne(owned), object_id)
+
+    update_fields = {field: op[field] for field in UPDATABLE_FIELDS if field in op}
+    if not update_fields:
+        raise BatchValidationError("No data provided")
+    if "tags" in update_fields:
+        update_fields["tags"] = _tags(op)
+    update_fields.update(search_gram_updates(update_fields))
+    update_fields["updated_at"] = now
+    update = {"$set": update_fields, "$inc": {"revision": 1}}
+    return _PlannedOperation(index, kind, UpdateOne(owned, update), object_id)
+
+
+def _kind(op: Any) -> Optional[str]:
+    return op.get("op") if isinstance(op, dict) else None
+
+
+def _error(
+    index: int, kind: Optional[str], status: int, message: str
+) -> Dict[str, Any]:
+    return {"index": index, "op": kind, "status": status, "error": message}
+
+
+def _plan(
+    operations: List[Any],
+    user_id: Optional[str],
+    new_document: NewDocument,
+    ordered: bool,
+    results: _Results,
+) -> List[_PlannedOperation]:
+    """Validate every operation; malformed ones get a 400 result."""
+    now = utcnow()
+    planned: List[_PlannedOperation] = []
+    for index, op in enumerate(operations):
+        try:
+            planned.append(_plan_operation(index, op, user_id, now, new_document))
+        except BatchValidationError as e:
+            results[index] = _error(index, _kind(op), 400, str(e))
+            if ordered:
+                break
+    return planned
+
+
+def _check_targets(
+    collection,
+    user_id: Optional[str],
+    planned: List[_PlannedOperation],
+    ordered: bool,
+    results: _Results,
+) -> List[_PlannedOperation]:
+    """Keep the operations expected to succeed; missing targets get a 404 result.
+
+    Ownership is resolved with one find. Operations are then walked in
+    order, so an id deleted earlier in the batch is missing for later ones.
+    """
+    target_ids = [p.object_id for p in planned if p.kind != "create"]
+    existing = set()
+    if target_ids:
+        existing = {
+            doc["_id"]
+            for doc in collection.find(
+                {"_id": {"$in": target_ids}, "user_id": user_id}, {"_id": 1}
+            )
+        }
+
+    runnable: List[_PlannedOperation] = []
+    for p in planned:
+        if p.kind != "create":
+            if p.object_id not in existing:
+                results[p.index] = _error(p.index, p.kind, 404, "Response not found")
+                if ordered:
+                    break
+                continue
+            if p.kind == "delete":
+                existing.discard(p.object_id)
+        runnable.append(p)
+    return runnable
+
+
+def _write(
+    collection, runnable: List[_PlannedOperation], ordered: bool, results: _Results
+) -> List[_PlannedOperation]:
+    """Run the operations in one bulk_write and return those that were applied."""
+    if not runnable:
+        return []
+    try:
+        collection.bulk_write([p.request for p in runnable], ordered=ordered)
+    except BulkWriteError as e:
+        failed = set()
+        for error in e.details.get("writeErrors", []):
+            p = runnable[error["index"]]
+            results[p.index] = _error(
+                p.index, p.kind, 500, error.get("errmsg", "Write failed")
+            )
+            failed.add(error["index"])
+        if ordered and failed:
+            return runnable[: min(failed)]
+        return [p for position, p in enumerate(runnable) if position not in failed]
+    return runnable
+
+
+def _collect(
+    collection, executed: List[_PlannedOperation], results: _Results
+) -> Tuple[List[Dict[str, Any]], List[ObjectId]]:
+    """Record the result of every applied operation.
+
+    Updated documents are read back with one find. An update whose document
+    is gone by then matched nothing (it was deleted concurrently) and is
+    reported as 404, unless a later delete in this batch removed it.
+    """
+    deleted_ids = [p.object_id for p in executed if p.kind == "delete"]
+    updated = [p for p in executed if p.kind == "update"]
+    if updated:
+        docs = {
+            doc["_id"]: doc
+            for doc in collection.find(
+                {"_id": {"$in": [p.object_id for p in updated]}}, DOCUMENT_PROJECTION
+            )
+        }
+        for p in updated:
+            p.doc = docs.get(p.object_id)
+
+    deleted = set(deleted_ids)
+    upserted: List[Dict[str, Any]] = []
+    for p in executed:
+        if p.kind == "delete":
+            results[p.index] = {"index": p.index, "op": p.kind, "status": 204}
+        elif p.doc is not None:
+            upserted.append(p.doc)
+            status = 201 if p.kind == "create" else 200
+            results[p.index] = {
+                "index": p.index,
+                "op": p.kind,
+                "status": status,
+                "response": p.doc,
+            }
+        elif p.object_id in deleted:
+            results[p.index] = {"index": p.index, "op": p.kind, "status": 200}
+        else:
+            results[p.index] = _error(p.index, p.kind, 404, "Response not found")
+    return upserted, deleted_ids
+
+
+def execute_batch(
+    collection,
+    user_id: Optional[str],
+    operations: List[Any],
+    ordered: bool,
+    new_document: NewDocument,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], List[ObjectId]]:
+    """Execute a list of create/update/delete operations in bulk.
+
+    Round trips: one find to check ownership of the targeted ids, one
+    bulk_write for all operations, and one find to return updated documents.
+
+    With ``ordered=True`` execution stops at the first failing operation and
+    the remaining ones are reported as skipped (409); otherwise every valid
+    operation is attempted.
+
+    Args:
+        collection: canned_responses collection
+        user_id: Owner of the documents
+        operations: Client operations, e.g. ``{"op": "update", "id": ..., "title": ...}``
+        ordered: Stop at the first failure
+        new_document: Builds a create's document from (title, content, tags,
+            now), e.g. ResponseRepository._new_document
+
+    Returns:
+        Tuple of (per-operation results, upserted documents, deleted ids).
+        Each result has ``index``, ``op`` and ``status`` (HTTP-style) plus
+        either ``response`` (the stored document) or ``error``.
+    """
+    results: _Results = [None] * len(operations)
+    planned = _plan(operations, user_id, new_document, ordered, results)
+    runnable = _check_targets(collection, user_id, planned, ordered, results)
+    executed = _write(collection, runnable, ordered, results)
+    upserted, deleted_ids = _collect(collection, executed, results)
+
+    for index, result in enumerate(results):
+        if result is None:
+            results[index] = _error(
+                index, _kind(operations[index]), 409, "Skipped after an earlier failure"
+            )
+
+    return results, upserted, deleted_ids
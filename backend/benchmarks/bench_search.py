@@ -0,0 +1,145 @@
+"""
+Benchmark: substring search with the trigram index vs. unanchored $regex
+
+Seeds a scratch database on a real MongoDB server with synthetic canned
+responses spread over many users, then runs the same partial-word queries
+through the previous case-insensitive $regex filter and through
+search.trigram_query(). Reports the median latency and, from
+explain("executionStats"), how many index keys and documents each examined.
+
+The scratch database is dropped afterwards.
+
+Usage (from backend/):
+    python benchmarks/bench_search.py [--url mongodb://localhost:27017] \
+        [--docs 50000] [--users 50] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pagination import SORT_ORDER
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from search import (
+    DOCUMENT_PROJECTION,
+    ensure_search_indexes,
+    search_grams,
+    trigram_query,
+)
+
+QUERIES = ["thx", "regards", "meet", "invoice 4", "zq"]
+
+WORDS = (
+    "thanks thank you regards best kind hello hi meeting tomorrow invoice "
+    "attached please find support ticket update shipping order refund "
+    "schedule call follow up question answer sorry delay thx cheers"
+).split()
+
+
+def legacy_regex_query(search):
+    """The search fallback used before the trigram index existed."""
+    return {
+        "$or": [
+            {"title": {"$regex": search, "$options": "i"}},
+            {"content": {"$regex": search, "$options": "i"}},
+            {"tags": {"$regex": search, "$options": "i"}},
+        ]
+    }
+
+
+def seed(collection, docs, users):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    batch = []
+    for i in range(docs):
+        doc = {
+            "title": " ".join(rng.choices(WORDS, k=3)) + f" {i}",
+            "content": " ".join(rng.choices(WORDS, k=60)) + f" invoice {i}",
+            "tags": rng.sample(WORDS, 2),
+            "user_id": f"user-{i % users}",
+            "created_at": now - timedelta(seconds=i),
+            "updated_at": now - timedelta(seconds=i),
+            "revision": 1,
+        }
+        doc["search_grams"] = search_grams(doc)
+        batch.append(doc)
+        if len(batch) == 1000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+    collection.create_index(
+        [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        name="idx_canned_responses_user_created_at",
+    )
+
+
+def measure(collection, query, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list(collection.find(query, DOCUMENT_PROJECTION).sort(SORT_ORDER))
+        timings.append(time.perf_counter() - start)
+
+    stats = (
+        collection.find(query, DOCUMENT_PROJECTION)
+        .sort(SORT_ORDER)
+        .explain()["executionStats"]
+    )
+    return (
+        statistics.median(timings),
+        stats["totalKeysExamined"],
+        stats["totalDocsExamined"],
+        stats["nReturned"],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--url", default=os.getenv("DATABASE_URL", "mongodb://localhost:27017")
+    )
+    parser.add_argument("--docs", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    client = MongoClient(args.url)
+    db = client["cannerai_bench_search"]
+    client.drop_database(db.name)
+
+    try:
+        seed(db["canned_responses"], args.docs, args.users)
+        ensure_search_indexes(db)
+        collection = db["canned_responses"]
+        user = {"user_id": "user-0"}
+
+        print(f"documents: {args.docs}  users: {args.users}  (median of {args.repeat})")
+        print(
+            f"{'query':<12} {'engine':<8} {'ms':>8} {'keys':>8} {'docs':>8} {'hits':>6}"
+        )
+        for search in QUERIES:
+            for engine, clause in (
+                ("regex", legacy_regex_query(search)),
+                ("trigram", trigram_query(search)),
+            ):
+                seconds, keys, examined, hits = measure(
+                    collection, {**user, **clause}, args.repeat
+                )
+                print(
+                    f"{search:<12} {engine:<8} {seconds * 1e3:8.2f} {keys:8d} {examined:8d} {hits:6d}"
+                )
+    finally:
+        client.drop_database(db.name)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Micro-benchmark: per-document cost of serializing a response listing
+
+Compares the previous path (dict_from_doc() + isoformat() per row, encoded
+by Flask's stdlib JSON provider) with serialization.response_rows() +
+dumps(), on a synthetic list of documents shaped like canned_responses.
+
+Usage (from backend/):
+    python benchmarks/bench_serialization.py [--docs 10000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import serialization
+from bson import ObjectId
+from flask import Flask
+from serialization import dumps, response_rows
+
+
+def legacy_dict_from_doc(doc):
+    """The per-row conversion used before serialization.py existed."""
+    tags = doc.get("tags", [])
+    if tags is None:
+        tags = []
+
+    return {
+        "id": str(doc["_id"]),
+        "title": doc["title"],
+        "content": doc["content"],
+        "tags": tags,
+        "user_id": doc.get("user_id"),
+        "created_at": doc["created_at"].isoformat() if doc.get("created_at") else None,
+        "updated_at": doc["updated_at"].isoformat() if doc.get("updated_at") else None,
+    }
+
+
+def make_docs(count):
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Template {i}",
+            "content": "Thank you for reaching out! " * 8,
+            "tags": ["greeting", "support"],
+            "user_id": "user-1",
+            "created_at": now - timedelta(minutes=i),
+            "updated_at": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    docs = make_docs(args.docs)
+    app = Flask(__name__)
+
+    def legacy():
+        return app.json.dumps([legacy_dict_from_doc(doc) for doc in docs])
+
+    def current():
+        return dumps(response_rows(docs))
+
+    legacy_s = best_of(args.repeat, legacy)
+    current_s = best_of(args.repeat, current)
+    backend = "orjson" if serialization.orjson is not None else "stdlib json"
+
+    print(f"documents:         {args.docs}")
+    print(f"encoder backend:   {backend}")
+    print(
+        f"legacy per doc:    {legacy_s / args.docs * 1e6:8.2f} µs  ({legacy_s * 1e3:.1f} ms total)"
+    )
+    print(
+        f"current per doc:   {current_s / args.docs * 1e6:8.2f} µs  ({current_s * 1e3:.1f} ms total)"
+    )
+    print(f"speedup:           {legacy_s / current_s:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
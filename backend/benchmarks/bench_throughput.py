@@ -0,0 +1,175 @@
+"""
+Benchmark: throughput of the Flask app vs. the ASGI app at high concurrency
+
+Start both apps against the same database, for example:
+
+    python app.py                                        # Flask on :5000
+    uvicorn asgi_app:app --port 5001 --workers 1         # ASGI on :5001
+
+then drive each one with the same number of keep-alive connections:
+
+    python benchmarks/bench_throughput.py \
+        --url http://localhost:5000 --url http://localhost:5001 \
+        --concurrency 256 --duration 15
+
+Every connection sends GET requests in a loop, cycling through --path, for
+--duration seconds. Requests/s, errors and latency percentiles are reported
+per target. A JWT for --user is minted from JWT_SECRET_KEY. Set
+RESULT_CACHE_ENABLED=false on the servers to measure MongoDB round trips
+rather than cache hits.
+
+Uses only the standard library (plus PyJWT) so the client does not compete
+with the servers for an event-loop implementation.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import jwt
+
+DEFAULT_PATHS = ["/api/responses?limit=50", "/api/responses?search=thx", "/api/health"]
+
+
+async def read_response(reader):
+    """Read one HTTP/1.x response; return (status, keep_alive)."""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    version, status = status_line.split(b" ", 2)[:2]
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.partition(b":")
+        headers[name.strip().lower()] = value.strip().lower()
+
+    keep_alive = headers.get(b"connection") != b"close" and (
+        version == b"HTTP/1.1" or headers.get(b"connection") == b"keep-alive"
+    )
+
+    if headers.get(b"transfer-encoding") == b"chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif b"content-length" in headers:
+        await reader.readexactly(int(headers[b"content-length"]))
+    elif int(status) not in (204, 304):
+        await reader.read()
+        keep_alive = False
+
+    return int(status), keep_alive
+
+
+async def connection_loop(host, port, requests, deadline, latencies, errors):
+    loop = asyncio.get_running_loop()
+    reader = writer = None
+    position = 0
+
+    while loop.time() < deadline:
+        if writer is None:
+            reader, writer = await asyncio.open_connection(host, port)
+
+        request = requests[position % len(requests)]
+        position += 1
+        start = time.perf_counter()
+        try:
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            errors.append(None)
+            writer.close()
+            writer = None
+            continue
+
+        latencies.append(time.perf_counter() - start)
+        if status >= 400:
+            errors.append(status)
+        if not keep_alive:
+            writer.close()
+            writer = None
+
+    if writer is not None:
+        writer.close()
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float("nan")
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def run_target(url, paths, token, concurrency, duration):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    requests = [
+        (
+            f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+            f"Authorization: Bearer {token}\r\nAccept: application/json\r\n\r\n"
+        ).encode()
+        for path in paths
+    ]
+
+    latencies, errors = [], []
+    deadline = asyncio.get_running_loop().time() + duration
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            connection_loop(host, port, requests, deadline, latencies, errors)
+            for _ in range(concurrency)
+        )
+    )
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(
+        f"{url:<28} {len(latencies) / elapsed:10.1f} {len(errors):7d} "
+        f"{percentile(latencies, 0.50) * 1e3:8.1f} {percentile(latencies, 0.95) * 1e3:8.1f} "
+        f"{percentile(latencies, 0.99) * 1e3:8.1f}"
+    )
+
+
+async def main_async(args):
+    token = jwt.encode(
+        {"user_id": args.user, "exp": int(time.time()) + 3600},
+        os.getenv("JWT_SECRET_KEY", "dev-jwt-secret"),
+        algorithm="HS256",
+    )
+    print(
+        f"concurrency: {args.concurrency}  duration: {args.duration}s  paths: {', '.join(args.path)}"
+    )
+    print(
+        f"{'target':<28} {'req/s':>10} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for url in args.url:
+        await run_target(url, args.path, token, args.concurrency, args.duration)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--url", action="append", required=True, help="Base URL; repeat to compare apps"
+    )
+    parser.add_argument("--path", action="append", help="Request path; repeatable")
+    parser.add_argument("--user", default="bench-user")
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--duration", type=float, default=15)
+    args = parser.parse_args()
+    args.path = args.path or DEFAULT_PATHS
+
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Check: every endpoint's MongoDB query is served by the intended index
+
+Seeds a scratch database on a real MongoDB server, applies the schema
+migrations (schema.py) and runs explain() on the query shape behind each
+endpoint, built with the same helpers the endpoints use. A check fails if
+the winning plan scans the collection, uses an unexpected index, or sorts
+in memory where the index should provide the order. Exits 1 on failure, so
+it can gate index or query changes in CI.
+
+Search shapes are allowed an in-memory SORT: their candidates come from the
+gram (or text) indexes, which cannot also provide the recency order.
+
+The scratch database is dropped afterwards.
+
+Usage (from backend/):
+    python benchmarks/check_query_plans.py [--url mongodb://localhost:27017] \
+        [--docs 5000] [--users 20]
+"""
+
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Callable, NamedTuple, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from library_version import LIBRARY_VERSIONS_COLLECTION
+from pagination import MOST_USED_ORDER, SORT_ORDER, apply_cursor, encode_cursor
+from pymongo import ASCENDING, MongoClient
+from schema import migrate
+from search import (
+    DOCUMENT_PROJECTION,
+    SEARCH_FIELDS,
+    SEARCH_MAX_CANDIDATES,
+    search_grams,
+    text_query,
+    trigram_query,
+)
+from sync import TOMBSTONES_COLLECTION
+
+WORDS = (
+    "thanks thank you regards best kind hello hi meeting tomorrow invoice "
+    "attached please find support ticket update shipping order refund "
+    "schedule call follow up question answer sorry delay thx cheers"
+).split()
+
+LISTING_INDEX = ("idx_canned_responses_user_created_at",)
+GRAM_INDEXES = tuple(
+    f"idx_canned_responses_user_grams_{field}" for field in SEARCH_FIELDS
+)
+
+# Stages that read through an index rather than the whole collection
+INDEX_STAGES = {"IXSCAN", "IDHACK", "EXPRESS_IXSCAN", "EXPRESS_IDHACK"}
+
+
+class Check(NamedTuple):
+    name: str
+    cursor: Callable  # (db, sample) -> cursor to explain
+    indexes: Optional[Tuple[str, ...]] = None  # None: any index
+    allow_sort: bool = False
+
+
+CHECKS = [
+    Check(
+        "GET /api/responses",
+        lambda db, s: db["canned_responses"]
+        .find({"user_id": s["user_id"]}, DOCUMENT_PROJECTION)
+        .sort(SORT_ORDER),
+        LISTING_INDEX,
+    ),
+    Check(
+        "GET /api/responses?limit=50",
+        lambda db, s: db["canned_responses"]
+        .find({"user_id": s["user_id"]}, DOCUMENT_PROJECTION)
+        .sort(SORT_ORDER)
+        .limit(51),
+        LISTING_INDEX,
+    ),
+    Check(
+        "GET /api/responses?limit=50&cursor=...",
+        lambda db, s: db["canned_responses"]
+        .find(
+            apply_cursor({"user_id": s["user_id"]}, encode_cursor(s)),
+            DOCUMENT_PROJECTION,
+        )
+        .sort(SORT_ORDER)
+        .limit(51),
+        LISTING_INDEX,
+    ),
+    Check(
+        "GET /api/responses?sort=most_used&limit=50",
+        lambda db, s: db["canned_responses"]
+        .find({"user_id": s["user_id"]}, DOCUMENT_PROJECTION)
+        .sort(MOST_USED_ORDER)
+        .limit(50),
+        ("idx_canned_responses_user_usage",),
+    ),
+    Check(
+        "GET /api/responses?search=thx",
+        lambda db, s: db["canned_responses"]
+        .find({"user_id": s["user_id"], **trigram_query("thx")}, DOCUMENT_PROJECTION)
+        .sort(SORT_ORDER),
+        GRAM_INDEXES,
+        allow_sort=True,
+    ),
+    Check(
+        "GET /api/responses?search=re (short)",
+        lambda db, s: db["canned_responses"]
+        .find({"user_id": s["user_id"], **trigram_query("re")}, DOCUMENT_PROJECTION)
+        .sort(SORT_ORDER),
+        GRAM_INDEXES,
+        allow_sort=True,
+    ),
+    Check(
+        "GET /api/responses?search=..&sort=relevance",
+        lambda db, s: db["canned_responses"]
+        .find(
+            {"user_id": s["user_id"], **trigram_query("regards")}, DOCUMENT_PROJECTION
+        )
+        .sort(SORT_ORDER)
+        .limit(SEARCH_MAX_CANDIDATES),
+        GRAM_INDEXES,
+        allow_sort=True,
+    ),
+    Check(
+        "GET /api/responses?search=.. (SEARCH_ENGINE=text)",
+        lambda db, s: db["canned_responses"]
+        .find(
+            {"user_id": s["user_id"], **text_query("invoice")},
+            {"score": {"$meta": "textScore"}},
+        )
+        .sort([("score", {"$meta": "textScore"})])
+        .limit(50),
+        ("idx_canned_responses_user_text_search",),
+        allow_sort=True,
+    ),
+    Check(
+        "GET /api/responses/<id>",
+        lambda db, s: db["canned_responses"].find(
+            {"_id": s["_id"], "user_id": s["user_id"]}, DOCUMENT_PROJECTION
+        ),
+        ("_id_",),
+    ),
+    Check(
+        "POST /api/responses/batch (ownership check)",
+        lambda db, s: db["canned_responses"].find(
+            {"_id": {"$in": [s["_id"]]}, "user_id": s["user_id"]}, {"_id": 1}
+        ),
+        ("_id_",),
+    ),
+    Check(
+        "GET /api/responses/changes (full)",
+        lambda db, s: db["canned_responses"]
+        .find({"user_id": s["user_id"]}, DOCUMENT_PROJECTION)
+        .sort("updated_at", ASCENDING),
+        ("idx_canned_responses_user_updated_at",),
+    ),
+    Check(
+        "GET /api/responses/changes?since=...",
+        lambda db, s: db["canned_responses"]
+        .find(
+            {"user_id": s["user_id"], "updated_at": {"$gte": s["updated_at"]}},
+            DOCUMENT_PROJECTION,
+        )
+        .sort("updated_at", ASCENDING),
+        ("idx_canned_responses_user_updated_at",),
+    ),
+    Check(
+        "GET /api/responses/changes (tombstones)",
+        lambda db, s: db[TOMBSTONES_COLLECTION].find(
+            {"user_id": s["user_id"], "deleted_at": {"$gte": s["updated_at"]}},
+            {"response_id": 1},
+        ),
+        ("idx_deleted_responses_user_deleted_at",),
+    ),
+    Check(
+        "GET /api/responses/suggest (index load)",
+        lambda db, s: db["canned_responses"].find(
+            {"user_id": s["user_id"]},
+            {"title": 1, "content": 1, "tags": 1, "created_at": 1},
+        ),
+    ),
+    Check(
+        "ETag library version",
+        lambda db, s: db[LIBRARY_VERSIONS_COLLECTION].find(
+            {"_id": s["user_id"]}, {"version": 1}
+        ),
+        ("_id_",),
+    ),
+]
+
+
+def seed(db, docs, users):
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    batch = []
+    for i in range(docs):
+        doc = {
+            "title": " ".join(rng.choices(WORDS, k=3)) + f" {i}",
+            "content": " ".join(rng.choices(WORDS, k=40)) + f" invoice {i}",
+            "tags": rng.sample(WORDS, 2),
+            "user_id": f"user-{i % users}",
+            "created_at": now - timedelta(seconds=i),
+            "updated_at": now - timedelta(seconds=i // 2),
+            "revision": 1,
+        }
+        if i % 3:
+            doc["usage_count"] = rng.randrange(50)
+        doc["search_grams"] = search_grams(doc)
+        batch.append(doc)
+    db["canned_responses"].insert_many(batch)
+
+    db[TOMBSTONES_COLLECTION].insert_many(
+        [
+            {
+                "user_id": f"user-{i % users}",
+                "response_id": i,
+                "deleted_at": now - timedelta(minutes=i),
+            }
+            for i in range(docs // 10)
+        ]
+    )
+    db[LIBRARY_VERSIONS_COLLECTION].insert_many(
+        [{"_id": f"user-{u}", "version": 1} for u in range(users)]
+    )
+
+
+def plan_stages(node):
+    """Yield every stage of an explain() plan tree."""
+    if not node:
+        return
+    if "stage" in node:
+        yield node
+    # Slot-based execution (MongoDB 7+) wraps the tree in queryPlan
+    yield from plan_stages(node.get("queryPlan"))
+    yield from plan_stages(node.get("inputStage"))
+    for child in node.get("inputStages", []):
+        yield from plan_stages(child)
+
+
+def evaluate(check, explain):
+    stages = list(plan_stages(explain["queryPlanner"]["winningPlan"]))
+    names = [stage["stage"] for stage in stages]
+    used = sorted({stage["indexName"] for stage in stages if "indexName" in stage})
+
+    problems = []
+    if "COLLSCAN" in names:
+        problems.append("COLLSCAN")
+    if not INDEX_STAGES & set(names):
+        problems.append("no index scan")
+    if "SORT" in names and not check.allow_sort:
+        problems.append("in-memory SORT")
+    if check.indexes is not None:
+        unexpected = [name for name in used if name not in check.indexes]
+        if unexpected:
+            problems.append(f"unexpected index {', '.join(unexpected)}")
+    return names, used, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--url", default=os.getenv("DATABASE_URL", "mongodb://localhost:27017")
+    )
+    parser.add_argument("--docs", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    client = MongoClient(args.url)
+    db = client["cannerai_check_query_plans"]
+    client.drop_database(db.name)
+
+    failures = 0
+    try:
+        migrate(db)
+        seed(db, args.docs, args.users)
+        sample = db["canned_responses"].find_one(
+            {"user_id": "user-0"}, sort=SORT_ORDER, skip=args.docs // args.users // 2
+        )
+
+        for check in CHECKS:
+            names, used, problems = evaluate(check, check.cursor(db, sample).explain())
+            failures += bool(problems)
+            status = "FAIL " + "; ".join(problems) if problems else "ok"
+            print(
+                f"{check.name:<48} {' > '.join(names):<40} {', '.join(used) or '-':<44} {status}"
+            )
+    finally:
+        client.drop_database(db.name)
+        client.close()
+
+    print(
+        f"\n{len(CHECKS) - failures}/{len(CHECKS)} query shapes use their intended index"
+    )
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
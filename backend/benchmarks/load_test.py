@@ -0,0 +1,532 @@
+"""
+Load test: throughput and latency percentiles of every API route
+
+Seeds --users x --templates responses through the batch endpoint, then
+drives each scenario (list, page, most used, search, suggest, changes, get,
+create, patch, delete, use, health, code exchange) for --duration seconds with
+--concurrency client threads on keep-alive connections. Requests/s and
+p50/p95/p99 latency per scenario are printed and written to --output as
+JSON, so runs can be diffed between commits with --compare.
+
+Targets:
+- --url: a running server (python app.py or gunicorn -c gunicorn.conf.py
+  wsgi:app; the ASGI app only behind a proxy that sends its other routes
+  to Flask). JWT_SECRET_KEY must match the server's. The code exchange
+  scenario also needs --mongo-url, the server's database, to issue codes;
+  it is skipped where the route is not served (the Flask app has none)
+- --in-process: the Flask app through its test client on an in-memory
+  mongomock database (pip install mongomock). No network or mongod
+  needed; measures the application code only. mongomock is not built for
+  concurrent use, so an occasional error at high concurrency is expected
+
+Set RESULT_CACHE_ENABLED=false on the server to measure MongoDB round trips
+rather than cache hits on the read routes.
+
+Usage (from backend/):
+    python benchmarks/load_test.py --url http://localhost:5000 --output after.json
+    python benchmarks/load_test.py --in-process --users 5 --templates 200
+    python benchmarks/load_test.py --compare before.json after.json
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from auth import generate_jwt
+
+WORDS = (
+    "thanks thank you regards best kind hello hi meeting tomorrow invoice "
+    "attached please find support ticket update shipping order refund "
+    "schedule call follow up question answer sorry delay thx cheers"
+).split()
+
+SEED_BATCH_SIZE = 500
+
+Request = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+class HttpClient:
+    """One keep-alive connection per thread to a running server."""
+
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        self._host = parts.hostname
+        self._port = parts.port or 80
+        self._local = threading.local()
+
+    def request(
+        self, method: str, path: str, headers: Dict[str, str], body=None
+    ) -> Tuple[int, bytes]:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(
+                self._host, self._port, timeout=30
+            )
+
+        headers = dict(headers)
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers["Content-Type"] = "application/json"
+
+        try:
+            connection.request(method, path, payload, headers)
+            response = connection.getresponse()
+            data = response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self._local.connection = None
+            raise
+        return response.status, data
+
+
+class InProcessClient:
+    """The Flask app's test client, one per thread."""
+
+    def __init__(self, flask_app):
+        self._app = flask_app
+        self._local = threading.local()
+
+    def request(
+        self, method: str, path: str, headers: Dict[str, str], body=None
+    ) -> Tuple[int, bytes]:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        # Closed like a WSGI server would, which frees a streamed request's admission slot
+        with client.open(path, method=method, headers=headers, json=body) as response:
+            return response.status_code, response.get_data()
+
+
+class Context:
+    """Shared state of one load-test run."""
+
+    def __init__(self, client, users: List[str], code_store=None):
+        self.client = client
+        self.users = users
+        self.headers = {
+            user: {"Authorization": f"Bearer {generate_jwt(user)}"} for user in users
+        }
+        self.ids: Dict[str, List[str]] = {user: [] for user in users}
+        self.code_store = code_store
+
+    def call(self, user: str, method: str, path: str, body=None) -> Tuple[int, Any]:
+        status, data = self.client.request(method, path, self.headers[user], body)
+        return status, json.loads(data) if data else None
+
+
+def _template(rng: random.Random, index: int) -> Dict[str, Any]:
+    return {
+        "title": " ".join(rng.choices(WORDS, k=3)) + f" {index}",
+        "content": " ".join(rng.choices(WORDS, k=60)),
+        "tags": rng.sample(WORDS, 2),
+    }
+
+
+def seed(ctx: Context, templates: int):
+    rng = random.Random(1)
+    for user in ctx.users:
+        for start in range(0, templates, SEED_BATCH_SIZE):
+            operations = [
+                {"op": "create", **_template(rng, i)}
+                for i in range(start, min(start + SEED_BATCH_SIZE, templates))
+            ]
+            status, body = ctx.call(
+                user, "POST", "/api/responses/batch", {"operations": operations}
+            )
+            if status != 200:
+                sys.exit(f"Seeding failed with HTTP {status}: {body}")
+            ctx.ids[user].extend(
+                r["response"]["id"] for r in body["results"] if r.get("status") == 201
+            )
+
+
+# ==================== Scenarios ====================
+
+
+class Scenario(NamedTuple):
+    name: str
+    # Builds the measured request; may make untimed setup calls first
+    prepare: Callable[[Context, random.Random, str], Request]
+
+
+def _create(ctx, rng, user):
+    return "POST", "/api/responses", _template(rng, rng.randrange(10**6))
+
+
+def _delete(ctx, rng, user):
+    # Each delete needs a fresh document; creating it is not timed
+    status, body = ctx.call(
+        user, "POST", "/api/responses", _template(rng, rng.randrange(10**6))
+    )
+    return "DELETE", f"/api/responses/{body['id']}", None
+
+
+def _exchange(ctx, rng, user):
+    code = secrets.token_urlsafe(32)
+    ctx.code_store.put(code, user)
+    return "POST", "/auth/extension/exchange-code", {"auth_code": code}
+
+
+SCENARIOS = [
+    Scenario("list", lambda ctx, rng, user: ("GET", "/api/responses", None)),
+    Scenario(
+        "list_page", lambda ctx, rng, user: ("GET", "/api/responses?limit=50", None)
+    ),
+    Scenario(
+        "list_most_used",
+        lambda ctx, rng, user: ("GET", "/api/responses?sort=most_used&limit=50", None),
+    ),
+    Scenario(
+        "search",
+        lambda ctx, rng, user: (
+            "GET",
+            f"/api/responses?search={quote(rng.choice(WORDS)[:4])}",
+            None,
+        ),
+    ),
+    Scenario(
+        "search_relevance",
+        lambda ctx, rng, user: (
+            "GET",
+            f"/api/responses?search={quote(rng.choice(WORDS))}&sort=relevance",
+            None,
+        ),
+    ),
+    Scenario(
+        "suggest",
+        lambda ctx, rng, user: (
+            "GET",
+            f"/api/responses/suggest?prefix={rng.choice(WORDS)[:2]}",
+            None,
+        ),
+    ),
+    Scenario("changes", lambda ctx, rng, user: ("GET", "/api/responses/changes", None)),
+    Scenario(
+        "get",
+        lambda ctx, rng, user: (
+            "GET",
+            f"/api/responses/{rng.choice(ctx.ids[user])}",
+            None,
+        ),
+    ),
+    Scenario("create", _create),
+    Scenario(
+        "patch",
+        lambda ctx, rng, user: (
+            "PATCH",
+            f"/api/responses/{rng.choice(ctx.ids[user])}",
+            {"content": " ".join(rng.choices(WORDS, k=60))},
+        ),
+    ),
+    Scenario("delete", _delete),
+    Scenario(
+        "use",
+        lambda ctx, rng, user: (
+            "POST",
+            f"/api/responses/{rng.choice(ctx.ids[user])}/use",
+            None,
+        ),
+    ),
+    Scenario("health", lambda ctx, rng, user: ("GET", "/api/health", None)),
+    Scenario("exchange", _exchange),
+]
+
+
+def skip_reason(ctx: Context, scenario: Scenario) -> Optional[str]:
+    """Return why ``scenario`` cannot run against this target, if it cannot."""
+    if scenario.name != "exchange":
+        return None
+    if ctx.code_store is None:
+        return "needs --mongo-url to issue auth codes"
+
+    user = ctx.users[0]
+    method, path, body = scenario.prepare(ctx, random.Random(0), user)
+    status, _ = ctx.client.request(method, path, ctx.headers[user], body)
+    if status in (404, 405):
+        return "route not served by the target"
+    return None
+
+
+# ==================== Measurement ====================
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def drive(
+    ctx: Context, scenario: Scenario, duration: float, concurrency: int, seed_base: int
+):
+    latencies: List[float] = []
+    errors: List[Optional[int]] = []
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_seed):
+        rng = random.Random(worker_seed)
+        while time.perf_counter() < deadline:
+            user = rng.choice(ctx.users)
+            method, path, body = scenario.prepare(ctx, rng, user)
+            start = time.perf_counter()
+            try:
+                status, _ = ctx.client.request(method, path, ctx.headers[user], body)
+            except (http.client.HTTPException, OSError):
+                status = None
+            latencies.append(time.perf_counter() - start)
+            if status is None or status >= 400:
+                errors.append(status)
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=worker, args=(seed_base + i,))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def summarize(
+    latencies: List[float], errors: List[Optional[int]], elapsed: float
+) -> Dict[str, Any]:
+    latencies.sort()
+    if not latencies:
+        return {
+            "requests": 0,
+            "errors": len(errors),
+            "throughput_rps": 0.0,
+            "latency_ms": None,
+        }
+
+    ms = [value * 1e3 for value in latencies]
+    return {
+        "requests": len(ms),
+        "errors": len(errors),
+        "error_statuses": sorted({str(status) for status in errors}),
+        "throughput_rps": round(len(ms) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(sum(ms) / len(ms), 3),
+            "p50": round(percentile(ms, 0.50), 3),
+            "p95": round(percentile(ms, 0.95), 3),
+            "p99": round(percentile(ms, 0.99), 3),
+            "max": round(ms[-1], 3),
+        },
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=os.path.dirname(__file__),
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_row(name: str, result: Dict[str, Any]):
+    if "skipped" in result:
+        print(f"{name:<18} skipped: {result['skipped']}")
+        return
+    latency = result["latency_ms"] or {"p50": 0, "p95": 0, "p99": 0}
+    print(
+        f"{name:<18} {result['throughput_rps']:10.1f} {result['requests']:9d} {result['errors']:7d} "
+        f"{latency['p50']:9.2f} {latency['p95']:9.2f} {latency['p99']:9.2f}"
+    )
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def change(old, new):
+        return f"{(new - old) / old * 100:+7.1f}%" if old else "     n/a"
+
+    print(f"{before['meta'].get('git_commit')} -> {after['meta'].get('git_commit')}")
+    print(
+        f"{'scenario':<18} {'req/s':>10} {'change':>8} {'p50 ms':>9} {'change':>8} {'p99 ms':>9} {'change':>8}"
+    )
+    for name, new in after["scenarios"].items():
+        old = before["scenarios"].get(name)
+        if (
+            not old
+            or "skipped" in old
+            or "skipped" in new
+            or not old["latency_ms"]
+            or not new["latency_ms"]
+        ):
+            continue
+        print(
+            f"{name:<18} {new['throughput_rps']:10.1f} {change(old['throughput_rps'], new['throughput_rps'])} "
+            f"{new['latency_ms']['p50']:9.2f} {change(old['latency_ms']['p50'], new['latency_ms']['p50'])} "
+            f"{new['latency_ms']['p99']:9.2f} {change(old['latency_ms']['p99'], new['latency_ms']['p99'])}"
+        )
+
+
+# ==================== Targets ====================
+
+
+def in_process_target():
+    """Flask test client on an in-memory mongomock database."""
+    try:
+        import mongomock
+    except ImportError:
+        sys.exit("--in-process needs mongomock: pip install mongomock")
+
+    os.environ.setdefault("DATABASE_URL", "mongodb://in-process")
+    # A few seeded users at full speed would be rate limited almost at once
+    os.environ.setdefault("ADMISSION_ENABLED", "false")
+    import database
+
+    database.MongoClient = lambda *args, **kwargs: mongomock.MongoClient()
+
+    from app import create_app
+    from startup import startup
+
+    flask_app = create_app()
+    while not startup.ready:
+        time.sleep(0.01)
+    return InProcessClient(flask_app), "in-process (Flask test client, mongomock)"
+
+
+def mongo_code_store(url: str):
+    from auth_codes import MongoAuthCodeStore
+    from database import database_name
+    from pymongo import MongoClient
+
+    db = MongoClient(url)[database_name()]
+    return MongoAuthCodeStore(lambda: db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="Base URL of a running server")
+    target.add_argument(
+        "--in-process", action="store_true", help="Flask test client on mongomock"
+    )
+    target.add_argument(
+        "--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Diff two JSON reports"
+    )
+    parser.add_argument(
+        "--mongo-url",
+        help="The server's MongoDB, to issue auth codes for the exchange scenario",
+    )
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument(
+        "--templates", type=int, default=200, help="Responses seeded per user"
+    )
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument(
+        "--duration", type=float, default=10, help="Seconds per scenario"
+    )
+    parser.add_argument(
+        "--warmup",
+        type=float,
+        default=1,
+        help="Unrecorded seconds before each scenario",
+    )
+    parser.add_argument(
+        "--scenarios",
+        help="Comma-separated subset of: " + ", ".join(s.name for s in SCENARIOS),
+    )
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.in_process:
+        client, target_name = in_process_target()
+    else:
+        client, target_name = HttpClient(args.url), args.url
+    code_store = mongo_code_store(args.mongo_url) if args.mongo_url else None
+
+    selected = SCENARIOS
+    if args.scenarios:
+        names = set(args.scenarios.split(","))
+        selected = [s for s in SCENARIOS if s.name in names]
+
+    # A unique prefix keeps repeated runs against one database apart
+    run_id = secrets.token_hex(3)
+    ctx = Context(client, [f"load-{run_id}-{i}" for i in range(args.users)], code_store)
+    print(
+        f"Seeding {args.users} users x {args.templates} responses on {target_name} ..."
+    )
+    seed(ctx, args.templates)
+
+    print(f"concurrency: {args.concurrency}  duration: {args.duration}s per scenario")
+    print(
+        f"{'scenario':<18} {'req/s':>10} {'requests':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    )
+    results = {}
+    for position, scenario in enumerate(selected):
+        reason = skip_reason(ctx, scenario)
+        if reason:
+            results[scenario.name] = {"skipped": reason}
+        else:
+            if args.warmup:
+                drive(
+                    ctx,
+                    scenario,
+                    args.warmup,
+                    args.concurrency,
+                    seed_base=-1000 * (position + 1),
+                )
+            results[scenario.name] = summarize(
+                *drive(
+                    ctx,
+                    scenario,
+                    args.duration,
+                    args.concurrency,
+                    seed_base=1000 * position,
+                )
+            )
+        print_row(scenario.name, results[scenario.name])
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "git_commit": git_commit(),
+            "target": target_name,
+            "users": args.users,
+            "templates_per_user": args.templates,
+            "concurrency": args.concurrency,
+            "duration_seconds": args.duration,
+            "python": platform.python_version(),
+        },
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
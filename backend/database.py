@@ -4,216 +4,282 @@ Database service for managing responses using MongoDB
 
 import logging
 import os
+import threading
 import time
-from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
-from bson import ObjectId
-from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT
+from pymongo import MongoClient
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
 
+from metrics import mongo_event_listeners
 from models import Response
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from repository import InvalidResponseIdError, ResponseRepository
+from schema import ensure_schema
+from search import SEARCH_DEFAULT_LIMIT
+from slow_queries import slow_query_listeners
+
+# Process-wide MongoClient shared by every request handler. MongoClient is
+# thread-safe and maintains its own connection pool, so one instance per
+# process is all we need. It is recreated after fork() because sockets and
+# monitor threads inherited from the parent must not be reused in the child.
+_client: Optional[MongoClient] = None
+_client_lock = threading.Lock()
+
+
+def _reset_client_after_fork():
+    """Drop the parent's client in a forked child so it builds its own."""
+    global _client, _client_lock
+
+    _client = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_client_after_fork)
+
+
+def client_options() -> dict:
+    """Build MongoClient (and Motor client) options from environment variables.
+
+    Includes the command listeners feeding /metrics (see metrics.py) and the
+    slow-query log (see slow_queries.py).
+    """
+    return {
+        'event_listeners': mongo_event_listeners() + slow_query_listeners(),
+        'maxPoolSize': int(os.getenv("MONGODB_MAX_POOL_SIZE", "100")),
+        'minPoolSize': int(os.getenv("MONGODB_MIN_POOL_SIZE", "0")),
+        'maxIdleTimeMS': int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "300000")),
+        'waitQueueTimeoutMS': int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+        'serverSelectionTimeoutMS': int(
+            os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000")
+        ),
+    }
+
+
+def get_client() -> MongoClient:
+    """Return the shared MongoClient, creating it lazily on first use.
+
+    The client is created once per process. No round trip is made here:
+    server selection happens on the first real operation.
+    """
+    global _client
+
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is None:
+            db_url = os.getenv("DATABASE_URL")
+            if not db_url:
+                raise ValueError("DATABASE_URL environment variable is required")
+            _client = MongoClient(db_url, connect=False, **client_options())
+    return _client
+
+
+def database_name() -> str:
+    """Return the name of the application database."""
+    return os.getenv("MONGODB_DB_NAME", "cannerai_db")
+
+
+def get_database():
+    """Return the application database from the shared client."""
+    return get_client()[database_name()]
+
+
+def close_client():
+    """Close the shared client (e.g. on shutdown or in tests)."""
+    global _client
+
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def wait_for_database(max_retries: int = 5, base_delay: float = 1.0):
+    """Block until MongoDB answers a ping, retrying with exponential backoff.
+
+    Only meant for startup; request handlers use get_database() directly
+    and never pay for the extra ping round trip.
+
+    Args:
+        max_retries: Maximum number of connection attempts
+        base_delay: Base delay between retries (exponential backoff)
+
+    Returns:
+        MongoDB database instance
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            get_client().admin.command('ping')
+
+            if attempt > 0:
+                logging.info(f"✅ MongoDB connection established after {attempt} retries")
+            return get_database()
+
+        except (ConnectionFailure, ServerSelectionTimeoutError) as e:
+            if attempt == max_retries:
+                logging.error(f"❌ Failed to connect to MongoDB after {max_retries} attempts: {e}")
+                raise
+
+            delay = base_delay * (2 ** attempt)  # Exponential backoff
+            logging.warning(f"⚠️  MongoDB connection attempt {attempt + 1} failed, retrying in {delay}s: {e}")
+            time.sleep(delay)
 
 
 class DatabaseService:
-    """Service for database operations with MongoDB."""
+    """Service for database operations with MongoDB.
+
+    Every method works on one user's responses through ResponseRepository
+    (see repository.py) and returns models.Response instances.
+    """
 
     @staticmethod
-    def get_connection(max_retries: int = 5, base_delay: float = 1.0):
-        """Get MongoDB database connection with retry logic.
-        
-        Args:
-            max_retries: Maximum number of connection attempts
-            base_delay: Base delay between retries (exponential backoff)
-            
+    def get_connection():
+        """Get the MongoDB database backed by the shared client pool.
+
         Returns:
             MongoDB database instance
         """
-        db_url = os.getenv("DATABASE_URL")
-        if not db_url:
-            raise ValueError("DATABASE_URL environment variable is required")
-        db_name = os.getenv("MONGODB_DB_NAME", "cannerai_db")
-        
-        for attempt in range(max_retries + 1):
-            try:
-                client = MongoClient(db_url, serverSelectionTimeoutMS=5000)
-                
-                # Test the connection
-                client.admin.command('ping')
-                
-                # Get the database
-                db = client[db_name]
-                
-                if attempt > 0:
-                    logging.info(f"✅ MongoDB connection established after {attempt} retries")
-                return db
-                
-            except (ConnectionFailure, ServerSelectionTimeoutError) as e:
-                if attempt == max_retries:
-                    logging.error(f"❌ Failed to connect to MongoDB after {max_retries} attempts: {e}")
-                    raise
-                
-                delay = base_delay * (2 ** attempt)  # Exponential backoff
-                logging.warning(f"⚠️  MongoDB connection attempt {attempt + 1} failed, retrying in {delay}s: {e}")
-                time.sleep(delay)
+        return get_database()
+
+    @staticmethod
+    def repository(user_id: str) -> ResponseRepository:
+        """The responses of ``user_id``."""
+        return ResponseRepository(DatabaseService.get_connection(), user_id)
 
     @staticmethod
-    def initialize():
-        """Initialize database collections and indexes.
-        
-        Note: Collections and indexes are typically created via init.js
-        This method verifies connectivity and ensures indexes exist.
+    def initialize() -> int:
+        """Wait for MongoDB and bring the schema up to date (see schema.py).
+
+        Returns:
+            The schema version in place
         """
-        db = DatabaseService.get_connection()
-        
-        # Verify the canned_responses collection exists
-        if 'canned_responses' not in db.list_collection_names():
-            db.create_collection('canned_responses')
-        
-        # Ensure indexes exist
-        collection = db['canned_responses']
-        
-        # Text index for full-text search
-        try:
-            collection.create_index(
-                [('title', TEXT), ('content', TEXT)],
-                name='idx_canned_responses_text_search',
-                weights={'title': 2, 'content': 1},
-                default_language='english'
-            )
-        except Exception:
-            pass  # Index might already exist
-        
-        # Other indexes
-        collection.create_index([('tags', ASCENDING)], name='idx_canned_responses_tags', background=True)
-        collection.create_index([('created_at', DESCENDING)], name='idx_canned_responses_created_at', background=True)
-        collection.create_index([('updated_at', DESCENDING)], name='idx_canned_responses_updated_at', background=True)
-        
-        logging.info("✅ Database schema verified")
+        version = ensure_schema(wait_for_database())
+        logging.info(f"✅ Database schema verified (version {version})")
+        return version
+
+    @staticmethod
+    def get_all_responses(user_id: str, search: Optional[str] = None) -> List[Response]:
+        """Get all responses, optionally filtered by a search term."""
+        docs, _ = DatabaseService.repository(user_id).find(search or "")
+        return Response.from_docs(docs)
 
     @staticmethod
-    def get_all_responses(search: Optional[str] = None) -> List[Response]:
-        """Get all responses, optionally filtered."""
-        db = DatabaseService.get_connection()
-        collection = db['canned_responses']
-
-        if search:
-            # MongoDB text search or regex for partial matching
-            # Using $text for full-text search on indexed fields
-            try:
-                query = {'$text': {'$search': search}}
-                cursor = collection.find(query).sort('created_at', DESCENDING)
-            except Exception:
-                # Fallback to regex if text index not available or search is too specific
-                query = {
-                    '$or': [
-                        {'title': {'$regex': search, '$options': 'i'}},
-                        {'content': {'$regex': search, '$options': 'i'}},
-                        {'tags': {'$regex': search, '$options': 'i'}}
-                    ]
-                }
-                cursor = collection.find(query).sort('created_at', DESCENDING)
-        else:
-            cursor = collection.find().sort('created_at', DESCENDING)
-
-        return [Response.from_db_row(doc) for doc in cursor]
+    def search_responses(user_id: str, search: str, limit: int = SEARCH_DEFAULT_LIMIT) -> List[Response]:
+        """Get the ``limit`` responses that best match ``search``, best first."""
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        return Response.from_docs(DatabaseService.repository(user_id).search(search, limit))
 
     @staticmethod
-    def get_response_by_id(response_id: str) -> Optional[Response]:
+    def get_responses_page(
+        user_id: str,
+        search: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ) -> Tuple[List[Response], Optional[str]]:
+        """Get one page of responses using keyset pagination.
+
+        Args:
+            user_id: Owner of the responses
+            search: Optional search term
+            limit: Maximum number of responses to return
+            cursor: Opaque cursor returned by the previous page
+
+        Returns:
+            Tuple of (responses, next_cursor); next_cursor is None on the last page
+
+        Raises:
+            InvalidCursorError: If the cursor is malformed
+        """
+        limit = min(max(limit, 1), MAX_PAGE_SIZE)
+        docs, next_cursor = DatabaseService.repository(user_id).find(
+            search or "", paginate=True, limit=limit, cursor=cursor
+        )
+        return Response.from_docs(docs), next_cursor
+
+    @staticmethod
+    def get_response_by_id(user_id: str, response_id: str) -> Optional[Response]:
         """Get a response by ID."""
-        db = DatabaseService.get_connection()
-        collection = db['canned_responses']
-        
         try:
-            doc = collection.find_one({'_id': ObjectId(response_id)})
-        except Exception:
-            # Invalid ObjectId format
-            return None
-
-        if doc is None:
+            doc = DatabaseService.repository(user_id).get(response_id)
+        except InvalidResponseIdError:
             return None
 
-        return Response.from_db_row(doc)
+        return Response.from_db_row(doc) if doc is not None else None
 
     @staticmethod
-    def create_response(title: str, content: str, tags: List[str]) -> Response:
+    def create_response(user_id: str, title: str, content: str, tags: List[str]) -> Response:
         """Create a new response.
-        
+
         Note: MongoDB auto-generates ObjectId
         """
-        db = DatabaseService.get_connection()
-        collection = db['canned_responses']
-
-        now = datetime.utcnow()
-        doc = {
-            'title': title,
-            'content': content,
-            'tags': tags,
-            'created_at': now,
-            'updated_at': now
-        }
-        
-        result = collection.insert_one(doc)
-        doc['_id'] = result.inserted_id
-        
-        return Response.from_db_row(doc)
+        return Response.from_db_row(DatabaseService.repository(user_id).create(title, content, tags))
+
+    @staticmethod
+    def create_responses(user_id: str, items: List[dict]) -> List[Response]:
+        """Create many responses with a single insert_many.
+
+        Args:
+            user_id: Owner of the responses
+            items: Dicts with ``title``, ``content`` and optional ``tags``
+        """
+        return Response.from_docs(DatabaseService.repository(user_id).create_many(items))
+
+    @staticmethod
+    def apply_batch(user_id: str, operations: List[dict], ordered: bool = True) -> List[dict]:
+        """Apply mixed create/update/delete operations with one bulk_write.
+
+        Args:
+            user_id: Owner of the responses
+            operations: Operations as accepted by POST /api/responses/batch
+            ordered: Stop at the first failing operation
+
+        Returns:
+            Per-operation results; ``response`` holds a Response when present
+        """
+        results = DatabaseService.repository(user_id).apply_batch(operations, ordered)
+        for result in results:
+            if result.get("response") is not None:
+                result["response"] = Response.from_db_row(result["response"])
+        return results
 
     @staticmethod
     def update_response(
+        user_id: str,
         response_id: str,
         title: Optional[str] = None,
         content: Optional[str] = None,
         tags: Optional[List[str]] = None,
+        expected_revision: Optional[int] = None,
     ) -> Optional[Response]:
-        """Update an existing response."""
-        db = DatabaseService.get_connection()
-        collection = db['canned_responses']
-
-        try:
-            object_id = ObjectId(response_id)
-        except Exception:
-            return None
-
-        # Check if exists
-        doc = collection.find_one({'_id': object_id})
-        
-        if doc is None:
-            return None
+        """Update an existing response (see ResponseRepository.update).
 
-        # Build update document
-        update_fields = {'updated_at': datetime.utcnow()}
-
-        if title is not None:
-            update_fields['title'] = title
-
-        if content is not None:
-            update_fields['content'] = content
+        Args:
+            expected_revision: Only update if the stored revision matches
 
-        if tags is not None:
-            update_fields['tags'] = tags
+        Raises:
+            RevisionConflictError: If ``expected_revision`` is stale
+        """
+        fields = {
+            name: value
+            for name, value in (('title', title), ('content', content), ('tags', tags))
+            if value is not None
+        }
+        revisions = [expected_revision] if expected_revision is not None else None
 
-        # Update the document
-        collection.update_one(
-            {'_id': object_id},
-            {'$set': update_fields}
-        )
-        
-        # Fetch updated document
-        doc = collection.find_one({'_id': object_id})
+        try:
+            doc = DatabaseService.repository(user_id).update(response_id, fields, revisions)
+        except InvalidResponseIdError:
+            return None
 
-        return Response.from_db_row(doc) if doc else None
+        return Response.from_db_row(doc) if doc is not None else None
 
     @staticmethod
-    def delete_response(response_id: str) -> bool:
+    def delete_response(user_id: str, response_id: str) -> bool:
         """Delete a response."""
-        db = DatabaseService.get_connection()
-        collection = db['canned_responses']
-
         try:
-            object_id = ObjectId(response_id)
-        except Exception:
+            return DatabaseService.repository(user_id).delete(response_id)
+        except InvalidResponseIdError:
             return False
-
-        result = collection.delete_one({'_id': object_id})
-        
-        return result.deleted_count > 0
@@ -0,0 +1,20 @@
+#!/bin/sh
+# Start the backend with the server selected by APP_SERVER:
+#   gunicorn (default)  multi-worker WSGI server, settings in gunicorn.conf.py
+#   dev                 Flask development server (python app.py)
+# The ASGI app (asgi_app.py) serves only part of the API and is not an
+# option here; see "Async (ASGI) App" in README.md.
+set -e
+
+case "${APP_SERVER:-gunicorn}" in
+    gunicorn)
+        exec gunicorn -c gunicorn.conf.py wsgi:app
+        ;;
+    dev)
+        exec python app.py
+        ;;
+    *)
+        echo "Unknown APP_SERVER '${APP_SERVER}' (expected gunicorn or dev)" >&2
+        exit 1
+        ;;
+esac
@@ -7,14 +7,19 @@ from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify
 
+from auth_codes import AUTH_CODE_TTL_SECONDS, create_auth_code_store
+from repository import ResponseRepository
+from serialization import json_response, response_rows
+from token_cache import token_cache
+
 # Configuration - Add to your app.py or config file
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 
-# In-memory storage for auth codes (use Redis in production)
-# Format: { "code": { "user_id": "123", "expires_at": datetime, "used": False } }
-AUTH_CODES = {}
+# Single-use auth codes; AUTH_CODE_STORE=mongo (default) shares them between
+# workers and nodes, AUTH_CODE_STORE=memory keeps them in this process
+auth_code_store = create_auth_code_store(get_db_connection)
 
 
 def generate_jwt(user_id: str) -> str:
@@ -27,8 +32,8 @@ def generate_jwt(user_id: str) -> str:
     return jwt.encode(payload, SECRET_KEY, algorithm=JWT_ALGORITHM)
 
 
-def verify_jwt(token: str) -> dict:
-    """Verify and decode a JWT token."""
+def _decode_jwt(token: str) -> dict:
+    """Verify the signature and expiry of a JWT and return its payload."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[JWT_ALGORITHM])
         return payload
@@ -38,6 +43,11 @@ def verify_jwt(token: str) -> dict:
         raise ValueError("Invalid token")
 
 
+def verify_jwt(token: str) -> dict:
+    """Verify and decode a JWT token, cached until its exp (see token_cache.py)."""
+    return token_cache.verify(token, _decode_jwt)
+
+
 def require_auth(f):
     """Decorator to protect routes with JWT authentication."""
     @wraps(f)
@@ -51,13 +61,13 @@ def require_auth(f):
             # Extract Bearer token
             token = auth_header.replace("Bearer ", "")
             payload = verify_jwt(token)
-            
-            # Add user info to request context
-            request.user_id = payload["user_id"]
-            
-            return f(*args, **kwargs)
         except ValueError as e:
             return jsonify({"error": str(e)}), 401
+
+        # Add user info to request context
+        request.user_id = payload["user_id"]
+
+        return f(*args, **kwargs)
     
     return decorated_function
 
@@ -84,15 +94,8 @@ def generate_extension_code():
     # Generate a secure random code
     code = secrets.token_urlsafe(32)
     
-    # Store code with expiration (10 minutes)
-    AUTH_CODES[code] = {
-        "user_id": user_id,
-        "expires_at": datetime.utcnow() + timedelta(minutes=10),
-        "used": False
-    }
-    
-    # Clean up expired codes
-    _cleanup_expired_codes()
+    # Store code with expiration (AUTH_CODE_TTL_SECONDS, 10 minutes by default)
+    auth_code_store.put(code, user_id, AUTH_CODE_TTL_SECONDS)
     
     return jsonify({"code": code}), 200
 
@@ -112,29 +115,20 @@ def exchange_extension_code():
     if not auth_code:
         return jsonify({"error": "auth_code is required"}), 400
     
-    # Validate code
-    code_data = AUTH_CODES.get(auth_code)
+    # Validate and consume the code in one atomic step, so it can only be
+    # exchanged once even when requests race on different workers
+    code_data = auth_code_store.consume(auth_code)
     
     if not code_data:
-        return jsonify({"error": "Invalid or expired authorization code"}), 401
+        return jsonify({"error": "Invalid, expired or already used authorization code"}), 401
     
-    if code_data["used"]:
-        return jsonify({"error": "Authorization code already used"}), 401
-    
-    if datetime.utcnow() > code_data["expires_at"]:
-        del AUTH_CODES[auth_code]
+    if code_data.expired:
         return jsonify({"error": "Authorization code has expired"}), 401
     
-    # Mark code as used
-    code_data["used"] = True
-    
     # Generate JWT token
-    user_id = code_data["user_id"]
+    user_id = code_data.user_id
     jwt_token = generate_jwt(user_id)
     
-    # Clean up the used code
-    del AUTH_CODES[auth_code]
-    
     return jsonify({
         "jwt_token": jwt_token,
         "user_id": user_id,
@@ -154,29 +148,10 @@ def get_templates():
     """
     user_id = request.user_id  # Set by @require_auth decorator
     
-    # Get user's canned responses from database
-    db = get_db_connection()
-    collection = db['canned_responses']
+    # Get user's canned responses from database (scoped to user_id by the repository)
+    docs, _ = ResponseRepository(get_db_connection(), user_id).find()
     
-    # Filter by user_id if you have multi-user support
-    # For now, returning all responses (you may want to add user_id field)
-    cursor = collection.find().sort('created_at', DESCENDING)
-    templates = [dict_from_doc(doc) for doc in cursor]
-    
-    return jsonify(templates), 200
-
-
-# ==================== Helper Functions ====================
-
-def _cleanup_expired_codes():
-    """Remove expired authorization codes."""
-    now = datetime.utcnow()
-    expired_codes = [
-        code for code, data in AUTH_CODES.items()
-        if data["expires_at"] < now
-    ]
-    for code in expired_codes:
-        del AUTH_CODES[code]
+    return json_response(response_rows(docs)), 200
 
 
 # ==================== Test Endpoint (Development Only) ====================
@@ -190,11 +165,7 @@ def create_test_code():
     code = secrets.token_urlsafe(32)
     test_user_id = "test_user_123"
     
-    AUTH_CODES[code] = {
-        "user_id": test_user_id,
-        "expires_at": datetime.utcnow() + timedelta(minutes=10),
-        "used": False
-    }
+    auth_code_store.put(code, test_user_id, AUTH_CODE_TTL_SECONDS)
     
     return jsonify({
         "code": code,
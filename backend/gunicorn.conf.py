@@ -0,0 +1,74 @@
+"""
+Gunicorn configuration for the production WSGI server (wsgi.py)
+
+Every setting can be overridden with an environment variable:
+- WEB_CONCURRENCY: worker processes (default: 2 x CPU cores + 1)
+- GUNICORN_THREADS: threads per worker (default 4; 1 selects sync workers)
+- GUNICORN_PRELOAD: import the app once in the master before forking, so
+  workers share its memory pages (default true)
+- GUNICORN_KEEPALIVE, GUNICORN_TIMEOUT, GUNICORN_GRACEFUL_TIMEOUT (seconds)
+- GUNICORN_MAX_REQUESTS, GUNICORN_MAX_REQUESTS_JITTER: recycle workers
+- PORT: listen port (default 5000)
+- PROMETHEUS_MULTIPROC_DIR: directory where workers share their metrics, so
+  /metrics reports the whole server (see metrics.py)
+
+Send SIGHUP to the master for a graceful restart: new workers are started
+and the old ones finish their in-flight requests before exiting.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = "gthread" if threads > 1 else "sync"
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# Keep-alive lets the extension and the proxy reuse connections
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+
+# Recycling workers bounds the growth of per-process caches and leaks
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    """Drop the metrics files of a previous run of the server."""
+    from metrics import registry
+
+    registry.clear()
+
+
+def worker_exit(server, worker):
+    """Write the exiting worker's final metrics for child_exit to retire."""
+    from metrics import METRICS_MULTIPROC_DIR, registry
+
+    if METRICS_MULTIPROC_DIR:
+        registry.write()
+
+
+def child_exit(server, worker):
+    """Keep an exited worker's counters in the server's totals."""
+    from metrics import registry
+
+    registry.retire(worker.pid)
+
+
+def post_fork(server, worker):
+    """Start the worker's database bootstrap right after the fork.
+
+    The master never connects to MongoDB; each worker opens its own client
+    and reports ready on /api/health once the schema is verified.
+    """
+    from startup import startup
+
+    startup.start()
@@ -0,0 +1,124 @@
+"""
+Per-user library versions and per-document revisions used for ETags
+
+Each user's library_versions document holds ``version``, bumped by every
+write to their responses, and ``usage_version``, bumped by usage flushes
+only. Listings that show or sort by usage depend on both.
+"""
+
+import hashlib
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+LIBRARY_VERSIONS_COLLECTION = "library_versions"
+
+
+class LibraryVersions(NamedTuple):
+    """Both versions of a user's library, read together."""
+
+    version: int
+    usage_version: int
+
+    def listing_version(self, uses_usage: bool) -> str:
+        """The version a listing's ETag and cached body are tied to."""
+        return (
+            f"{self.version}.{self.usage_version}" if uses_usage else str(self.version)
+        )
+
+
+def _versions(doc: Optional[Dict[str, Any]]) -> LibraryVersions:
+    if not doc:
+        return LibraryVersions(0, 0)
+    return LibraryVersions(doc.get("version", 0), doc.get("usage_version", 0))
+
+
+def get_library_versions(db, user_id: Optional[str]) -> LibraryVersions:
+    """Return the library and usage versions for ``user_id`` in one lookup."""
+    return _versions(db[LIBRARY_VERSIONS_COLLECTION].find_one({"_id": user_id}))
+
+
+async def get_library_versions_async(db, user_id: Optional[str]) -> LibraryVersions:
+    """get_library_versions() on a Motor database."""
+    return _versions(await db[LIBRARY_VERSIONS_COLLECTION].find_one({"_id": user_id}))
+
+
+def get_library_version(db, user_id: Optional[str]) -> int:
+    """Return the current library version for ``user_id`` (0 if never written)."""
+    doc = db[LIBRARY_VERSIONS_COLLECTION].find_one({"_id": user_id}, {"version": 1})
+    return doc["version"] if doc else 0
+
+
+def bump_library_version(db, user_id: Optional[str]) -> int:
+    """Atomically increment and return the library version for ``user_id``.
+
+    Must be called after every successful write to the user's responses so
+    that previously issued ETags stop matching.
+    """
+    doc = db[LIBRARY_VERSIONS_COLLECTION].find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {"version": 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return doc["version"]
+
+
+def bump_usage_versions(db, user_ids: Iterable[Optional[str]]):
+    """Increment the usage version of every user in ``user_ids`` with one bulk write.
+
+    Called after usage counters were written; it leaves the library version,
+    and so the ETags of listings without usage data, unchanged.
+    """
+    requests = [
+        UpdateOne({"_id": user_id}, {"$inc": {"usage_version": 1}}, upsert=True)
+        for user_id in user_ids
+    ]
+    if requests:
+        db[LIBRARY_VERSIONS_COLLECTION].bulk_write(requests, ordered=False)
+
+
+def make_etag(user_id: Optional[str], version: Any, variant: str) -> str:
+    """Build a strong ETag value for one representation of a user's library.
+
+    Args:
+        user_id: Owner of the library
+        version: Library version read before the data was queried, or a
+            LibraryVersions.listing_version()
+        variant: Request path and query string, so that different listings,
+            searches and pages never share a tag
+    """
+    digest = hashlib.sha1(f"{user_id}\0{variant}".encode()).hexdigest()[:16]
+    return f"{version}-{digest}"
+
+
+class RevisionConflictError(Exception):
+    """Raised when a conditional update targets an outdated revision."""
+
+
+def make_document_etag(doc: Dict[str, Any]) -> str:
+    """Build the strong ETag of a single response from its revision.
+
+    Documents written before revisions existed count as revision 0.
+    """
+    return f"{doc['_id']}-{doc.get('revision', 0)}"
+
+
+def revisions_from_etags(etags: Iterable[str], response_id: str) -> List[int]:
+    """Extract the revisions of ``response_id`` named by If-Match tags.
+
+    Tags for other documents or in an unknown format are ignored, so an
+    empty list means no tag can match and the precondition fails.
+    """
+    revisions = []
+    for etag in etags:
+        doc_id, _, revision = etag.rpartition("-")
+        if doc_id == response_id and revision.isdigit():
+            revisions.append(int(revision))
+    return revisions
+
+
+def revision_filter(revisions: List[int]) -> Dict[str, Any]:
+    """Build a query clause matching any of ``revisions``."""
+    # Revision 0 is stored as a missing field, which {'$in': [None]} matches
+    return {"revision": {"$in": [revision or None for revision in revisions]}}
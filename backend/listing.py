@@ -0,0 +1,154 @@
+"""
+Request parsing and response shaping for response listings, shared by the
+Flask app and the ASGI app
+"""
+
+from typing import Any, Dict, List, Mapping, Optional
+
+from pagination import InvalidCursorError, decode_cursor, parse_limit
+from projection import (
+    USAGE_FIELDS,
+    InvalidProjectionError,
+    build_projection,
+    parse_fields,
+    parse_preview,
+)
+from search import SEARCH_DEFAULT_LIMIT, SEARCH_RANKING, SEARCH_USAGE_WEIGHT
+
+
+class InvalidListingError(ValueError):
+    """Raised when listing query parameters are invalid (HTTP 400)."""
+
+
+class ListingQuery:
+    """Validated parameters of GET /api/responses and GET /api/templates."""
+
+    __slots__ = (
+        "search",
+        "cursor",
+        "paginate",
+        "limit",
+        "fields",
+        "preview",
+        "projection",
+        "relevance",
+        "most_used",
+        "uses_usage",
+        "top_k",
+        "stream",
+        "ndjson",
+    )
+
+    def __init__(
+        self,
+        search,
+        cursor,
+        paginate,
+        limit,
+        fields,
+        preview,
+        projection,
+        relevance,
+        most_used,
+        uses_usage,
+        top_k,
+        stream,
+        ndjson,
+    ):
+        self.search = search
+        self.cursor = cursor
+        self.paginate = paginate
+        self.limit = limit
+        self.fields = fields
+        self.preview = preview
+        self.projection = projection
+        self.relevance = relevance
+        self.most_used = most_used
+        # Shows or orders by usage, so it depends on the usage version too
+        self.uses_usage = uses_usage
+        self.top_k = top_k
+        self.stream = stream
+        self.ndjson = ndjson
+
+    @property
+    def has_search(self) -> bool:
+        return bool(self.search.strip())
+
+
+def parse_listing_query(args: Mapping[str, str], ndjson: bool = False) -> ListingQuery:
+    """Validate listing query parameters.
+
+    Args:
+        args: Query string parameters
+        ndjson: The client asked for ``application/x-ndjson``
+
+    Raises:
+        InvalidListingError: If a parameter is invalid
+    """
+    search = args.get("search", "")
+    cursor = args.get("cursor") or None
+    paginate = "limit" in args or cursor is not None
+    stream = not paginate and (
+        ndjson or args.get("stream", "").lower() in ("1", "true")
+    )
+
+    try:
+        if cursor:
+            decode_cursor(cursor)
+        limit = parse_limit(args.get("limit"))
+        fields = parse_fields(args.get("fields"))
+        preview = parse_preview(args.get("preview"))
+    except (InvalidCursorError, InvalidProjectionError) as e:
+        raise InvalidListingError(str(e))
+    except ValueError:
+        raise InvalidListingError("limit must be a positive integer")
+
+    # SEARCH_RANKING only applies to unpaginated searches, so clients paging
+    # with a cursor keep getting every match in a stable order.
+    sort = args.get("sort") or (SEARCH_RANKING if not paginate else "recent")
+    if sort not in ("recent", "relevance", "most_used"):
+        raise InvalidListingError("sort must be one of recent, relevance, most_used")
+    relevance = sort == "relevance" and bool(search.strip())
+    most_used = sort == "most_used"
+    if (relevance or most_used) and cursor:
+        raise InvalidListingError(
+            f"sort={sort} returns a single page; cursor is not supported"
+        )
+
+    if preview is not None and fields is not None and "content" not in fields:
+        fields += ("content",)
+    uses_usage = (
+        most_used
+        or any(name in USAGE_FIELDS for name in fields or USAGE_FIELDS)
+        or (relevance and SEARCH_USAGE_WEIGHT > 0)
+    )
+
+    return ListingQuery(
+        search=search,
+        cursor=cursor,
+        paginate=paginate,
+        limit=limit,
+        fields=fields,
+        preview=preview,
+        projection=build_projection(fields, preview, paginate),
+        relevance=relevance,
+        most_used=most_used,
+        uses_usage=uses_usage,
+        top_k=limit if "limit" in args else SEARCH_DEFAULT_LIMIT,
+        stream=stream and not relevance,
+        ndjson=ndjson,
+    )
+
+
+def listing_body(
+    rows: List[Dict[str, Any]], query: ListingQuery, next_cursor: Optional[str]
+) -> Any:
+    """Shape rows as a bare array (unpaginated) or an ``items`` page."""
+    if not query.paginate:
+        return rows
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+def listing_variant(full_path: str, ndjson: bool) -> str:
+    """Identify one representation of a listing for ETags and the result cache."""
+    return full_path + " ndjson" if ndjson else full_path
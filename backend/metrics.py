@@ -0,0 +1,530 @@
+"""
+Request and MongoDB command metrics in Prometheus text format
+
+Every thread records into its own shard (plain dicts, no locks), so the
+request path never contends with other threads or with a scrape. A scrape
+at /metrics copies and merges the shards.
+
+With PROMETHEUS_MULTIPROC_DIR set, every worker process also writes its
+merged values to a file there every METRICS_WRITE_INTERVAL_SECONDS, and a
+scrape of any worker sums the files of all of them, so the totals behind one
+gunicorn port do not depend on which worker answers. The gunicorn hooks in
+gunicorn.conf.py clear the directory at startup and fold the counters of
+exited workers into one file, so totals never go down when a worker is
+recycled.
+"""
+
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Reply sizes require re-encoding every reply to BSON, which costs time in
+# proportion to the data returned, so they are opt-in.
+METRICS_MONGO_REPLY_BYTES = os.getenv("METRICS_MONGO_REPLY_BYTES", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Shared by all workers of one server; named as in prometheus_client
+METRICS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+METRICS_WRITE_INTERVAL_SECONDS = float(os.getenv("METRICS_WRITE_INTERVAL_SECONDS", "5"))
+
+PROMETHEUS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+Labels = Tuple[str, ...]
+_Values = Dict[Tuple[str, Labels], float]
+# Per-bucket (non-cumulative) counts, then +Inf, sum and count
+_Histograms = Dict[Tuple[str, Labels], List[float]]
+
+_RETIRED = "retired"
+
+
+class _Shard:
+    """One thread's measurements."""
+
+    __slots__ = ("values", "histograms")
+
+    def __init__(self):
+        self.values: _Values = {}
+        self.histograms: _Histograms = {}
+
+
+def _add_values(total: _Values, values: _Values):
+    for key, value in values.items():
+        total[key] = total.get(key, 0) + value
+
+
+def _add_histograms(total: _Histograms, histograms: _Histograms):
+    for key, counts in histograms.items():
+        summed = total.get(key)
+        if summed is None:
+            total[key] = list(counts)
+        else:
+            for i, count in enumerate(counts):
+                summed[i] += count
+
+
+class Registry:
+    """Metric definitions plus the per-thread shards that hold their values.
+
+    Args:
+        multiproc_dir: Directory shared with the other worker processes, or
+            empty to report this process only
+    """
+
+    def __init__(self, multiproc_dir: str = ""):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._metrics: List["_Metric"] = []
+        self._multiproc_dir = multiproc_dir
+        self._writer_pid: Optional[int] = None
+
+    def shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            if self._multiproc_dir and self._writer_pid != os.getpid():
+                self._start_writer()
+        return shard
+
+    def register(self, metric: "_Metric") -> "_Metric":
+        self._metrics.append(metric)
+        return metric
+
+    def reset(self):
+        """Forget all values (e.g. in a forked child)."""
+        with self._lock:
+            self._local = threading.local()
+            self._shards = []
+            self._writer_pid = None
+
+    def _merged(self) -> Tuple[_Values, _Histograms]:
+        with self._lock:
+            shards = list(self._shards)
+
+        values: _Values = {}
+        histograms: _Histograms = {}
+        for shard in shards:
+            # dict.copy() is a single call under the GIL, so the owning
+            # thread can keep writing while we read
+            _add_values(values, shard.values.copy())
+            _add_histograms(histograms, shard.histograms.copy())
+        return values, histograms
+
+    # ==================== Multi-process ====================
+
+    def _path(self, name) -> str:
+        return os.path.join(self._multiproc_dir, f"metrics-{name}.json")
+
+    def _locked(self, operation: int):
+        """Lock the shared directory; retire() and scrapes must not interleave."""
+        handle = open(os.path.join(self._multiproc_dir, ".lock"), "a")
+        fcntl.flock(handle, operation)
+        return handle
+
+    def _start_writer(self):
+        with self._lock:
+            if self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+        threading.Thread(
+            target=self._run_writer, name="metrics-write", daemon=True
+        ).start()
+
+    def _run_writer(self):
+        while True:
+            time.sleep(METRICS_WRITE_INTERVAL_SECONDS)
+            try:
+                self.write()
+            except OSError as e:
+                logging.warning(
+                    f"⚠️  Could not write metrics to {self._multiproc_dir}: {e}"
+                )
+
+    def write(self, name=None):
+        """Write this process's values to its file in the shared directory."""
+        values, histograms = self._merged()
+        os.makedirs(self._multiproc_dir, exist_ok=True)
+        _write_file(self._path(name or os.getpid()), values, histograms)
+
+    def retire(self, pid: int):
+        """Fold an exited worker's counters into the retired totals.
+
+        Its gauges are dropped: they described requests that are gone.
+        Called by the gunicorn master after the worker has written its
+        final values.
+        """
+        if not self._multiproc_dir:
+            return
+        path = self._path(pid)
+        with self._locked(fcntl.LOCK_EX):
+            try:
+                values, histograms = _read_file(path)
+            except FileNotFoundError:
+                return
+            retired_values, retired_histograms = self._read_retired()
+            for key, value in values.items():
+                if self._kind(key[0]) != "gauge":
+                    retired_values[key] = retired_values.get(key, 0) + value
+            _add_histograms(retired_histograms, histograms)
+            _write_file(self._path(_RETIRED), retired_values, retired_histograms)
+            os.remove(path)
+
+    def _read_retired(self) -> Tuple[_Values, _Histograms]:
+        try:
+            return _read_file(self._path(_RETIRED))
+        except FileNotFoundError:
+            return {}, {}
+
+    def _kind(self, name: str) -> str:
+        for metric in self._metrics:
+            if metric.name == name:
+                return metric.kind
+        return ""
+
+    def _collected(self) -> Tuple[_Values, _Histograms]:
+        """Sum the files of every process, with this one's values fresh."""
+        self.write()
+        values: _Values = {}
+        histograms: _Histograms = {}
+        with self._locked(fcntl.LOCK_SH):
+            for path in glob.glob(self._path("*")):
+                try:
+                    file_values, file_histograms = _read_file(path)
+                except (FileNotFoundError, ValueError):
+                    continue  # replaced or half-written by another process
+                _add_values(values, file_values)
+                _add_histograms(histograms, file_histograms)
+        return values, histograms
+
+    def clear(self):
+        """Remove the files of a previous server run."""
+        if not self._multiproc_dir:
+            return
+        os.makedirs(self._multiproc_dir, exist_ok=True)
+        for path in glob.glob(self._path("*")):
+            os.remove(path)
+
+    def render(self) -> str:
+        """Encode every metric in the Prometheus text exposition format."""
+        if self._multiproc_dir:
+            values, histograms = self._collected()
+        else:
+            values, histograms = self._merged()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if metric.kind == "histogram":
+                metric.render_histogram(lines, histograms)
+            else:
+                for (name, labels), value in sorted(values.items()):
+                    if name == metric.name:
+                        lines.append(
+                            f"{name}{metric.format_labels(labels)} {_number(value)}"
+                        )
+        return "\n".join(lines) + "\n"
+
+
+def _write_file(path: str, values: _Values, histograms: _Histograms):
+    data = {
+        "values": [[name, labels, value] for (name, labels), value in values.items()],
+        "histograms": [
+            [name, labels, counts] for (name, labels), counts in histograms.items()
+        ],
+    }
+    # Written aside and renamed, so readers never see a partial file
+    temporary = f"{path}.{threading.get_ident()}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(data, f)
+    os.replace(temporary, path)
+
+
+def _read_file(path: str) -> Tuple[_Values, _Histograms]:
+    with open(path) as f:
+        data = json.load(f)
+    values = {(name, tuple(labels)): value for name, labels, value in data["values"]}
+    histograms = {
+        (name, tuple(labels)): counts for name, labels, counts in data["histograms"]
+    }
+    return values, histograms
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(
+        self,
+        registry: Registry,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+    ):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def format_labels(self, labels: Labels, extra: str = "") -> str:
+        pairs = [
+            f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels: Labels = (), amount: float = 1):
+        values = self.registry.shard().values
+        key = (self.name, labels)
+        values[key] = values.get(key, 0) + amount
+
+
+class Gauge(Counter):
+    """A per-process gauge; inc() and dec() may happen on different threads."""
+
+    kind = "gauge"
+
+    def dec(self, labels: Labels = (), amount: float = 1):
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        registry,
+        name,
+        documentation,
+        labelnames=(),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels: Labels, value: float):
+        histograms = self.registry.shard().histograms
+        key = (self.name, labels)
+        counts = histograms.get(key)
+        if counts is None:
+            counts = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def render_histogram(self, lines: List[str], histograms):
+        for (name, labels), counts in sorted(histograms.items()):
+            if name != self.name:
+                continue
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(
+                    f"{name}_bucket{self.format_labels(labels, le)} {cumulative}"
+                )
+            lines.append(
+                f"{name}_sum{self.format_labels(labels)} {_number(counts[-2])}"
+            )
+            lines.append(
+                f"{name}_count{self.format_labels(labels)} {_number(counts[-1])}"
+            )
+
+
+registry = Registry(METRICS_MULTIPROC_DIR)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=registry.reset)
+
+REQUESTS = Counter(
+    registry,
+    "http_requests_total",
+    "HTTP requests handled, by route and status.",
+    ("method", "route", "status"),
+)
+REQUEST_DURATION = Histogram(
+    registry,
+    "http_request_duration_seconds",
+    "Time spent in the request handler.",
+    ("method", "route"),
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    registry, "http_requests_in_flight", "HTTP requests currently being handled."
+)
+
+MONGO_COMMANDS = Counter(
+    registry,
+    "mongodb_commands_total",
+    "MongoDB commands, by collection, command and outcome.",
+    ("collection", "command", "outcome"),
+)
+MONGO_COMMAND_DURATION = Histogram(
+    registry,
+    "mongodb_command_duration_seconds",
+    "MongoDB command round-trip time.",
+    ("collection", "command"),
+)
+MONGO_DOCUMENTS_RETURNED = Counter(
+    registry,
+    "mongodb_documents_returned_total",
+    "Documents returned by MongoDB commands.",
+    ("collection", "command"),
+)
+MONGO_REPLY_BYTES = Counter(
+    registry,
+    "mongodb_reply_bytes_total",
+    "BSON size of MongoDB replies (only with METRICS_MONGO_REPLY_BYTES=true).",
+    ("collection", "command"),
+)
+
+
+# ==================== MongoDB ====================
+
+
+def _command_collection(command_name: str, command) -> str:
+    target = command.get(command_name)
+    if isinstance(target, str):
+        return target
+    # getMore names the collection separately; admin commands have none
+    return command.get("collection", "")
+
+
+def _documents_returned(reply) -> int:
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or ())
+    if "value" in reply:  # findAndModify
+        return 1 if reply["value"] is not None else 0
+    return 0
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Record duration, documents and outcome of every MongoDB command.
+
+    pymongo publishes a command's started and finished events on the same
+    thread, so the collection name is carried between them per thread.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _pending(self) -> Dict[int, str]:
+        pending = getattr(self._local, "pending", None)
+        if pending is None:
+            pending = self._local.pending = {}
+        return pending
+
+    def started(self, event):
+        self._pending()[event.request_id] = _command_collection(
+            event.command_name, event.command
+        )
+
+    def succeeded(self, event):
+        collection = self._pending().pop(event.request_id, "")
+        labels = (collection, event.command_name)
+        MONGO_COMMANDS.inc((collection, event.command_name, "success"))
+        MONGO_COMMAND_DURATION.observe(labels, event.duration_micros / 1e6)
+
+        documents = _documents_returned(event.reply)
+        if documents:
+            MONGO_DOCUMENTS_RETURNED.inc(labels, documents)
+        if METRICS_MONGO_REPLY_BYTES:
+            from bson import encode
+
+            MONGO_REPLY_BYTES.inc(labels, len(encode(event.reply)))
+
+    def failed(self, event):
+        collection = self._pending().pop(event.request_id, "")
+        MONGO_COMMANDS.inc((collection, event.command_name, "failure"))
+        MONGO_COMMAND_DURATION.observe(
+            (collection, event.command_name), event.duration_micros / 1e6
+        )
+
+
+def mongo_event_listeners() -> list:
+    """Listeners to pass to MongoClient(event_listeners=...)."""
+    return [CommandMetricsListener()] if METRICS_ENABLED else []
+
+
+# ==================== Flask ====================
+
+
+def instrument_flask(app):
+    """Time every request and count it by route template and status.
+
+    Register before other before_request hooks, so that requests they
+    answer early (e.g. 503 while starting) are still measured.
+    """
+    if not METRICS_ENABLED:
+        return
+
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def _record(response):
+        started: Optional[float] = g.pop("metrics_started", None)
+        if started is not None:
+            REQUESTS_IN_FLIGHT.dec()
+            # The URL rule, not the path, so ids do not explode cardinality
+            route = (
+                request.url_rule.rule if request.url_rule is not None else "unmatched"
+            )
+            REQUEST_DURATION.observe(
+                (request.method, route), time.perf_counter() - started
+            )
+            REQUESTS.inc((request.method, route, str(response.status_code)))
+        return response
+
+    @app.teardown_request
+    def _abandon(exc):
+        # after_request did not run (e.g. the client went away mid-request)
+        if g.pop("metrics_started", None) is not None:
+            REQUESTS_IN_FLIGHT.dec()
@@ -2,57 +2,59 @@
 Database models for Canner application using MongoDB
 """
 
-from typing import Any, Dict, List
-
-
-class Response:
-    """Model representing a saved response."""
-
-    def __init__(
-        self,
-        id: str,
-        title: str,
-        content: str,
-        tags: List[str] = None,
-        created_at: str = None,
-        updated_at: str = None,
-    ):
-        self.id = id
-        self.title = title
-        self.content = content
-        self.tags = tags or []
-        self.created_at = created_at
-        self.updated_at = updated_at
-
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert response to dictionary."""
-        return {
-            "id": str(self.id),
-            "title": self.title,
-            "content": self.content,
-            "tags": self.tags,
-            "created_at": self.created_at,
-            "updated_at": self.updated_at,
-        }
-
-    @staticmethod
-    def from_db_row(doc: Dict[str, Any]) -> "Response":
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+class Response(NamedTuple):
+    """Model representing a saved response.
+
+    Immutable, and a tuple underneath, so an instance carries no per-object
+    ``__dict__``. Timestamps are kept as the datetimes read from MongoDB.
+    The API shape is produced from documents by serialization.response_row(),
+    not from this model.
+    """
+
+    id: str
+    title: str
+    content: str
+    tags: Tuple[str, ...] = ()
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    revision: int = 0
+    user_id: Optional[str] = None
+    usage_count: int = 0
+    last_used_at: Optional[datetime] = None
+
+    @classmethod
+    def from_db_row(cls, doc: Dict[str, Any]) -> "Response":
         """Create Response from MongoDB document.
-        
+
         Args:
             doc: MongoDB document from collection
         """
-        # MongoDB uses _id (ObjectId) instead of id (UUID)
-        # Tags are already a list in MongoDB
-        tags = doc.get("tags", [])
-        if tags is None:
-            tags = []
-            
-        return Response(
-            id=str(doc["_id"]),  # ObjectId to string
-            title=doc["title"],
-            content=doc["content"],
-            tags=tags,
-            created_at=doc["created_at"].isoformat() if doc.get("created_at") else None,
-            updated_at=doc["updated_at"].isoformat() if doc.get("updated_at") else None,
-        )
+        return cls.from_docs((doc,))[0]
+
+    @classmethod
+    def from_docs(cls, docs: Iterable[Dict[str, Any]]) -> List["Response"]:
+        """Create Responses from a cursor or list of MongoDB documents.
+
+        Builds each tuple directly, skipping the per-row keyword argument
+        handling of the generated constructor.
+        """
+        new = tuple.__new__
+        return [
+            new(cls, (
+                str(doc['_id']),  # ObjectId to string
+                doc['title'],
+                doc['content'],
+                tuple(doc.get('tags') or ()),
+                doc.get('created_at'),
+                doc.get('updated_at'),
+                doc.get('revision', 0),
+                doc.get('user_id'),
+                doc.get('usage_count', 0),
+                doc.get('last_used_at'),
+            ))
+            for doc in docs
+        ]
@@ -0,0 +1,94 @@
+"""
+Keyset (cursor) pagination for canned response listings using MongoDB
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import DESCENDING
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Listings are ordered newest first; _id breaks ties between documents
+# created in the same millisecond so every page boundary is unambiguous.
+SORT_ORDER = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+# sort=most_used: most used first, then as above. Counts keep changing, so
+# this order is served as a single page rather than through cursors.
+MOST_USED_ORDER = [("usage_count", DESCENDING)] + SORT_ORDER
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+def parse_limit(value: Optional[str]) -> int:
+    """Parse the ``limit`` query parameter, clamped to MAX_PAGE_SIZE.
+
+    Raises:
+        ValueError: If the value is not a positive integer
+    """
+    if value is None or value == "":
+        return DEFAULT_PAGE_SIZE
+
+    limit = int(value)
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """Build an opaque cursor pointing just past ``doc``."""
+    created_at = doc["created_at"]
+    millis = (created_at - _EPOCH) // timedelta(milliseconds=1)
+    raw = json.dumps({"t": millis, "id": str(doc["_id"])}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Decode a cursor produced by encode_cursor().
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = _EPOCH + timedelta(milliseconds=int(data["t"]))
+        return created_at, ObjectId(data["id"])
+    except (binascii.Error, ValueError, TypeError, KeyError, InvalidId):
+        raise InvalidCursorError("Invalid cursor")
+
+
+def apply_cursor(query: Dict[str, Any], cursor: Optional[str]) -> Dict[str, Any]:
+    """Restrict ``query`` to documents that sort after ``cursor``."""
+    if not cursor:
+        return query
+
+    created_at, object_id = decode_cursor(cursor)
+    after = {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": object_id}},
+        ]
+    }
+    return {"$and": [query, after]}
+
+
+def split_page(
+    docs: List[Dict[str, Any]], limit: int
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Split up to ``limit + 1`` fetched documents into a page and next cursor."""
+    if len(docs) <= limit:
+        return docs, None
+
+    docs = docs[:limit]
+    return docs, encode_cursor(docs[-1])
@@ -0,0 +1,113 @@
+"""
+Field selection and content previews pushed down to MongoDB projections
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+from search import DOCUMENT_PROJECTION
+
+# Public field name -> stored field name
+RESPONSE_FIELDS = {
+    "id": "_id",
+    "title": "title",
+    "content": "content",
+    "tags": "tags",
+    "user_id": "user_id",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+    "revision": "revision",
+    "usage_count": "usage_count",
+    "last_used_at": "last_used_at",
+}
+
+# Written behind by usage flushes (see usage.py); listings returning them
+# depend on the usage version
+USAGE_FIELDS = ("usage_count", "last_used_at")
+
+# Enough of a response to build its ETag (see make_document_etag)
+REVISION_PROJECTION = {"revision": 1}
+
+MAX_PREVIEW_CHARS = 1000
+
+
+class InvalidProjectionError(ValueError):
+    """Raised when ``fields`` or ``preview`` cannot be parsed."""
+
+
+def parse_fields(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Parse ``fields=id,title,tags`` into a tuple of public field names.
+
+    Returns:
+        Requested fields in a stable order, or None for all fields
+
+    Raises:
+        InvalidProjectionError: If an unknown field is requested
+    """
+    if not value:
+        return None
+
+    requested = {name.strip() for name in value.split(",") if name.strip()}
+    unknown = requested - RESPONSE_FIELDS.keys()
+    if unknown:
+        raise InvalidProjectionError(f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    # id is always returned so clients can fetch the full document later
+    requested.add("id")
+    return tuple(name for name in RESPONSE_FIELDS if name in requested)
+
+
+def parse_preview(value: Optional[str]) -> Optional[int]:
+    """Parse ``preview=<n>``, the number of content characters to return.
+
+    Raises:
+        InvalidProjectionError: If the value is not a positive integer
+    """
+    if not value:
+        return None
+
+    try:
+        chars = int(value)
+    except ValueError:
+        raise InvalidProjectionError("preview must be a positive integer")
+    if chars < 1:
+        raise InvalidProjectionError("preview must be a positive integer")
+    return min(chars, MAX_PREVIEW_CHARS)
+
+
+def build_projection(
+    fields: Optional[Tuple[str, ...]], preview: Optional[int], paginate: bool = False
+) -> Dict[str, Any]:
+    """Build the MongoDB projection for the requested fields and preview.
+
+    With a preview, content is cut server-side with ``$substrCP`` and a
+    ``content_truncated`` flag is computed, so full bodies never leave MongoDB.
+
+    Args:
+        fields: Public field names from parse_fields(), or None for all
+        preview: Preview length from parse_preview(), or None for full content
+        paginate: Keep created_at, which keyset cursors are built from
+
+    Returns:
+        A projection document; whole documents minus internal search grams
+        when neither fields nor preview are requested
+    """
+    if fields is None and preview is None:
+        return dict(DOCUMENT_PROJECTION)
+
+    names = fields if fields is not None else tuple(RESPONSE_FIELDS)
+    projection: Dict[str, Any] = {
+        RESPONSE_FIELDS[name]: 1 for name in names if name != "id"
+    }
+
+    if paginate:
+        projection["created_at"] = 1
+
+    if preview is not None:
+        projection["content"] = {
+            "$substrCP": [{"$ifNull": ["$content", ""]}, 0, preview]
+        }
+        projection["content_truncated"] = {
+            "$gt": [{"$strLenCP": {"$ifNull": ["$content", ""]}}, preview]
+        }
+
+    return projection
@@ -0,0 +1,458 @@
+"""
+One user's canned responses: every query and write on the collection
+
+The Flask routes and DatabaseService both go through ResponseRepository,
+which adds the owner's user_id to every filter and every new document,
+uses the projections and sort order the indexes are built for, and
+propagates every write with record_write(). Reads return MongoDB documents
+as stored, for serialization.response_row() or models.Response.from_docs().
+
+Listing queries are also available as a FindSpec, which the ASGI app runs
+on Motor, so both apps send the same scoped query.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from batch import UPDATABLE_FIELDS, execute_batch
+from bson import ObjectId
+from bson.errors import InvalidId
+from library_version import (
+    LibraryVersions,
+    RevisionConflictError,
+    bump_library_version,
+    get_library_version,
+    get_library_versions,
+    revision_filter,
+)
+from listing import ListingQuery
+from pagination import (
+    DEFAULT_PAGE_SIZE,
+    MOST_USED_ORDER,
+    SORT_ORDER,
+    apply_cursor,
+    split_page,
+)
+from pymongo import ReturnDocument
+from result_cache import result_cache
+from search import (
+    DOCUMENT_PROJECTION,
+    ranked_search,
+    run_search,
+    search_gram_updates,
+    search_grams,
+)
+from serialization import utcnow
+from streaming import STREAM_BATCH_SIZE, prime_cursor
+from suggest import PrefixIndex, suggest_indexes
+from sync import fetch_changes, record_tombstones
+from usage import usage_buffer
+
+RESPONSES_COLLECTION = "canned_responses"
+
+
+class InvalidResponseIdError(ValueError):
+    """Raised when a response id is not a valid ObjectId (HTTP 400)."""
+
+
+def parse_response_id(response_id: str) -> ObjectId:
+    """Convert a public response id to its ObjectId."""
+    try:
+        return ObjectId(response_id)
+    except (InvalidId, TypeError):
+        raise InvalidResponseIdError("Invalid response ID")
+
+
+def record_write(
+    db,
+    user_id: Optional[str],
+    upserted: Iterable[dict] = (),
+    deleted_ids: Iterable[ObjectId] = (),
+) -> int:
+    """Propagate a completed write to everything derived from the library.
+
+    Records deletion tombstones for delta sync, bumps the user's library
+    version (invalidating ETags), drops cached results and updates the
+    in-memory suggestion index. Call once per write request, after the
+    write itself succeeded.
+
+    Args:
+        db: MongoDB database instance
+        user_id: Owner of the written documents
+        upserted: Created or updated documents, as stored
+        deleted_ids: ObjectIds of deleted documents
+
+    Returns:
+        The new library version
+    """
+    deleted_ids = list(deleted_ids)
+    record_tombstones(db, user_id, deleted_ids)
+
+    version = bump_library_version(db, user_id)
+    result_cache.invalidate_user(user_id)
+    suggest_indexes.apply_changes(
+        user_id, version, upserted=upserted, deleted_ids=deleted_ids
+    )
+    return version
+
+
+class FindSpec(NamedTuple):
+    """One listing find(): filter, projection, sort and how to cut the result.
+
+    Built by ResponseRepository.find_spec(); cursor() works on a pymongo or
+    a Motor collection.
+    """
+
+    filter: Dict[str, Any]
+    projection: Optional[Dict[str, Any]]
+    sort: List[Tuple[str, int]]
+    limit: int = 0  # 0: no limit
+    page_size: Optional[int] = None  # keyset page: limit is page_size + 1
+    stream: bool = False
+
+    def cursor(self, collection):
+        """The cursor running this spec on ``collection``."""
+        found = collection.find(self.filter, self.projection).sort(self.sort)
+        if self.limit:
+            found = found.limit(self.limit)
+        if self.stream:
+            found = found.batch_size(STREAM_BATCH_SIZE)
+        return found
+
+    def result(
+        self, docs: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """The fetched documents and the next page's cursor, if any."""
+        if self.page_size is None:
+            return docs, None
+        return split_page(docs, self.page_size)
+
+
+class ResponseRepository:
+    """The canned responses of one user.
+
+    Only scoped() and the *_spec() methods, which build queries without
+    running them, may be used with a Motor database.
+    """
+
+    __slots__ = ("db", "collection", "user_id")
+
+    def __init__(self, db, user_id: str):
+        if not user_id:
+            raise ValueError("ResponseRepository requires a user_id")
+        self.db = db
+        self.collection = db[RESPONSES_COLLECTION]
+        self.user_id = user_id
+
+    def scoped(self, query: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Restrict ``query`` to this user's documents.
+
+        The owner is applied last, so no clause can widen the scope.
+        """
+        return (
+            {**query, "user_id": self.user_id} if query else {"user_id": self.user_id}
+        )
+
+    # ==================== Reads ====================
+
+    def library_version(self) -> int:
+        """Current library version, bumped by every write (see ETags)."""
+        return get_library_version(self.db, self.user_id)
+
+    def library_versions(self) -> LibraryVersions:
+        """Library and usage versions, for listing ETags."""
+        return get_library_versions(self.db, self.user_id)
+
+    def find(
+        self,
+        search: str = "",
+        paginate: bool = False,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        stream: bool = False,
+        projection: Optional[Dict[str, Any]] = DOCUMENT_PROJECTION,
+        most_used: bool = False,
+    ) -> Tuple[Iterable[Dict[str, Any]], Optional[str]]:
+        """Find responses newest first, as one keyset page, a full list or a stream.
+
+        Args:
+            search: Optional search term (see search.run_search)
+            paginate: Return one page of ``limit`` documents after ``cursor``
+            stream: Return a lazily consumed iterator over the cursor
+            most_used: Order by usage_count instead; with ``paginate`` only
+                the first ``limit`` documents are returned, never a cursor
+
+        Returns:
+            Tuple of (documents, next_cursor); next_cursor is None unless
+            paginating and another page exists
+
+        Raises:
+            InvalidCursorError: If the cursor is malformed
+        """
+
+        def run(clause):
+            spec = self.find_spec(
+                clause, paginate, limit, cursor, stream, projection, most_used
+            )
+            found = spec.cursor(self.collection)
+            if spec.stream:
+                return prime_cursor(found), None
+            # Materialized here so search errors reach run_search()
+            return spec.result(list(found))
+
+        if search and search.strip():
+            return run_search(search, run)
+        return run({})
+
+    def find_spec(
+        self,
+        clause: Optional[Dict[str, Any]],
+        paginate: bool = False,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        stream: bool = False,
+        projection: Optional[Dict[str, Any]] = DOCUMENT_PROJECTION,
+        most_used: bool = False,
+    ) -> FindSpec:
+        """The query find() runs for one search ``clause`` (or None), unexecuted.
+
+        Raises:
+            InvalidCursorError: If the cursor is malformed
+        """
+        query = self.scoped(clause)
+        if paginate and not most_used:
+            # One extra document tells whether another page exists
+            return FindSpec(
+                apply_cursor(query, cursor),
+                projection,
+                SORT_ORDER,
+                limit + 1,
+                page_size=limit,
+            )
+        sort = MOST_USED_ORDER if most_used else SORT_ORDER
+        if paginate:
+            return FindSpec(query, projection, sort, limit)
+        return FindSpec(query, projection, sort, stream=stream)
+
+    def listing_spec(
+        self, query: ListingQuery, clause: Optional[Dict[str, Any]]
+    ) -> FindSpec:
+        """find_spec() for a parsed GET /api/responses query (not relevance-ranked)."""
+        return self.find_spec(
+            clause,
+            query.paginate,
+            query.limit,
+            query.cursor,
+            query.stream,
+            query.projection,
+            query.most_used,
+        )
+
+    def search(
+        self,
+        search: str,
+        limit: int,
+        projection: Optional[Dict[str, Any]] = DOCUMENT_PROJECTION,
+        preview: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """The ``limit`` responses that best match ``search``, best first, with their ``score``."""
+        return ranked_search(
+            self.collection, self.scoped(), search, limit, projection, preview
+        )
+
+    def listing(
+        self, query: ListingQuery
+    ) -> Tuple[Iterable[Dict[str, Any]], Optional[str]]:
+        """Documents for a parsed GET /api/responses query, and the next cursor."""
+        if query.relevance:
+            return (
+                self.search(query.search, query.top_k, query.projection, query.preview),
+                None,
+            )
+        return self.find(
+            query.search,
+            query.paginate,
+            query.limit,
+            query.cursor,
+            query.stream,
+            query.projection,
+            query.most_used,
+        )
+
+    def get(
+        self,
+        response_id: str,
+        projection: Optional[Dict[str, Any]] = DOCUMENT_PROJECTION,
+    ) -> Optional[Dict[str, Any]]:
+        """One response, or None if it does not exist or belongs to another user.
+
+        Args:
+            response_id: The response's id
+            projection: Fields to load; pass REVISION_PROJECTION to read only
+                what an ETag needs
+
+        Raises:
+            InvalidResponseIdError: If ``response_id`` is malformed
+        """
+        return self.collection.find_one(
+            self.scoped({"_id": parse_response_id(response_id)}), projection
+        )
+
+    def changes(self, since: Optional[datetime]):
+        """Changed and deleted responses since ``since`` (see sync.fetch_changes)."""
+        return fetch_changes(self.db, self.user_id, since)
+
+    def suggest_index(self) -> PrefixIndex:
+        """The in-memory autocomplete index, loaded on first use."""
+        return suggest_indexes.get(
+            self.user_id,
+            load_version=self.library_version,
+            load_docs=lambda: self.collection.find(
+                self.scoped(), {"title": 1, "content": 1, "tags": 1, "created_at": 1}
+            ),
+        )
+
+    # ==================== Writes ====================
+
+    def record_use(self, response_id: str):
+        """Count one use (e.g. an insertion by the extension), written behind.
+
+        The increment is buffered and flushed in bulk (see usage.py); ids
+        that do not exist or belong to another user match nothing then.
+
+        Raises:
+            InvalidResponseIdError: If ``response_id`` is malformed
+        """
+        usage_buffer.record(self.user_id, parse_response_id(response_id))
+
+    def _new_document(
+        self, title: str, content: str, tags: List[str], now: datetime
+    ) -> Dict[str, Any]:
+        doc = {
+            "title": title,
+            "content": content,
+            "tags": tags,
+            "user_id": self.user_id,
+            "created_at": now,
+            "updated_at": now,
+            "revision": 1,
+        }
+        doc["search_grams"] = search_grams(doc)
+        return doc
+
+    def create(
+        self, title: str, content: str, tags: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Insert a response and return it as stored."""
+        doc = self._new_document(title, content, tags or [], utcnow())
+        doc["_id"] = self.collection.insert_one(doc).inserted_id
+        record_write(self.db, self.user_id, upserted=[doc])
+        return doc
+
+    def create_many(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert many responses with a single insert_many.
+
+        Args:
+            items: Dicts with ``title``, ``content`` and optional ``tags``
+        """
+        now = utcnow()
+        docs = [
+            self._new_document(
+                item["title"], item["content"], item.get("tags", []), now
+            )
+            for item in items
+        ]
+        if not docs:
+            return []
+
+        self.collection.insert_many(docs)
+        record_write(self.db, self.user_id, upserted=docs)
+        return docs
+
+    def update(
+        self,
+        response_id: str,
+        fields: Dict[str, Any],
+        revisions: Optional[List[int]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Update title, content and/or tags and return the new document.
+
+        Ownership, and the expected revision when given, are part of the
+        filter, so the check, the write and reading the result back are one
+        atomic find_one_and_update. record_write() then bumps the library
+        version, a second round trip; a failed If-Match costs one more to
+        tell 412 from 404.
+
+        Args:
+            fields: New values; keys other than title, content and tags are ignored
+            revisions: Only update if the stored revision is one of these
+
+        Returns:
+            The updated document, or None if there is no such response
+
+        Raises:
+            InvalidResponseIdError: If ``response_id`` is malformed
+            RevisionConflictError: If the stored revision is not in ``revisions``
+        """
+        object_id = parse_response_id(response_id)
+        query = self.scoped({"_id": object_id})
+        if revisions is not None:
+            query.update(revision_filter(revisions))
+
+        update_fields = {"updated_at": utcnow()}
+        for name in UPDATABLE_FIELDS:
+            if name in fields:
+                update_fields[name] = fields[name]
+        update_fields.update(search_gram_updates(update_fields))
+
+        doc = self.collection.find_one_and_update(
+            query,
+            {"$set": update_fields, "$inc": {"revision": 1}},
+            projection=DOCUMENT_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        )
+
+        if doc is None:
+            # Only a failed precondition needs a second look to tell 412 from 404
+            if revisions is not None and self.collection.find_one(
+                self.scoped({"_id": object_id}), {"_id": 1}
+            ):
+                raise RevisionConflictError(f"Response {response_id} was modified")
+            return None
+
+        record_write(self.db, self.user_id, upserted=[doc])
+        return doc
+
+    def delete(self, response_id: str) -> bool:
+        """Delete a response; False if there is no such response.
+
+        Raises:
+            InvalidResponseIdError: If ``response_id`` is malformed
+        """
+        object_id = parse_response_id(response_id)
+        doc = self.collection.find_one_and_delete(
+            self.scoped({"_id": object_id}), projection={"_id": 1}
+        )
+        if doc is None:
+            return False
+
+        # Tombstone, version bump and cache invalidation for the deletion
+        record_write(self.db, self.user_id, deleted_ids=[object_id])
+        return True
+
+    def apply_batch(
+        self, operations: List[Any], ordered: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Apply mixed create/update/delete operations with one bulk_write.
+
+        Returns:
+            Per-operation results (see batch.execute_batch)
+        """
+        results, upserted, deleted_ids = execute_batch(
+            self.collection, self.user_id, operations, ordered, self._new_document
+        )
+        if upserted or deleted_ids:
+            record_write(
+                self.db, self.user_id, upserted=upserted, deleted_ids=deleted_ids
+            )
+        return results
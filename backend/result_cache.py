@@ -0,0 +1,145 @@
+"""
+In-process cache of serialized list/search results, scoped per user
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_MAX_ENTRY_BYTES = int(
+    os.getenv("RESULT_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024))
+)
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+
+
+class ResultCache:
+    """Bounded LRU/TTL cache of already-encoded response bodies.
+
+    Entries are keyed by ``(user_id, variant)`` where the variant identifies
+    the query (path, search term, page). Each entry remembers the library
+    version it was produced from (with the usage version for listings that
+    show usage, see LibraryVersions), so a lookup with a newer version is a miss
+    even if the write happened in another process. Writes in this process
+    drop the user's entries immediately via invalidate_user().
+    """
+
+    def __init__(
+        self,
+        enabled: bool = RESULT_CACHE_ENABLED,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        max_entry_bytes: int = RESULT_CACHE_MAX_ENTRY_BYTES,
+        ttl_seconds: float = RESULT_CACHE_TTL_SECONDS,
+    ):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (body, version, expires_at)
+        self._entries: "OrderedDict[Tuple[Hashable, str], Tuple[bytes, int, float]]" = (
+            OrderedDict()
+        )
+        self._keys_by_user: Dict[Hashable, Set[Tuple[Hashable, str]]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(
+        self, user_id: Hashable, variant: str, version: Hashable
+    ) -> Optional[bytes]:
+        """Return the cached body for this query at ``version``, if any."""
+        if not self.enabled:
+            return None
+
+        key = (user_id, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            body, cached_version, expires_at = entry
+            if cached_version != version or expires_at < time.monotonic():
+                self._discard(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, user_id: Hashable, variant: str, version: Hashable, body: bytes):
+        """Store an encoded body produced at ``version``."""
+        if not self.enabled or len(body) > self.max_entry_bytes:
+            return
+
+        key = (user_id, variant)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (body, version, time.monotonic() + self.ttl_seconds)
+            self._keys_by_user.setdefault(user_id, set()).add(key)
+            self._bytes += len(body)
+
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: Hashable):
+        """Drop every cached result for ``user_id`` (call after each write)."""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            keys = self._keys_by_user.pop(user_id, ())
+            for key in list(keys):
+                self._discard(key)
+            self.invalidations += 1
+
+    def clear(self):
+        """Drop all cached results."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters suitable for health/metrics output."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _discard(self, key: Tuple[Hashable, str]):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        self._bytes -= len(entry[0])
+        user_keys = self._keys_by_user.get(key[0])
+        if user_keys is not None:
+            user_keys.discard(key)
+            if not user_keys:
+                del self._keys_by_user[key[0]]
+
+
+# Process-wide cache shared by the Flask routes and DatabaseService
+result_cache = ResultCache()
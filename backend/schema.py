@@ -0,0 +1,253 @@
+"""
+Versioned schema bootstrap: collections, indexes and data backfills
+
+The applied version is stored in a single document, so a process whose
+schema is already current pays one find_one() on startup instead of
+listing collections and re-issuing every create_index(). Migrations run in
+order, each at most once, under a lease so that concurrent workers or
+replicas never run them side by side.
+
+Run pending migrations out-of-band with ``flask migrate``.
+"""
+
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Callable, List, NamedTuple
+
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from search import backfill_search_grams, ensure_search_indexes
+from sync import ensure_sync_indexes
+
+SCHEMA_COLLECTION = "schema_versions"
+SCHEMA_ID = "canned_responses"
+
+# A migration lease older than this is considered abandoned (e.g. the
+# process running it was killed) and may be taken over.
+SCHEMA_MIGRATION_LOCK_SECONDS = int(os.getenv("SCHEMA_MIGRATION_LOCK_SECONDS", "600"))
+
+
+class MigrationLockedError(RuntimeError):
+    """Raised when another process is currently running migrations."""
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable
+
+
+def _create_responses_collection(db):
+    if "canned_responses" not in db.list_collection_names():
+        db.create_collection("canned_responses")
+
+    collection = db["canned_responses"]
+    try:
+        collection.create_index(
+            [("title", TEXT), ("content", TEXT)],
+            name="idx_canned_responses_text_search",
+            weights={"title": 2, "content": 1},
+            default_language="english",
+        )
+    except OperationFailure:
+        pass  # A text index may already exist under another name
+    collection.create_index(
+        [("tags", ASCENDING)], name="idx_canned_responses_tags", background=True
+    )
+    collection.create_index(
+        [("user_id", ASCENDING)], name="idx_canned_responses_user_id", background=True
+    )
+    collection.create_index(
+        [("created_at", DESCENDING)],
+        name="idx_canned_responses_created_at",
+        background=True,
+    )
+    collection.create_index(
+        [("updated_at", DESCENDING)],
+        name="idx_canned_responses_updated_at",
+        background=True,
+    )
+
+
+def _create_search_grams(db):
+    ensure_search_indexes(db)
+    backfilled = backfill_search_grams(db["canned_responses"])
+    if backfilled:
+        logging.info(f"🔎 Built search grams for {backfilled} responses")
+
+
+def _drop_indexes(collection, names):
+    existing = collection.index_information()
+    for name in names:
+        if name in existing:
+            collection.drop_index(name)
+
+
+def _align_indexes_with_queries(db):
+    """Replace single-field indexes with ones matching the per-user queries.
+
+    Every listing filters on user_id and sorts by SORT_ORDER, so one
+    compound index serves the filter, the sort and keyset pagination. The
+    text index gains a user_id prefix (a collection has only one text
+    index, so the old one goes first). Indexes no query needs are dropped:
+    they only slow down writes.
+    """
+    collection = db["canned_responses"]
+    collection.create_index(
+        [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+        name="idx_canned_responses_user_created_at",
+    )
+
+    _drop_indexes(
+        collection,
+        [
+            name
+            for name, info in collection.index_information().items()
+            if name != "idx_canned_responses_user_text_search"
+            and any(kind == "text" or field == "_fts" for field, kind in info["key"])
+        ],
+    )
+    collection.create_index(
+        [("user_id", ASCENDING), ("title", TEXT), ("content", TEXT)],
+        name="idx_canned_responses_user_text_search",
+        weights={"title": 2, "content": 1},
+        default_language="english",
+    )
+
+    # user_id is a prefix of the compound index; tags are matched through
+    # the (user_id, search_grams.tags) index; created_at / updated_at alone
+    # only served queries that are not scoped to a user.
+    _drop_indexes(
+        collection,
+        [
+            "idx_canned_responses_user_id",
+            "idx_canned_responses_tags",
+            "idx_canned_responses_created_at",
+            "idx_canned_responses_updated_at",
+        ],
+    )
+
+
+def _create_usage_index(db):
+    """Serve sort=most_used from an index, in the same per-user shape as listings.
+
+    Responses never used have no usage_count and sort last.
+    """
+    db["canned_responses"].create_index(
+        [
+            ("user_id", ASCENDING),
+            ("usage_count", DESCENDING),
+            ("created_at", DESCENDING),
+            ("_id", DESCENDING),
+        ],
+        name="idx_canned_responses_user_usage",
+    )
+
+
+# Append new migrations; never edit or reorder applied ones
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1, "canned_responses collection and base indexes", _create_responses_collection
+    ),
+    Migration(2, "delta-sync and tombstone indexes", ensure_sync_indexes),
+    Migration(3, "trigram search indexes and gram backfill", _create_search_grams),
+    Migration(
+        4, "compound per-user indexes, drop redundant ones", _align_indexes_with_queries
+    ),
+    Migration(5, "per-user usage index for sort=most_used", _create_usage_index),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def current_schema_version(db) -> int:
+    """Return the applied schema version (0 for a database never migrated)."""
+    doc = db[SCHEMA_COLLECTION].find_one({"_id": SCHEMA_ID}, {"version": 1})
+    return doc.get("version", 0) if doc else 0
+
+
+def _acquire_lock(db, owner: str):
+    now = datetime.utcnow()
+    try:
+        db[SCHEMA_COLLECTION].update_one(
+            {
+                "_id": SCHEMA_ID,
+                "$or": [{"locked_until": None}, {"locked_until": {"$lt": now}}],
+            },
+            {
+                "$set": {
+                    "locked_by": owner,
+                    "locked_until": now
+                    + timedelta(seconds=SCHEMA_MIGRATION_LOCK_SECONDS),
+                },
+                "$setOnInsert": {"version": 0},
+            },
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # The document exists but its lease is held and unexpired
+        raise MigrationLockedError(
+            "Schema migration already running in another process"
+        )
+
+
+def _release_lock(db, owner: str):
+    db[SCHEMA_COLLECTION].update_one(
+        {"_id": SCHEMA_ID, "locked_by": owner},
+        {"$unset": {"locked_by": "", "locked_until": ""}},
+    )
+
+
+def migrate(db, target: int = SCHEMA_VERSION) -> List[int]:
+    """Apply pending migrations up to ``target``.
+
+    Returns:
+        Versions applied by this call (empty if the schema was current)
+
+    Raises:
+        MigrationLockedError: If another process holds the migration lease
+    """
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    _acquire_lock(db, owner)
+    applied = []
+    try:
+        version = current_schema_version(db)
+        for migration in MIGRATIONS:
+            if version < migration.version <= target:
+                logging.info(
+                    f"🔧 Applying schema migration {migration.version}: {migration.description}"
+                )
+                migration.apply(db)
+                db[SCHEMA_COLLECTION].update_one(
+                    {"_id": SCHEMA_ID},
+                    {
+                        "$set": {
+                            "version": migration.version,
+                            "applied_at": datetime.utcnow(),
+                        }
+                    },
+                )
+                applied.append(migration.version)
+    finally:
+        _release_lock(db, owner)
+    return applied
+
+
+def ensure_schema(db) -> int:
+    """Migrate if needed; a no-op costing one read when already current.
+
+    Returns:
+        The schema version now in place
+
+    Raises:
+        MigrationLockedError: If migrations are pending but another process
+            is running them
+    """
+    version = current_schema_version(db)
+    if version >= SCHEMA_VERSION:
+        return version
+
+    migrate(db)
+    return current_schema_version(db)
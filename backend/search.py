@@ -0,0 +1,411 @@
+"""
+Substring search over canned responses using a trigram index in MongoDB
+
+Every document stores the normalized trigrams of its title, content and tags
+in ``search_grams.<field>``, each covered by a ``(user_id, search_grams.<field>)``
+multikey index. A query is answered by intersecting the query's trigrams
+(``$all``) on the index and only then confirming the exact substring with a
+residual regex on the few candidates, so partial words such as "thx" or
+"regards" never require scanning the user's whole library.
+"""
+
+import logging
+import math
+import os
+import re
+from datetime import datetime
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from pagination import SORT_ORDER
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+
+T = TypeVar("T")
+
+GRAM_SIZE = 3
+SEARCH_FIELDS = ("title", "content", "tags")
+
+# "trigram" searches substrings via the trigram index; "text" tries the
+# MongoDB $text index first and falls back to trigrams if it is unavailable.
+SEARCH_ENGINE = os.getenv("SEARCH_ENGINE", "trigram")
+
+# Default ordering of unpaginated search results: "recent" (every match by
+# created_at) or "relevance" (only the top SEARCH_DEFAULT_LIMIT matches by
+# score, see ranked_search()). Relevance truncates, so it is opt-in.
+SEARCH_RANKING = os.getenv("SEARCH_RANKING", "recent")
+SEARCH_DEFAULT_LIMIT = int(os.getenv("SEARCH_DEFAULT_LIMIT", "50"))
+
+# Relevance blending; both weights default to 0 (pure match score)
+SEARCH_RECENCY_WEIGHT = float(os.getenv("SEARCH_RECENCY_WEIGHT", "0"))
+SEARCH_RECENCY_HALF_LIFE_DAYS = float(os.getenv("SEARCH_RECENCY_HALF_LIFE_DAYS", "30"))
+SEARCH_USAGE_WEIGHT = float(os.getenv("SEARCH_USAGE_WEIGHT", "0"))
+
+# Extra text matches fetched per result when re-ranking with blending
+SEARCH_RERANK_FACTOR = int(os.getenv("SEARCH_RERANK_FACTOR", "4"))
+# Newest trigram matches scored for relevance ranking; older matches are
+# never ranked. 0 scores every match.
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "1000"))
+
+SEARCH_WEIGHTS = {
+    "title": float(os.getenv("SEARCH_WEIGHT_TITLE", "3")),
+    "tags": float(os.getenv("SEARCH_WEIGHT_TAGS", "2")),
+    "content": float(os.getenv("SEARCH_WEIGHT_CONTENT", "1")),
+}
+
+# Trigrams are internal; never ship them to clients.
+DOCUMENT_PROJECTION = {"search_grams": 0}
+
+# Text is padded so that 1- and 2-character queries are still a prefix of
+# some trigram, even at the very end of a field.
+_PADDING = " " * (GRAM_SIZE - 1)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def normalize(text: str) -> str:
+    """Normalize text for searching (case-folded, single-spaced)."""
+    return " ".join(str(text).casefold().split())
+
+
+def text_grams(text: str) -> List[str]:
+    """Return the sorted unique trigrams of ``text``."""
+    text = normalize(text)
+    if not text:
+        return []
+    return sorted(_windows(text + _PADDING))
+
+
+def _windows(text: str) -> set:
+    return {text[i : i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def field_grams(field: str, value: Any) -> List[str]:
+    """Return the trigrams stored for one searchable field."""
+    if field == "tags":
+        grams = set()
+        for tag in value or []:
+            grams.update(text_grams(tag))
+        return sorted(grams)
+    return text_grams(value or "")
+
+
+def search_grams(doc: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Build the ``search_grams`` sub-document for a full document."""
+    return {field: field_grams(field, doc.get(field)) for field in SEARCH_FIELDS}
+
+
+def search_gram_updates(update_fields: Dict[str, Any]) -> Dict[str, List[str]]:
+    """Build ``$set`` entries refreshing grams for the fields being updated.
+
+    Grams are stored per field, so a partial update only needs the values it
+    is writing and no extra read of the document.
+    """
+    return {
+        f"search_grams.{field}": field_grams(field, update_fields[field])
+        for field in SEARCH_FIELDS
+        if field in update_fields
+    }
+
+
+def _residual_pattern(query: str) -> str:
+    # Whitespace in the stored text may differ from the normalized query
+    return r"\s+".join(re.escape(word) for word in query.split())
+
+
+def trigram_query(search: str) -> Optional[Dict[str, Any]]:
+    """Build the query clause matching ``search`` as a substring.
+
+    Returns:
+        A clause to combine with the user filter, or None for a blank search
+    """
+    query = normalize(search)
+    if not query:
+        return None
+
+    pattern = {"$regex": _residual_pattern(query), "$options": "i"}
+    if len(query) >= GRAM_SIZE:
+        # Unpadded: a match need not end where the field ends
+        candidates = {"$all": sorted(_windows(query))}
+    else:
+        # Short queries: any trigram starting with them (anchored regex is an index range)
+        candidates = {"$regex": "^" + re.escape(query)}
+
+    return {
+        "$or": [
+            {f"search_grams.{field}": candidates, field: pattern}
+            for field in SEARCH_FIELDS
+        ]
+    }
+
+
+def text_query(search: str) -> Dict[str, Any]:
+    """Build the MongoDB $text clause for ``search`` (whole stemmed words)."""
+    return {"$text": {"$search": search}}
+
+
+def match_score(doc: Dict[str, Any], query: str) -> float:
+    """Score a trigram match: SEARCH_WEIGHTS of each field containing ``query``.
+
+    A field that starts with the query counts half as much again.
+    """
+    total = 0.0
+    for field, weight in SEARCH_WEIGHTS.items():
+        value = doc.get(field)
+        texts = (
+            [normalize(v) for v in value or []]
+            if field == "tags"
+            else [normalize(value or "")]
+        )
+        for text in texts:
+            position = text.find(query)
+            if position >= 0:
+                total += weight * (1.5 if position == 0 else 1.0)
+                break
+    return total
+
+
+def _blending() -> bool:
+    return SEARCH_RECENCY_WEIGHT > 0 or SEARCH_USAGE_WEIGHT > 0
+
+
+def blend_score(doc: Dict[str, Any], score: float, now: datetime) -> float:
+    """Blend an engine's match score with recency and usage.
+
+    ``score * (1 + SEARCH_RECENCY_WEIGHT * 0.5 ** (age / half-life))
+    + SEARCH_USAGE_WEIGHT * log(1 + usage_count)``; with both weights at 0 (the
+    default) the match score is returned unchanged.
+    """
+    created_at = doc.get("created_at")
+    if SEARCH_RECENCY_WEIGHT > 0 and created_at is not None:
+        age_days = max((now - created_at).total_seconds(), 0) / 86400
+        score *= 1 + SEARCH_RECENCY_WEIGHT * 0.5 ** (
+            age_days / SEARCH_RECENCY_HALF_LIFE_DAYS
+        )
+    if SEARCH_USAGE_WEIGHT > 0:
+        score += SEARCH_USAGE_WEIGHT * math.log1p(doc.get("usage_count") or 0)
+    return score
+
+
+def _top(docs: List[Dict[str, Any]], limit: Optional[int]) -> List[Dict[str, Any]]:
+    # Ties go to the newest document, as in listings
+    docs.sort(
+        key=lambda doc: (doc["score"], doc.get("created_at") or _EPOCH, doc["_id"]),
+        reverse=True,
+    )
+    return docs if limit is None else docs[:limit]
+
+
+def rank_by_relevance(
+    docs: Iterable[Dict[str, Any]], search: str, limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Order trigram matches by relevance to ``search``, best first.
+
+    Sets each document's ``score`` to its blended match_score().
+    """
+    query = normalize(search)
+    now = datetime.utcnow()
+    docs = list(docs)
+    for doc in docs:
+        doc["score"] = blend_score(doc, match_score(doc, query), now)
+    return _top(docs, limit)
+
+
+def _with_ranking_fields(
+    projection: Dict[str, Any], fields: Tuple[str, ...]
+) -> Dict[str, Any]:
+    # Exclusion projections already return every field. Ranking fields are
+    # fetched whole, even where the projection computes a preview of them.
+    if all(value == 0 for key, value in projection.items() if key != "_id"):
+        return dict(projection)
+    return {**projection, **{field: 1 for field in fields}}
+
+
+def _truncate(
+    docs: List[Dict[str, Any]], preview: Optional[int]
+) -> List[Dict[str, Any]]:
+    # The preview a $substrCP projection would have returned (code points)
+    if preview is not None:
+        for doc in docs:
+            if isinstance(doc.get("content"), str):
+                doc["content"] = doc["content"][:preview]
+    return docs
+
+
+def run_search(search: str, run: Callable[[Dict[str, Any]], T]) -> T:
+    """Run a search with the configured engine.
+
+    Args:
+        search: Search term
+        run: Executes the query for a search clause. It must fetch at least
+            the first batch, so that a missing text index raises here and
+            the trigram engine can take over.
+
+    Returns:
+        Whatever ``run`` returns
+    """
+    if SEARCH_ENGINE == "text":
+        try:
+            return run(text_query(search))
+        except OperationFailure as e:
+            logging.warning(f"⚠️  Text search unavailable, using trigram search: {e}")
+    return run(trigram_query(search))
+
+
+async def run_search_async(
+    search: str, run: Callable[[Dict[str, Any]], Awaitable[T]]
+) -> T:
+    """Async variant of run_search() for the Motor-based ASGI app."""
+    if SEARCH_ENGINE == "text":
+        try:
+            return await run(text_query(search))
+        except OperationFailure as e:
+            logging.warning(f"⚠️  Text search unavailable, using trigram search: {e}")
+    return await run(trigram_query(search))
+
+
+def _text_ranking_cursor(collection, base_query, search, limit, projection):
+    text_projection = {
+        **_with_ranking_fields(projection, ("created_at", "usage_count")),
+        "score": {"$meta": "textScore"},
+    }
+    return (
+        collection.find({**base_query, **text_query(search)}, text_projection)
+        .sort([("score", {"$meta": "textScore"})])
+        .limit(limit * SEARCH_RERANK_FACTOR if _blending() else limit)
+    )
+
+
+def _rank_text_matches(docs: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+    if not _blending():
+        return docs
+
+    now = datetime.utcnow()
+    for doc in docs:
+        doc["score"] = blend_score(doc, doc["score"], now)
+    return _top(docs, limit)
+
+
+def _trigram_ranking_cursor(collection, base_query, search, projection):
+    clause = trigram_query(search)
+    if clause is None:
+        return None
+
+    trigram_projection = _with_ranking_fields(
+        projection, SEARCH_FIELDS + ("created_at", "usage_count")
+    )
+    return (
+        collection.find({**base_query, **clause}, trigram_projection)
+        .sort(SORT_ORDER)
+        .limit(SEARCH_MAX_CANDIDATES)
+    )
+
+
+def ranked_search(
+    collection,
+    base_query: Dict[str, Any],
+    search: str,
+    limit: int,
+    projection: Optional[Dict[str, Any]] = None,
+    preview: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Return the ``limit`` best matches for ``search``, each with a ``score``.
+
+    The text engine sorts on ``{'$meta': 'textScore'}`` with a limit, so
+    MongoDB keeps only the top-k instead of materializing every match; when
+    recency or usage are blended in, SEARCH_RERANK_FACTOR times more are
+    fetched and re-ranked. The trigram engine scores at most
+    SEARCH_MAX_CANDIDATES of the newest matches (all with 0), on their full
+    content, so a strong but older match beyond the cap is not returned; a
+    ``preview`` (as in ``projection``) is cut from the top matches afterwards.
+    """
+    projection = projection if projection is not None else dict(DOCUMENT_PROJECTION)
+
+    if SEARCH_ENGINE == "text":
+        try:
+            docs = list(
+                _text_ranking_cursor(collection, base_query, search, limit, projection)
+            )
+            return _rank_text_matches(docs, limit)
+        except OperationFailure as e:
+            logging.warning(f"⚠️  Text search unavailable, using trigram search: {e}")
+
+    cursor = _trigram_ranking_cursor(collection, base_query, search, projection)
+    if cursor is None:
+        return []
+    return _truncate(rank_by_relevance(cursor, search, limit), preview)
+
+
+async def ranked_search_async(
+    collection,
+    base_query: Dict[str, Any],
+    search: str,
+    limit: int,
+    projection: Optional[Dict[str, Any]] = None,
+    preview: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Async variant of ranked_search() for a Motor collection."""
+    projection = projection if projection is not None else dict(DOCUMENT_PROJECTION)
+
+    if SEARCH_ENGINE == "text":
+        try:
+            cursor = _text_ranking_cursor(
+                collection, base_query, search, limit, projection
+            )
+            return _rank_text_matches(await cursor.to_list(None), limit)
+        except OperationFailure as e:
+            logging.warning(f"⚠️  Text search unavailable, using trigram search: {e}")
+
+    cursor = _trigram_ranking_cursor(collection, base_query, search, projection)
+    if cursor is None:
+        return []
+    return _truncate(
+        rank_by_relevance(await cursor.to_list(None), search, limit), preview
+    )
+
+
+def ensure_search_indexes(db):
+    """Create one (user_id, search_grams.<field>) index per searchable field."""
+    collection = db["canned_responses"]
+    for field in SEARCH_FIELDS:
+        collection.create_index(
+            [("user_id", ASCENDING), (f"search_grams.{field}", ASCENDING)],
+            name=f"idx_canned_responses_user_grams_{field}",
+            background=True,
+        )
+
+
+def backfill_search_grams(collection, batch_size: int = 500) -> int:
+    """Compute grams for documents written before the trigram index existed.
+
+    Returns:
+        Number of documents updated
+    """
+    cursor = collection.find(
+        {"search_grams": {"$exists": False}},
+        {field: 1 for field in SEARCH_FIELDS},
+    ).batch_size(batch_size)
+
+    updated = 0
+    requests = []
+    for doc in cursor:
+        requests.append(
+            UpdateOne(
+                {"_id": doc["_id"]}, {"$set": {"search_grams": search_grams(doc)}}
+            )
+        )
+        if len(requests) >= batch_size:
+            updated += collection.bulk_write(requests, ordered=False).modified_count
+            requests = []
+    if requests:
+        updated += collection.bulk_write(requests, ordered=False).modified_count
+    return updated
@@ -0,0 +1,129 @@
+"""
+Fast JSON serialization of canned responses straight from MongoDB documents
+
+Documents are turned into flat rows with a single pass and encoded to bytes
+in one call. orjson is used when installed (it encodes datetimes natively,
+so no per-row isoformat() is needed); otherwise a compact stdlib encoder is
+used. Both produce identical values.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from flask import current_app
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+JSON_MIMETYPE = "application/json"
+
+# orjson encodes datetimes itself; the stdlib encoder would need a Python
+# callback per value, so rows are pre-formatted instead.
+_NATIVE_DATETIMES = orjson is not None
+_DATETIME_FIELDS = ("created_at", "updated_at", "last_used_at")
+
+
+def utcnow() -> datetime:
+    """The current UTC time truncated to milliseconds, the precision BSON stores.
+
+    Timestamps written with it serialize the same when returned straight
+    from a write as when read back.
+    """
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def _default(value: Any) -> Any:
+    """Encode the BSON types that appear in response documents."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+
+    def dumps(obj: Any) -> bytes:
+        """Encode ``obj`` to JSON bytes."""
+        return orjson.dumps(obj, default=_default)
+
+else:
+    _encoder = json.JSONEncoder(separators=(",", ":"), default=_default)
+
+    def dumps(obj: Any) -> bytes:
+        """Encode ``obj`` to JSON bytes."""
+        return _encoder.encode(obj).encode()
+
+
+def response_row(
+    doc: Dict[str, Any], fields: Optional[Tuple[str, ...]] = None
+) -> Dict[str, Any]:
+    """Convert a (possibly projected) MongoDB document to its public shape.
+
+    With orjson, datetimes are left as-is for dumps() to encode natively.
+
+    Args:
+        doc: MongoDB document
+        fields: Public field names to include, or None for all
+    """
+    get = doc.get
+    if fields is None:
+        created_at = get("created_at")
+        updated_at = get("updated_at")
+        last_used_at = get("last_used_at")
+        if not _NATIVE_DATETIMES:
+            created_at = created_at.isoformat() if created_at else None
+            updated_at = updated_at.isoformat() if updated_at else None
+            last_used_at = last_used_at.isoformat() if last_used_at else None
+
+        row = {
+            "id": str(doc["_id"]),
+            "title": get("title"),
+            "content": get("content"),
+            "tags": get("tags") or [],
+            "user_id": get("user_id"),
+            "created_at": created_at,
+            "updated_at": updated_at,
+            "revision": get("revision", 0),
+            "usage_count": get("usage_count", 0),
+            "last_used_at": last_used_at,
+        }
+    else:
+        row = {}
+        for name in fields:
+            if name == "id":
+                row["id"] = str(doc["_id"])
+            elif name == "tags":
+                row["tags"] = get("tags") or []
+            elif name in ("revision", "usage_count"):
+                row[name] = get(name, 0)
+            elif name in _DATETIME_FIELDS and not _NATIVE_DATETIMES:
+                value = get(name)
+                row[name] = value.isoformat() if value else None
+            else:
+                row[name] = get(name)
+
+    # Present when content was cut to a preview by the projection
+    if "content_truncated" in doc:
+        row["content_truncated"] = doc["content_truncated"]
+    # Present on relevance-ranked search results
+    if "score" in doc:
+        row["score"] = doc["score"]
+    return row
+
+
+def response_rows(
+    docs: Iterable[Dict[str, Any]], fields: Optional[Tuple[str, ...]] = None
+) -> List[Dict[str, Any]]:
+    """Convert a cursor or list of documents with response_row()."""
+    return [response_row(doc, fields) for doc in docs]
+
+
+def json_response(obj: Any, status: int = 200):
+    """Build a Flask response whose body is ``obj`` encoded with dumps()."""
+    return current_app.response_class(dumps(obj), status=status, mimetype=JSON_MIMETYPE)
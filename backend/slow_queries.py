@@ -0,0 +1,234 @@
+"""
+Slow-query log with sampled explain plans
+
+A pymongo command listener logs every command slower than SLOW_QUERY_MS
+with the route and user of the Flask request that issued it, and the
+query shape: filter, sort and projection with every value replaced by
+"?", so the log carries no user data. For a sampled fraction of slow
+reads, explain("executionStats") is re-run on a background thread and the
+winning plan, keys/documents examined and server time are logged too,
+which tells a $text search from a gram or regex one and an index-backed
+sort from an in-memory SORT.
+"""
+
+import logging
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))  # <= 0 disables the log
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(
+    os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1")
+)
+# Explains waiting or running at once; further slow queries are not explained
+SLOW_QUERY_EXPLAIN_MAX_PENDING = int(os.getenv("SLOW_QUERY_EXPLAIN_MAX_PENDING", "4"))
+
+# Reads whose explain does not execute anything
+EXPLAINABLE_COMMANDS = {"find", "aggregate", "count", "distinct"}
+
+# Parts of a command that describe its shape; the rest (session, read
+# preference, cluster time...) is driver bookkeeping
+SHAPE_FIELDS = (
+    "filter",
+    "query",
+    "sort",
+    "projection",
+    "pipeline",
+    "key",
+    "limit",
+    "skip",
+    "hint",
+)
+
+# Not accepted inside an explain command
+_EXPLAIN_EXCLUDED = {
+    "lsid",
+    "txnNumber",
+    "autocommit",
+    "startTransaction",
+    "readConcern",
+    "writeConcern",
+}
+
+
+def redact(value):
+    """Return the shape of a query: keys and operators kept, values replaced."""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $and/$or branches and pipeline stages are shape; $in/$all items are values
+        if value and all(isinstance(item, dict) for item in value):
+            return [redact(item) for item in value]
+        return ["?"]
+    return "?"
+
+
+def query_shape(command) -> dict:
+    """Redacted filter, sort, projection etc. of a command."""
+    shape = {}
+    for field in SHAPE_FIELDS:
+        if field in command:
+            value = command[field]
+            # Sort and projection directions are shape, not data
+            shape[field] = (
+                value
+                if field in ("sort", "projection", "limit", "skip", "hint")
+                else redact(value)
+            )
+    return shape
+
+
+def _request_context() -> Tuple[str, str]:
+    """Route and user of the Flask request running on this thread, if any."""
+    try:
+        from flask import has_request_context, request
+    except ImportError:
+        return "-", "-"
+    if not has_request_context():
+        return "-", "-"
+    route = request.url_rule.rule if request.url_rule is not None else request.path
+    return f"{request.method} {route}", getattr(request, "user_id", None) or "-"
+
+
+def _summarize_explain(explain: dict) -> dict:
+    stats = explain.get("executionStats", {})
+    planner = explain.get("queryPlanner", {})
+    stages, indexes = [], []
+    stack = [planner.get("winningPlan")]
+    while stack:
+        node = stack.pop()
+        if not node:
+            continue
+        if "stage" in node:
+            stages.append(node["stage"])
+        if "indexName" in node:
+            indexes.append(node["indexName"])
+        # Slot-based execution (MongoDB 7+) wraps the tree in queryPlan
+        stack.extend(node.get("inputStages", []))
+        stack.append(node.get("inputStage"))
+        stack.append(node.get("queryPlan"))
+    return {
+        "plan": " > ".join(stages),
+        "indexes": indexes,
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "returned": stats.get("nReturned"),
+        "server_ms": stats.get("executionTimeMillis"),
+    }
+
+
+class _Explainer:
+    """Runs sampled explains on one background thread per process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(SLOW_QUERY_EXPLAIN_MAX_PENDING)
+
+    def reset(self):
+        """Forget the parent's thread pool in a forked child."""
+        self._lock = threading.Lock()
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(SLOW_QUERY_EXPLAIN_MAX_PENDING)
+
+    def submit(self, database_name: str, command: dict, context: str):
+        if not self._slots.acquire(blocking=False):
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="slow-query-explain"
+                )
+            executor = self._executor
+        try:
+            executor.submit(self._explain, database_name, command, context)
+        except RuntimeError:  # interpreter shutting down
+            self._slots.release()
+
+    def _explain(self, database_name: str, command: dict, context: str):
+        try:
+            from database import get_client
+
+            explain = get_client()[database_name].command(
+                "explain", command, verbosity="executionStats"
+            )
+            logging.warning(
+                "🐢 Slow query explain %s: %s", context, _summarize_explain(explain)
+            )
+        except Exception as e:
+            logging.warning("⚠️ Slow query explain failed for %s: %s", context, e)
+        finally:
+            self._slots.release()
+
+
+explainer = _Explainer()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=explainer.reset)
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Log commands slower than SLOW_QUERY_MS and explain a sample of them.
+
+    The started event holds the command; it is kept per thread, by request
+    id, until the matching succeeded or failed event gives the duration.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _pending(self) -> Dict[int, tuple]:
+        pending = getattr(self._local, "pending", None)
+        if pending is None:
+            pending = self._local.pending = {}
+        return pending
+
+    def started(self, event):
+        self._pending()[event.request_id] = (event.command, event.database_name)
+
+    def succeeded(self, event):
+        self._finished(event, "success")
+
+    def failed(self, event):
+        self._finished(event, "failure")
+
+    def _finished(self, event, outcome: str):
+        command, database_name = self._pending().pop(event.request_id, (None, None))
+        duration_ms = event.duration_micros / 1000
+        if command is None or duration_ms < SLOW_QUERY_MS:
+            return
+
+        route, user = _request_context()
+        collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = command.get("collection", "-")
+        context = f"{event.command_name} {collection} ({route})"
+        logging.warning(
+            "🐢 Slow query %.1fms %s user=%s outcome=%s shape=%s",
+            duration_ms,
+            context,
+            user,
+            outcome,
+            query_shape(command),
+        )
+
+        if (
+            outcome == "success"
+            and event.command_name in EXPLAINABLE_COMMANDS
+            and random.random() < SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+        ):
+            explained = {
+                key: value
+                for key, value in command.items()
+                if not key.startswith("$") and key not in _EXPLAIN_EXCLUDED
+            }
+            explainer.submit(database_name, explained, context)
+
+
+def slow_query_listeners() -> list:
+    """Listeners to pass to MongoClient(event_listeners=...)."""
+    return [SlowQueryListener()] if SLOW_QUERY_MS > 0 else []
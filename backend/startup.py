@@ -0,0 +1,124 @@
+"""
+Non-blocking startup: reach MongoDB and verify the schema in the background
+
+The server binds immediately; API requests get 503 and /api/health reports
+``ready: false`` until this process has reached the database and found (or
+brought) the schema at SCHEMA_VERSION.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from database import get_database
+from schema import (
+    SCHEMA_VERSION,
+    MigrationLockedError,
+    current_schema_version,
+    ensure_schema,
+)
+
+# Apply pending migrations on startup; when false, run `flask migrate`
+# and processes wait (not ready) until the schema is current.
+SCHEMA_AUTO_MIGRATE = os.getenv("SCHEMA_AUTO_MIGRATE", "true").lower() == "true"
+
+# Retries back off exponentially up to this many seconds, and never give up
+STARTUP_MAX_RETRY_DELAY = float(os.getenv("STARTUP_MAX_RETRY_DELAY", "30"))
+
+# Suggested client retry delay for 503 responses while starting up
+STARTUP_RETRY_AFTER_SECONDS = 1
+
+
+class SchemaOutdatedError(RuntimeError):
+    """Raised while the database schema is older than this code expects."""
+
+
+class Startup:
+    """Background database bootstrap and readiness flag for one process.
+
+    start() is idempotent per process, so it may be called from a gunicorn
+    post_fork hook, an app factory and a request hook alike; a forked
+    child starts its own bootstrap rather than trusting its parent's.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._ready = False
+        self._schema_version: Optional[int] = None
+        self._error: Optional[str] = None
+        self._attempts = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready and self._pid == os.getpid()
+
+    def start(self):
+        """Start the bootstrap thread unless this process already has."""
+        if self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._ready = False
+            self._schema_version = None
+            self._error = None
+            self._attempts = 0
+            threading.Thread(target=self._run, name="startup", daemon=True).start()
+
+    def _bootstrap(self) -> int:
+        db = get_database()
+        db.command("ping")
+
+        if SCHEMA_AUTO_MIGRATE:
+            return ensure_schema(db)
+
+        version = current_schema_version(db)
+        if version < SCHEMA_VERSION:
+            raise SchemaOutdatedError(
+                f"Schema version {version} is older than {SCHEMA_VERSION}; run `flask migrate`"
+            )
+        return version
+
+    def _run(self):
+        started = time.monotonic()
+        while True:
+            try:
+                self._schema_version = self._bootstrap()
+                self._error = None
+                self._ready = True
+                logging.info(
+                    f"✅ Ready (schema version {self._schema_version}) "
+                    f"after {time.monotonic() - started:.1f}s"
+                )
+                return
+            except Exception as e:
+                self._error = str(e)
+                delay = min(2**self._attempts, STARTUP_MAX_RETRY_DELAY)
+                self._attempts += 1
+                if isinstance(e, (MigrationLockedError, SchemaOutdatedError)):
+                    logging.info(
+                        f"⏳ Waiting for schema migration, retrying in {delay}s: {e}"
+                    )
+                else:
+                    logging.warning(
+                        f"⚠️  Database not ready (attempt {self._attempts}), retrying in {delay}s: {e}"
+                    )
+                time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "schema_version": self._schema_version,
+            "expected_schema_version": SCHEMA_VERSION,
+            "attempts": self._attempts,
+            "error": self._error,
+        }
+
+
+# Process-wide startup state shared by the Flask and ASGI apps
+startup = Startup()
@@ -0,0 +1,152 @@
+"""
+Streaming JSON / NDJSON encoding of MongoDB cursors
+"""
+
+import os
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Documents fetched per getMore; trades round trips against memory held
+# by the worker while a response is streaming.
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "200"))
+
+# Encoded output is flushed in chunks of about this size rather than one
+# write per document.
+STREAM_CHUNK_BYTES = int(os.getenv("STREAM_CHUNK_BYTES", str(64 * 1024)))
+
+
+def wants_ndjson(accept_mimetypes) -> bool:
+    """Return True if the client prefers NDJSON over a JSON array."""
+    return (
+        accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+        == NDJSON_MIMETYPE
+    )
+
+
+def prime_cursor(cursor) -> Iterator[Dict[str, Any]]:
+    """Fetch the first batch now so query errors surface before streaming.
+
+    Once the response headers are sent an error can no longer become a
+    proper status code, so callers get the exception (e.g. a missing text
+    index) here instead of halfway through the body.
+    """
+    first = next(cursor, None)
+    if first is None:
+        cursor.close()
+        return iter(())
+
+    def documents():
+        try:
+            yield first
+            yield from cursor
+        finally:
+            # Release the server-side cursor if the client disconnects
+            cursor.close()
+
+    return documents()
+
+
+async def prime_cursor_async(cursor) -> AsyncIterator[Dict[str, Any]]:
+    """prime_cursor() for a Motor cursor: fetch the first batch before streaming."""
+    try:
+        first = await cursor.next()
+    except StopAsyncIteration:
+        await cursor.close()
+        return _empty()
+
+    async def documents():
+        try:
+            yield first
+            async for doc in cursor:
+                yield doc
+        finally:
+            await cursor.close()
+
+    return documents()
+
+
+async def _empty():
+    return
+    yield
+
+
+def _chunked(pieces: Iterable[bytes]) -> Iterator[bytes]:
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def json_array_chunks(
+    docs: Iterable[Dict[str, Any]], serialize: Callable[[Dict[str, Any]], bytes]
+) -> Iterator[bytes]:
+    """Encode documents as a JSON array, one chunk at a time."""
+
+    def pieces():
+        yield b"["
+        for position, doc in enumerate(docs):
+            if position:
+                yield b","
+            yield serialize(doc)
+        yield b"]"
+
+    return _chunked(pieces())
+
+
+def ndjson_chunks(
+    docs: Iterable[Dict[str, Any]], serialize: Callable[[Dict[str, Any]], bytes]
+) -> Iterator[bytes]:
+    """Encode documents as newline-delimited JSON, one chunk at a time."""
+    return _chunked(serialize(doc) + b"\n" for doc in docs)
+
+
+async def _chunked_async(pieces: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    buffer = []
+    size = 0
+    async for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= STREAM_CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def json_array_chunks_async(
+    docs: AsyncIterable[Dict[str, Any]], serialize: Callable[[Dict[str, Any]], bytes]
+) -> AsyncIterator[bytes]:
+    """json_array_chunks() over an async iterator of documents."""
+
+    async def pieces():
+        yield b"["
+        first = True
+        async for doc in docs:
+            if not first:
+                yield b","
+            first = False
+            yield serialize(doc)
+        yield b"]"
+
+    return _chunked_async(pieces())
+
+
+def ndjson_chunks_async(
+    docs: AsyncIterable[Dict[str, Any]], serialize: Callable[[Dict[str, Any]], bytes]
+) -> AsyncIterator[bytes]:
+    """ndjson_chunks() over an async iterator of documents."""
+
+    async def pieces():
+        async for doc in docs:
+            yield serialize(doc) + b"\n"
+
+    return _chunked_async(pieces())
@@ -0,0 +1,256 @@
+"""
+In-memory per-user prefix index powering autocomplete suggestions
+"""
+
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_SUGGESTIONS = 5
+MAX_SUGGESTIONS = 20
+
+# Only the opening of the content is indexed; suggestions complete what the
+# user is starting to type, not arbitrary substrings.
+CONTENT_OPENING_CHARS = 80
+PREVIEW_CHARS = 120
+
+# Upper bound on index entries inspected per request, so a one-letter
+# prefix over a huge library still costs a bounded amount of work.
+MAX_SCAN = 512
+
+FIELD_WEIGHTS = {"title": 3, "tag": 2, "content": 1}
+
+SUGGEST_INDEX_MAX_USERS = int(os.getenv("SUGGEST_INDEX_MAX_USERS", "1000"))
+
+# How often a cached index re-checks the library version for writes made by
+# other worker processes.
+SUGGEST_INDEX_REVALIDATE_SECONDS = float(
+    os.getenv("SUGGEST_INDEX_REVALIDATE_SECONDS", "2")
+)
+
+
+def normalize(text: str) -> str:
+    """Normalize text for prefix matching (case-folded, single-spaced)."""
+    return " ".join(text.casefold().split())
+
+
+class PrefixIndex:
+    """Sorted (key, field, id) array over one user's responses.
+
+    Lookups bisect to the first key >= prefix and walk forward while keys
+    still start with it, so cost depends on the number of hits, not on the
+    library size.
+    """
+
+    def __init__(self, version: int):
+        self.version = version
+        self.checked_at = time.monotonic()
+        self._keys: List[Tuple[str, str, str]] = []
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, version: int, docs: Iterable[Dict[str, Any]]) -> "PrefixIndex":
+        """Build an index from a cursor, sorting all keys once."""
+        index = cls(version)
+        for doc in docs:
+            doc_id, entry = cls._entry_for(doc)
+            index._entries[doc_id] = entry
+            index._keys.extend(entry["keys"])
+        index._keys.sort()
+        return index
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _keys_for(doc_id: str, doc: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+        keys = []
+        title = normalize(doc.get("title") or "")
+        if title:
+            keys.append((title, "title", doc_id))
+
+        content = normalize((doc.get("content") or "")[:CONTENT_OPENING_CHARS])
+        if content:
+            keys.append((content, "content", doc_id))
+
+        for tag in doc.get("tags") or []:
+            tag = normalize(str(tag))
+            if tag:
+                keys.append((tag, "tag", doc_id))
+        return keys
+
+    @classmethod
+    def _entry_for(cls, doc: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        doc_id = str(doc["_id"])
+        created_at = doc.get("created_at")
+        return doc_id, {
+            "keys": cls._keys_for(doc_id, doc),
+            "title": doc.get("title"),
+            "preview": (doc.get("content") or "")[:PREVIEW_CHARS],
+            "tags": doc.get("tags") or [],
+            "created_at": created_at.timestamp() if created_at else 0.0,
+        }
+
+    def add(self, doc: Dict[str, Any]):
+        """Insert or replace a document in the index."""
+        doc_id, entry = self._entry_for(doc)
+
+        with self._lock:
+            self._remove(doc_id)
+            for key in entry["keys"]:
+                insort(self._keys, key)
+            self._entries[doc_id] = entry
+
+    def remove(self, doc_id: str):
+        """Remove a document from the index if present."""
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        entry = self._entries.pop(doc_id, None)
+        if entry is None:
+            return
+
+        for key in entry["keys"]:
+            pos = bisect_left(self._keys, key)
+            if pos < len(self._keys) and self._keys[pos] == key:
+                del self._keys[pos]
+
+    def search(
+        self, prefix: str, limit: int = DEFAULT_SUGGESTIONS
+    ) -> List[Dict[str, Any]]:
+        """Return the top ``limit`` responses with a key starting with ``prefix``.
+
+        Ranking: best matching field (title > tag > content opening), then
+        closest match (shortest key), then most recently created.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        best: Dict[str, Tuple[int, int, float, str]] = {}
+        with self._lock:
+            pos = bisect_left(self._keys, (prefix,))
+            end = min(len(self._keys), pos + MAX_SCAN)
+
+            while pos < end:
+                key, field, doc_id = self._keys[pos]
+                if not key.startswith(prefix):
+                    break
+
+                entry = self._entries[doc_id]
+                rank = (FIELD_WEIGHTS[field], -len(key), entry["created_at"], field)
+                if doc_id not in best or rank > best[doc_id]:
+                    best[doc_id] = rank
+                pos += 1
+
+            top = heapq.nlargest(limit, best.items(), key=lambda item: item[1])
+            entries = [(doc_id, rank, self._entries[doc_id]) for doc_id, rank in top]
+
+        return [
+            {
+                "id": doc_id,
+                "title": entry["title"],
+                "preview": entry["preview"],
+                "tags": entry["tags"],
+                "match": rank[3],
+            }
+            for doc_id, rank, entry in entries
+        ]
+
+
+class SuggestIndexRegistry:
+    """Bounded LRU of per-user PrefixIndex instances.
+
+    Indexes are built lazily from MongoDB on first use and kept current by
+    the write handlers. Each index remembers the library version it reflects;
+    when another process has written in the meantime the index is rebuilt.
+    """
+
+    def __init__(self, max_users: int = SUGGEST_INDEX_MAX_USERS):
+        self.max_users = max_users
+        self._indexes: "OrderedDict[str, PrefixIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        user_id: str,
+        load_version: Callable[[], int],
+        load_docs: Callable[[], Iterable[Dict[str, Any]]],
+    ) -> PrefixIndex:
+        """Return the user's index, building or revalidating it as needed.
+
+        Args:
+            user_id: Owner of the library
+            load_version: Returns the user's current library version
+            load_docs: Returns the user's documents (title, content, tags, created_at)
+        """
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+
+        if index is not None:
+            if time.monotonic() - index.checked_at < SUGGEST_INDEX_REVALIDATE_SECONDS:
+                return index
+            if load_version() == index.version:
+                index.checked_at = time.monotonic()
+                return index
+
+        # Build outside the lock; concurrent builders for one user are harmless.
+        index = PrefixIndex.build(load_version(), load_docs())
+
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def apply_changes(
+        self,
+        user_id: str,
+        new_version: int,
+        upserted: Iterable[Dict[str, Any]] = (),
+        deleted_ids: Iterable[str] = (),
+    ):
+        """Reflect one write (single or batch) in the user's index.
+
+        Args:
+            user_id: Owner of the library
+            new_version: Library version returned by the write's version bump
+            upserted: Created or updated documents
+            deleted_ids: Ids of deleted documents
+        """
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None:
+                return
+
+            if new_version != index.version + 1:
+                # Missed a write from another process: rebuild on next use.
+                del self._indexes[user_id]
+                return
+
+            for doc in upserted:
+                index.add(doc)
+            for doc_id in deleted_ids:
+                index.remove(str(doc_id))
+            index.version = new_version
+
+    def invalidate(self, user_id: Optional[str] = None):
+        """Drop one user's index, or all of them."""
+        with self._lock:
+            if user_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(user_id, None)
+
+
+# Process-wide registry shared by the Flask routes and DatabaseService
+suggest_indexes = SuggestIndexRegistry()
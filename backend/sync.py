@@ -0,0 +1,133 @@
+"""
+Incremental (delta) sync helpers for canned responses using MongoDB
+"""
+
+import base64
+import binascii
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ASCENDING
+from search import DOCUMENT_PROJECTION
+
+TOMBSTONES_COLLECTION = "deleted_responses"
+
+# Tombstones are kept this long; clients whose token is older must resync.
+TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+
+# Writes stamp updated_at before they commit, so a change can become visible
+# slightly after a concurrent sync has read past its timestamp. Re-sending a
+# short window of changes covers that; clients apply changes idempotently.
+SYNC_OVERLAP = timedelta(seconds=5)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class InvalidSyncTokenError(ValueError):
+    """Raised when a sync token cannot be decoded."""
+
+
+def encode_sync_token(timestamp: datetime) -> str:
+    """Build an opaque sync token for ``timestamp``."""
+    millis = (timestamp - _EPOCH) // timedelta(milliseconds=1)
+    raw = json.dumps({"t": millis}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_sync_token(token: str) -> datetime:
+    """Decode a token produced by encode_sync_token().
+
+    Raises:
+        InvalidSyncTokenError: If the token is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return _EPOCH + timedelta(milliseconds=int(data["t"]))
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidSyncTokenError("Invalid sync token")
+
+
+def ensure_sync_indexes(db):
+    """Create the indexes used by the changes feed and tombstone expiry."""
+    collection = db["canned_responses"]
+    collection.create_index(
+        [("user_id", ASCENDING), ("updated_at", ASCENDING)],
+        name="idx_canned_responses_user_updated_at",
+        background=True,
+    )
+
+    tombstones = db[TOMBSTONES_COLLECTION]
+    tombstones.create_index(
+        [("user_id", ASCENDING), ("deleted_at", ASCENDING)],
+        name="idx_deleted_responses_user_deleted_at",
+        background=True,
+    )
+    tombstones.create_index(
+        [("deleted_at", ASCENDING)],
+        name="idx_deleted_responses_ttl",
+        expireAfterSeconds=TOMBSTONE_RETENTION_DAYS * 24 * 3600,
+        background=True,
+    )
+
+
+def record_tombstones(
+    db,
+    user_id: Optional[str],
+    response_ids: Iterable[Any],
+    deleted_at: Optional[datetime] = None,
+):
+    """Record deletions so delta-syncing clients can drop the documents."""
+    deleted_at = deleted_at or datetime.utcnow()
+    tombstones = [
+        {"response_id": response_id, "user_id": user_id, "deleted_at": deleted_at}
+        for response_id in response_ids
+    ]
+    if tombstones:
+        db[TOMBSTONES_COLLECTION].insert_many(tombstones, ordered=False)
+
+
+def fetch_changes(
+    db, user_id: Optional[str], since: Optional[datetime]
+) -> Tuple[List[Dict[str, Any]], List[str], bool, datetime]:
+    """Fetch documents changed and deleted since ``since``.
+
+    Args:
+        db: MongoDB database instance
+        user_id: Owner to scope the feed to (None for unscoped data)
+        since: Timestamp decoded from the client's token, or None for a full sync
+
+    Returns:
+        Tuple of (changed documents, deleted ids, full_resync, new token timestamp).
+        ``full_resync`` is True when the client must replace its local copy,
+        either because it has no token or because tombstones it would need
+        have already expired.
+    """
+    now = datetime.utcnow()
+    base_query = {"user_id": user_id}
+
+    full_resync = since is None or since < now - timedelta(
+        days=TOMBSTONE_RETENTION_DAYS
+    )
+    if full_resync:
+        docs = list(
+            db["canned_responses"]
+            .find(base_query, DOCUMENT_PROJECTION)
+            .sort("updated_at", ASCENDING)
+        )
+        return docs, [], True, now
+
+    window_start = since - SYNC_OVERLAP
+    docs = list(
+        db["canned_responses"]
+        .find({**base_query, "updated_at": {"$gte": window_start}}, DOCUMENT_PROJECTION)
+        .sort("updated_at", ASCENDING)
+    )
+    tombstones = db[TOMBSTONES_COLLECTION].find(
+        {**base_query, "deleted_at": {"$gte": window_start}},
+        {"response_id": 1},
+    )
+    deleted = [str(t["response_id"]) for t in tombstones]
+    return docs, deleted, False, now
@@ -0,0 +1,82 @@
+"""
+Shared fixtures: the Flask app on an in-memory mongomock database
+
+No mongod is needed. Every test gets its own user, so tests stay independent
+although they share one database and the app's in-process caches.
+"""
+
+import os
+import sys
+import time
+import uuid
+
+import mongomock
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+os.environ.setdefault("DATABASE_URL", "mongodb://tests")
+# Enabled per test where admission is under test (see test_admission.py)
+os.environ.setdefault("ADMISSION_ENABLED", "false")
+
+import database  # noqa: E402
+
+database.MongoClient = lambda *args, **kwargs: mongomock.MongoClient()
+
+
+@pytest.fixture(scope="session")
+def app():
+    from app import create_app
+    from startup import startup
+
+    flask_app = create_app()
+    deadline = time.monotonic() + 30
+    while not startup.ready:
+        assert time.monotonic() < deadline, "database bootstrap did not finish"
+        time.sleep(0.01)
+    flask_app.testing = True
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def db(app):
+    return database.get_database()
+
+
+@pytest.fixture
+def headers_for():
+    """Authorization headers with a JWT for any user id."""
+    from auth import generate_jwt
+
+    return lambda user_id: {"Authorization": f"Bearer {generate_jwt(user_id)}"}
+
+
+@pytest.fixture
+def user():
+    return f"user-{uuid.uuid4().hex}"
+
+
+@pytest.fixture
+def headers(headers_for, user):
+    return headers_for(user)
+
+
+@pytest.fixture
+def create(client, headers):
+    """Create a response as the test's user and return its JSON."""
+
+    def create(title="Thanks", content="Thank you for reaching out", tags=None):
+        response = client.post(
+            "/api/responses",
+            json={"title": title, "content": content, "tags": tags or []},
+            headers=headers,
+        )
+        assert response.status_code == 201, response.json
+        return response.json
+
+    return create
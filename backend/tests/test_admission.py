@@ -0,0 +1,82 @@
+"""Per-user rate limits, concurrency caps and load shedding (admission.py)."""
+
+import time
+
+import admission
+import pytest
+from admission import AdmissionController, AdmissionRejected
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_ENABLED", True)
+    yield monkeypatch
+    admission.admission.reset()
+
+
+def test_rate_limit_is_429_with_retry_after(client, headers, enabled):
+    enabled.setattr(admission, "RATE_LIMIT_BURST", 2)
+    enabled.setattr(admission, "RATE_LIMIT_PER_SECOND", 0.5)
+
+    codes = [
+        client.get("/api/responses", headers=headers).status_code for _ in range(3)
+    ]
+
+    assert codes == [200, 200, 429]
+    response = client.get("/api/responses", headers=headers)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_rate_limit_is_per_user(client, headers, headers_for, enabled):
+    enabled.setattr(admission, "RATE_LIMIT_BURST", 1)
+    enabled.setattr(admission, "RATE_LIMIT_PER_SECOND", 0.01)
+
+    assert client.get("/api/responses", headers=headers).status_code == 200
+    assert client.get("/api/responses", headers=headers).status_code == 429
+    assert client.get("/api/responses", headers=headers_for("other")).status_code == 200
+
+
+def test_queued_too_long_is_503(client, headers, enabled):
+    enabled.setattr(admission, "SHED_MAX_QUEUE_MS", 100)
+    queued = {**headers, "X-Request-Start": f"t={time.time() - 5:.3f}"}
+
+    response = client.get("/api/responses", headers=queued)
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert client.get("/api/responses", headers=headers).status_code == 200
+
+
+def test_requests_release_their_slot(client, headers, enabled):
+    enabled.setattr(admission, "USER_MAX_IN_FLIGHT", 1)
+
+    for _ in range(3):
+        assert client.get("/api/responses", headers=headers).status_code == 200
+    assert admission.admission.stats()["in_flight"] == 0
+
+
+def test_concurrency_cap(enabled):
+    enabled.setattr(admission, "USER_MAX_IN_FLIGHT", 2)
+    controller = AdmissionController()
+
+    releases = [controller.admit("u"), controller.admit("u")]
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit("u")
+    assert rejected.value.status == 429
+
+    controller.admit("other")()
+    releases[0]()
+    releases[0]()  # a second call is a no-op
+    controller.admit("u")
+    assert controller.stats()["in_flight"] == 2
+
+
+def test_shed_when_process_is_full(enabled):
+    enabled.setattr(admission, "SHED_MAX_IN_FLIGHT", 1)
+    controller = AdmissionController()
+
+    controller.admit("a")
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit("b")
+    assert rejected.value.status == 503
@@ -0,0 +1,137 @@
+"""POST /api/responses/batch: per-operation status codes and validation."""
+
+from bson import ObjectId
+
+URL = "/api/responses/batch"
+
+
+def statuses(response):
+    return [result["status"] for result in response.json["results"]]
+
+
+def test_mixed_batch(client, headers, create):
+    updated = create(title="Old")
+    deleted = create()
+
+    response = client.post(
+        URL,
+        json={
+            "operations": [
+                {"op": "create", "title": "New", "content": "c", "tags": ["x"]},
+                {"op": "update", "id": updated["id"], "title": "Renamed"},
+                {"op": "delete", "id": deleted["id"]},
+            ]
+        },
+        headers=headers,
+    )
+
+    assert response.status_code == 200
+    assert statuses(response) == [201, 200, 204]
+    created = response.json["results"][0]["response"]
+    assert (
+        client.get(f"/api/responses/{created['id']}", headers=headers).json == created
+    )
+    assert response.json["results"][1]["response"]["title"] == "Renamed"
+    assert (
+        client.get(f"/api/responses/{deleted['id']}", headers=headers).status_code
+        == 404
+    )
+
+
+def test_missing_id_is_400_not_404(client, headers):
+    response = client.post(
+        URL, json={"operations": [{"op": "delete"}]}, headers=headers
+    )
+
+    assert statuses(response) == [400]
+    assert response.json["results"][0]["error"] == "id is required"
+
+
+def test_malformed_operations_are_400(client, headers):
+    response = client.post(
+        URL,
+        json={
+            "ordered": False,
+            "operations": [
+                "not an object",
+                {"op": "rename"},
+                {"op": "update", "id": 5, "title": "x"},
+                {"op": "update", "id": "not-an-id", "title": "x"},
+                {"op": "create", "title": "t"},
+                {"op": "create", "title": "t", "content": "c", "tags": "x"},
+                {"op": "create", "title": "t", "content": "c", "tags": [1]},
+                {"op": "update", "id": str(ObjectId())},
+            ],
+        },
+        headers=headers,
+    )
+
+    assert statuses(response) == [400] * 8
+
+
+def test_null_tags_are_stored_as_empty(client, headers):
+    response = client.post(
+        URL,
+        json={
+            "operations": [{"op": "create", "title": "t", "content": "c", "tags": None}]
+        },
+        headers=headers,
+    )
+
+    assert statuses(response) == [201]
+    assert response.json["results"][0]["response"]["tags"] == []
+
+
+def test_unknown_and_foreign_ids_are_404(client, headers, headers_for, create):
+    foreign = create()
+    response = client.post(
+        URL,
+        json={
+            "ordered": False,
+            "operations": [
+                {"op": "delete", "id": str(ObjectId())},
+                {"op": "update", "id": foreign["id"], "title": "x"},
+            ],
+        },
+        headers=headers_for("someone-else"),
+    )
+
+    assert statuses(response) == [404, 404]
+    assert (
+        client.get(f"/api/responses/{foreign['id']}", headers=headers).json["title"]
+        == foreign["title"]
+    )
+
+
+def test_ordered_batch_stops_at_first_failure(client, headers):
+    response = client.post(
+        URL,
+        json={
+            "operations": [
+                {"op": "create", "title": "a", "content": "a"},
+                {"op": "delete"},
+                {"op": "create", "title": "b", "content": "b"},
+            ]
+        },
+        headers=headers,
+    )
+
+    results = response.json["results"]
+    assert [result["status"] for result in results[:2]] == [201, 400]
+    assert len(client.get("/api/responses", headers=headers).json) == 1
+
+
+def test_operations_must_be_a_list(client, headers):
+    assert client.post(URL, json={"operations": {}}, headers=headers).status_code == 400
+    assert client.post(URL, json={}, headers=headers).status_code == 400
+
+
+def test_too_many_operations(client, headers, monkeypatch):
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "BATCH_MAX_OPERATIONS", 2)
+    operations = [{"op": "create", "title": "t", "content": "c"}] * 3
+
+    response = client.post(URL, json={"operations": operations}, headers=headers)
+
+    assert response.status_code == 400
@@ -0,0 +1,153 @@
+"""Status codes of the single-response endpoints, ETags and If-Match."""
+
+
+def test_create_and_get(client, headers, create):
+    created = create(tags=["greeting"])
+
+    response = client.get(f"/api/responses/{created['id']}", headers=headers)
+
+    assert response.status_code == 200
+    assert response.json == created
+    assert response.headers["ETag"] == f"\"{created['id']}-1\""
+
+
+def test_create_requires_title_and_content(client, headers):
+    response = client.post("/api/responses", json={"title": "x"}, headers=headers)
+
+    assert response.status_code == 400
+
+
+def test_requires_auth(client):
+    assert client.get("/api/responses").status_code == 401
+
+
+def test_invalid_id_is_400(client, headers):
+    for method in (client.get, client.delete):
+        assert method("/api/responses/not-an-id", headers=headers).status_code == 400
+    response = client.patch(
+        "/api/responses/not-an-id", json={"title": "x"}, headers=headers
+    )
+    assert response.status_code == 400
+
+
+def test_other_users_response_is_404(client, headers_for, create):
+    created = create()
+    other = headers_for("someone-else")
+
+    assert (
+        client.get(f"/api/responses/{created['id']}", headers=other).status_code == 404
+    )
+    response = client.patch(
+        f"/api/responses/{created['id']}", json={"title": "x"}, headers=other
+    )
+    assert response.status_code == 404
+    assert (
+        client.delete(f"/api/responses/{created['id']}", headers=other).status_code
+        == 404
+    )
+
+
+def test_get_revalidates_with_304(client, headers, create):
+    created = create()
+    url = f"/api/responses/{created['id']}"
+    etag = client.get(url, headers=headers).headers["ETag"]
+
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.data == b""
+
+
+def test_stale_if_none_match_returns_body(client, headers, create):
+    created = create()
+    url = f"/api/responses/{created['id']}"
+    etag = client.get(url, headers=headers).headers["ETag"]
+    client.patch(url, json={"title": "Changed"}, headers=headers)
+
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.json["title"] == "Changed"
+    assert response.headers["ETag"] != etag
+
+
+def test_patch_with_current_if_match(client, headers, create):
+    created = create()
+    url = f"/api/responses/{created['id']}"
+
+    response = client.patch(
+        url,
+        json={"title": "Updated"},
+        headers={**headers, "If-Match": f"\"{created['id']}-1\""},
+    )
+
+    assert response.status_code == 200
+    assert response.json["revision"] == 2
+    assert response.headers["ETag"] == f"\"{created['id']}-2\""
+
+
+def test_patch_with_stale_if_match_is_412(client, headers, create):
+    created = create()
+    url = f"/api/responses/{created['id']}"
+    stale = {**headers, "If-Match": f"\"{created['id']}-1\""}
+    client.patch(url, json={"title": "First"}, headers=stale)
+
+    response = client.patch(url, json={"title": "Second"}, headers=stale)
+
+    assert response.status_code == 412
+    assert client.get(url, headers=headers).json["title"] == "First"
+
+
+def test_patch_without_data_is_400(client, headers, create):
+    created = create()
+
+    response = client.patch(f"/api/responses/{created['id']}", json={}, headers=headers)
+
+    assert response.status_code == 400
+
+
+def test_delete(client, headers, create):
+    created = create()
+    url = f"/api/responses/{created['id']}"
+
+    assert client.delete(url, headers=headers).status_code == 204
+    assert client.get(url, headers=headers).status_code == 404
+    assert client.delete(url, headers=headers).status_code == 404
+
+
+def test_listing_revalidates_until_a_write(client, headers, create):
+    create()
+    etag = client.get("/api/responses", headers=headers).headers["ETag"]
+    conditional = {**headers, "If-None-Match": etag}
+
+    assert client.get("/api/responses", headers=conditional).status_code == 304
+
+    create(title="Another")
+    response = client.get("/api/responses", headers=conditional)
+    assert response.status_code == 200
+    assert len(response.json) == 2
+
+
+def test_listing_includes_usage_counters(client, headers, create):
+    create()
+
+    row = client.get("/api/responses", headers=headers).json[0]
+
+    assert row["usage_count"] == 0
+    assert row["last_used_at"] is None
+
+
+def test_search_returns_every_match_by_default(client, headers, create):
+    create(title="Regards one")
+    create(title="Regards two")
+    create(title="Unrelated")
+
+    response = client.get("/api/responses?search=regards", headers=headers)
+
+    assert response.status_code == 200
+    assert sorted(row["title"] for row in response.json) == [
+        "Regards one",
+        "Regards two",
+    ]
+    assert "score" not in response.json[0]
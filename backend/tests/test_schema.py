@@ -0,0 +1,32 @@
+"""The startup migrations create the indexes the queries rely on.
+
+Whether MongoDB actually picks them is checked against a real server by
+benchmarks/check_query_plans.py.
+"""
+
+from schema import SCHEMA_VERSION, current_schema_version
+from search import SEARCH_FIELDS
+
+
+def test_schema_is_current(db):
+    assert current_schema_version(db) == SCHEMA_VERSION
+
+
+def test_response_indexes(db):
+    indexes = db["canned_responses"].index_information()
+
+    expected = {
+        "idx_canned_responses_user_created_at",
+        "idx_canned_responses_user_updated_at",
+        "idx_canned_responses_user_usage",
+    } | {f"idx_canned_responses_user_grams_{field}" for field in SEARCH_FIELDS}
+    assert expected <= set(indexes)
+    # Replaced by the compound indexes above
+    assert "idx_canned_responses_user_id" not in indexes
+
+
+def test_tombstone_index(db):
+    assert (
+        "idx_deleted_responses_user_deleted_at"
+        in db["deleted_responses"].index_information()
+    )
@@ -0,0 +1,51 @@
+"""GET /api/responses/changes: snapshots, deltas and tombstones."""
+
+URL = "/api/responses/changes"
+
+
+def test_full_snapshot_without_token(client, headers, create):
+    created = create()
+
+    response = client.get(URL, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json["full_resync"] is True
+    assert [row["id"] for row in response.json["changes"]] == [created["id"]]
+    assert response.json["deleted"] == []
+    assert response.json["sync_token"]
+
+
+def test_delta_reports_changes_and_deletions(client, headers, create):
+    kept = create(title="Kept")
+    removed = create(title="Removed")
+    token = client.get(URL, headers=headers).json["sync_token"]
+
+    client.patch(
+        f"/api/responses/{kept['id']}", json={"title": "Edited"}, headers=headers
+    )
+    client.delete(f"/api/responses/{removed['id']}", headers=headers)
+    response = client.get(URL, query_string={"since": token}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json["full_resync"] is False
+    changed = {row["id"]: row["title"] for row in response.json["changes"]}
+    assert changed[kept["id"]] == "Edited"
+    assert removed["id"] not in changed
+    assert response.json["deleted"] == [removed["id"]]
+
+
+def test_delta_is_scoped_to_the_user(client, headers, headers_for, create):
+    token = client.get(URL, headers=headers).json["sync_token"]
+    create()
+
+    response = client.get(
+        URL, query_string={"since": token}, headers=headers_for("someone-else")
+    )
+
+    assert response.json["changes"] == []
+
+
+def test_invalid_token_is_400(client, headers):
+    response = client.get(URL, query_string={"since": "not a token"}, headers=headers)
+
+    assert response.status_code == 400
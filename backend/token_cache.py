@@ -0,0 +1,189 @@
+"""
+In-process cache of verified JWT payloads, with token and per-user revocation
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+AUTH_CACHE_ENABLED = os.getenv("AUTH_CACHE_ENABLED", "true").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+AUTH_CACHE_MAX_TOKENS = int(os.getenv("AUTH_CACHE_MAX_TOKENS", "10000"))
+# Upper bound on how long a verified token is trusted without re-checking
+# its signature, regardless of how far away its exp is.
+AUTH_CACHE_MAX_TTL_SECONDS = float(os.getenv("AUTH_CACHE_MAX_TTL_SECONDS", "3600"))
+
+
+class TokenRevokedError(ValueError):
+    """Raised when a token, or every token of its user, has been revoked."""
+
+
+class TokenCache:
+    """Bounded LRU cache of verified JWT payloads, evicted at ``exp``.
+
+    Entries are keyed by the SHA-256 digest of the token, so raw tokens are
+    never kept in memory. A cached token is trusted until its ``exp`` (or
+    AUTH_CACHE_MAX_TTL_SECONDS, whichever comes first); after that it goes
+    through the full decode again, which reports the expiry.
+
+    Revocation is process-local: revoke() and revoke_user() drop matching
+    entries and reject those tokens until they would have expired anyway.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = AUTH_CACHE_ENABLED,
+        max_tokens: int = AUTH_CACHE_MAX_TOKENS,
+        max_ttl_seconds: float = AUTH_CACHE_MAX_TTL_SECONDS,
+    ):
+        self.enabled = enabled
+        self.max_tokens = max_tokens
+        self.max_ttl_seconds = max_ttl_seconds
+
+        # digest -> (payload, expires_at as a unix timestamp)
+        self._entries: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = (
+            OrderedDict()
+        )
+        # digest -> exp of a revoked token; user_id -> tokens issued before this are revoked
+        self._revoked_tokens: Dict[bytes, float] = {}
+        self._revoked_users: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revocations = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def verify(
+        self, token: str, decode: Callable[[str], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Return the payload of ``token``, decoding it only on a cache miss.
+
+        Args:
+            token: Raw JWT
+            decode: Verifies the signature and expiry and returns the payload;
+                raises ValueError for invalid tokens, which are never cached
+
+        Returns:
+            The verified payload; it is shared between requests, so callers
+            must not modify it
+
+        Raises:
+            ValueError: If ``decode`` rejects the token
+            TokenRevokedError: If the token has been revoked
+        """
+        digest = self._digest(token)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[digest]
+            self.misses += 1
+
+            if digest in self._revoked_tokens:
+                raise TokenRevokedError("Token has been revoked")
+
+        payload = decode(token)
+
+        with self._lock:
+            if self._is_user_revoked(payload):
+                raise TokenRevokedError("Token has been revoked")
+
+            if self.enabled:
+                expires_at = now + self.max_ttl_seconds
+                if isinstance(payload.get("exp"), (int, float)):
+                    expires_at = min(expires_at, payload["exp"])
+                self._entries[digest] = (payload, expires_at)
+
+                while len(self._entries) > self.max_tokens:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+
+        return payload
+
+    def revoke(self, token: str, expires_at: Optional[float] = None):
+        """Reject ``token`` from now on, in this process.
+
+        Args:
+            token: Raw JWT to revoke
+            expires_at: Its ``exp``; the revocation is forgotten afterwards.
+                Defaults to the cached entry's expiry, or the maximum TTL.
+        """
+        digest = self._digest(token)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.pop(digest, None)
+            if expires_at is None:
+                expires_at = (
+                    entry[1] if entry is not None else now + self.max_ttl_seconds
+                )
+            self._revoked_tokens[digest] = expires_at
+            self.revocations += 1
+
+            # Keep the deny list bounded by dropping revocations that expired
+            for revoked, revoked_until in list(self._revoked_tokens.items()):
+                if revoked_until <= now:
+                    del self._revoked_tokens[revoked]
+
+    def revoke_user(self, user_id: Hashable, issued_before: Optional[float] = None):
+        """Reject every token of ``user_id`` issued before ``issued_before``.
+
+        Tokens without an ``iat`` claim are rejected too. Defaults to now,
+        i.e. signs the user out of every existing session in this process.
+        """
+        cutoff = time.time() if issued_before is None else issued_before
+
+        with self._lock:
+            self._revoked_users[user_id] = cutoff
+            for digest, (payload, _) in list(self._entries.items()):
+                if self._is_user_revoked(payload):
+                    del self._entries[digest]
+            self.revocations += 1
+
+    def clear(self):
+        """Drop all cached tokens and revocations."""
+        with self._lock:
+            self._entries.clear()
+            self._revoked_tokens.clear()
+            self._revoked_users.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters suitable for health/metrics output."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "revocations": self.revocations,
+            }
+
+    def _is_user_revoked(self, payload: Dict[str, Any]) -> bool:
+        cutoff = self._revoked_users.get(payload.get("user_id"))
+        if cutoff is None:
+            return False
+        issued_at = payload.get("iat")
+        return not isinstance(issued_at, (int, float)) or issued_at < cutoff
+
+
+# Process-wide cache used by require_auth
+token_cache = TokenCache()
@@ -0,0 +1,181 @@
+"""
+Write-behind usage counters for canned responses
+
+POST /api/responses/<id>/use only adds to an in-memory buffer. A
+background thread flushes the buffer every USAGE_FLUSH_INTERVAL_SECONDS
+(or sooner once USAGE_FLUSH_MAX_PENDING responses are pending) as one
+unordered bulk_write: an ``$inc`` of usage_count and a ``$max`` of
+last_used_at per response, however many uses were recorded for it. Each
+flush then bumps the usage version (not the library version) of every user
+it touched, in one more bulk_write.
+
+Uses buffered when a process dies without flushing are lost; usage is a
+ranking signal, not a ledger.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+USAGE_FLUSH_INTERVAL_SECONDS = float(os.getenv("USAGE_FLUSH_INTERVAL_SECONDS", "5"))
+USAGE_FLUSH_MAX_PENDING = int(os.getenv("USAGE_FLUSH_MAX_PENDING", "1000"))
+# A failed flush is retried with the next one; beyond this many pending
+# responses, new uses are dropped until MongoDB is back
+USAGE_MAX_BUFFERED = int(os.getenv("USAGE_MAX_BUFFERED", "100000"))
+
+# (user_id, response _id) -> [uses, last used at]
+_Pending = Dict[Tuple[str, ObjectId], List]
+
+
+class UsageBuffer:
+    """Per-process buffer of response uses, flushed by a background thread.
+
+    The flusher starts with the first recorded use in each process, so a
+    forked worker runs its own rather than relying on its parent's.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Start empty, without a flusher (also used in a forked child)."""
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending: _Pending = {}
+        self._pid: Optional[int] = None
+        self.flushed = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    def record(
+        self, user_id: str, response_id: ObjectId, used_at: Optional[datetime] = None
+    ):
+        """Count one use of ``response_id`` by its owner ``user_id``."""
+        if self._pid != os.getpid():
+            self._start()
+
+        used_at = used_at or datetime.utcnow()
+        key = (user_id, response_id)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                entry[0] += 1
+                if used_at > entry[1]:
+                    entry[1] = used_at
+            elif len(self._pending) >= USAGE_MAX_BUFFERED:
+                self.dropped += 1
+                return
+            else:
+                self._pending[key] = [1, used_at]
+            full = len(self._pending) >= USAGE_FLUSH_MAX_PENDING
+
+        if full:
+            self._wake.set()
+
+    def _start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="usage-flush", daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(USAGE_FLUSH_INTERVAL_SECONDS)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all buffered uses to MongoDB now.
+
+        Returns:
+            Number of responses updated
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            from database import get_database
+            from library_version import bump_usage_versions
+            from repository import RESPONSES_COLLECTION
+
+            db = get_database()
+            requests = [
+                UpdateOne(
+                    {"_id": response_id, "user_id": user_id},
+                    {"$inc": {"usage_count": uses}, "$max": {"last_used_at": used_at}},
+                )
+                for (user_id, response_id), (uses, used_at) in pending.items()
+            ]
+            try:
+                modified = (
+                    db[RESPONSES_COLLECTION]
+                    .bulk_write(requests, ordered=False)
+                    .modified_count
+                )
+            except BulkWriteError as e:
+                # Partially applied: retrying would count some uses twice
+                self.failed_flushes += 1
+                modified = e.details.get("nModified", 0)
+                logging.warning(
+                    f"⚠️  Usage flush partially failed: {e.details.get('writeErrors', [])[:1]}"
+                )
+            except PyMongoError as e:
+                self.failed_flushes += 1
+                self._restore(pending)
+                logging.warning(
+                    f"⚠️  Usage flush of {len(pending)} responses failed, will retry: {e}"
+                )
+                return 0
+
+            self.flushed += modified
+
+            # Only listings showing or sorted by usage depend on this version;
+            # other ETags, cached results and suggestion indexes stay valid
+            try:
+                bump_usage_versions(db, {user_id for user_id, _ in pending})
+            except PyMongoError as e:
+                logging.warning(f"⚠️  Usage version bump after usage flush failed: {e}")
+            return modified
+
+    def _restore(self, pending: _Pending):
+        """Merge uses from a failed flush back into the buffer."""
+        with self._lock:
+            for key, (uses, used_at) in pending.items():
+                entry = self._pending.get(key)
+                if entry is None:
+                    self._pending[key] = [uses, used_at]
+                else:
+                    entry[0] += uses
+                    entry[1] = max(entry[1], used_at)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+# Process-wide buffer shared by every request handler
+usage_buffer = UsageBuffer()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=usage_buffer.reset)
+
+# Graceful worker shutdown (e.g. gunicorn's max_requests recycling); a
+# process that recorded nothing has nothing to flush
+atexit.register(usage_buffer.flush)
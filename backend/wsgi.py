@@ -0,0 +1,18 @@
+"""
+Production WSGI entry point
+
+Served by gunicorn with the settings in gunicorn.conf.py:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+import logging
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+from app import create_app
+
+# Each worker starts its own database bootstrap after the fork (gunicorn's
+# post_fork hook, or its first request under other servers)
+app = create_app(start=False)
@@ -1,4 +1,5 @@
 // Background service worker for Canner
+import { getResponses } from "../utils/api";
 
 console.log("Canner: Background script loaded");
 
@@ -63,18 +64,12 @@ chrome.commands?.onCommand.addListener((command) => {
 });
 
 // Sync with backend periodically
+// getResponses() pulls only the changes since the stored sync token and keeps
+// the cached list and its token in step.
 setInterval(async () => {
   try {
-    const result = await fetch("http://localhost:5000/api/health");
-    if (result.ok) {
-      // Backend is available, sync data
-      const responses = await fetch("http://localhost:5000/api/responses");
-      if (responses.ok) {
-        const data = await responses.json();
-        chrome.storage.local.set({ responses: data });
-        console.log("Synced with backend:", data.length, "responses");
-      }
-    }
+    const data = await getResponses();
+    console.log("Synced with backend:", data.length, "responses");
   } catch (error) {
     // Backend not available, continue using local storage
   }
@@ -1,6 +1,7 @@
 // Canner content script — injects helper UI into social sites
-// Note: Can't use ES6 imports in content scripts injected this way
-// Config will be injected via webpack DefinePlugin
+// Imports are bundled into content.js by webpack, so the script stays
+// self-contained. Config is injected via webpack DefinePlugin
+import { getResponses } from "../utils/api";
 
 declare const __API_URL__: string;
 
@@ -2059,45 +2060,10 @@ async function deleteResponse(id: string): Promise<void> {
 }
 
 // Fetch responses from backend or Chrome storage
+// Delegates to getResponses() so the delta sync token stays in step with the
+// cached list.
 async function fetchResponses(): Promise<any[]> {
-  try {
-    // Get JWT token from storage
-    const storage = await chrome.storage.local.get(['app_jwt_token']);
-    const token = storage.app_jwt_token;
-    
-    if (!token) {
-      console.log("Canner: No auth token, using local storage");
-      // Fallback to Chrome storage
-      return new Promise((resolve) => {
-        chrome.storage.local.get(["responses"], (result) => {
-          resolve(result.responses || []);
-        });
-      });
-    }
-    
-    // Try backend with authentication
-    const response = await fetch(`${CONFIG.API_URL}/api/responses`, {
-      headers: {
-        'Authorization': `Bearer ${token}`
-      }
-    });
-    
-    if (response.ok) {
-      const data = await response.json();
-      // Cache in Chrome storage
-      chrome.storage.local.set({ responses: data });
-      return data;
-    }
-  } catch (error) {
-    console.log("Canner: Backend not available, using local storage");
-  }
-
-  // Fallback to Chrome storage
-  return new Promise((resolve) => {
-    chrome.storage.local.get(["responses"], (result) => {
-      resolve(result.responses || []);
-    });
-  });
+  return getResponses();
 }
 
 // Insert text into any type of input box
@@ -12,6 +12,13 @@ export interface CannedMessage {
   created_at?: string;
 }
 
+export interface ResponseChanges {
+  changes: CannedMessage[];
+  deleted: string[];
+  full_resync: boolean;
+  sync_token: string;
+}
+
 export interface AuthState {
   app_jwt_token: string | null;
   user_id: string | null;
@@ -57,6 +64,8 @@ export async function clearAuth(): Promise<void> {
       // User data
       'responses',
       'cannedMessages',
+      'responsesSyncToken',
+      'cannedMessagesSyncToken',
       // Welcome page tracking
       'welcomePageViewed',
       'welcomePageViewedAt',
@@ -116,21 +125,77 @@ async function authenticatedFetch(url: string, options: RequestInit = {}): Promi
   return response;
 }
 
+// ==================== Delta Sync Helpers ====================
+
+/**
+ * Merge a delta-sync reply from /api/responses/changes into a cached list
+ */
+function applyChanges(cached: CannedMessage[], delta: ResponseChanges): CannedMessage[] {
+  const byId = new Map<string, CannedMessage>();
+
+  if (!delta.full_resync) {
+    cached.forEach((message) => {
+      if (message.id) byId.set(message.id, message);
+    });
+  }
+
+  delta.deleted.forEach((id) => byId.delete(id));
+  delta.changes.forEach((message) => {
+    if (message.id) byId.set(message.id, message);
+  });
+
+  // Newest first, matching the order of /api/responses
+  return Array.from(byId.values()).sort((a, b) =>
+    (b.created_at || '').localeCompare(a.created_at || '')
+  );
+}
+
+/**
+ * Build the changes feed URL for a cached list, resuming from its sync token
+ * when the cached copy is still present
+ */
+async function changesUrl(storageKey: string): Promise<{ url: string; cached: CannedMessage[] }> {
+  const tokenKey = `${storageKey}SyncToken`;
+  const stored = await chrome.storage.local.get([storageKey, tokenKey]);
+  const cached: CannedMessage[] = stored[storageKey] || [];
+  const token: string | undefined = stored[tokenKey];
+
+  const query = token && stored[storageKey] ? `?since=${encodeURIComponent(token)}` : '';
+  return { url: `${BACKEND_URL}/api/responses/changes${query}`, cached };
+}
+
+/**
+ * Apply a changes feed reply and persist the merged list with its new token
+ */
+async function storeChanges(
+  storageKey: string,
+  cached: CannedMessage[],
+  delta: ResponseChanges
+): Promise<CannedMessage[]> {
+  const data = applyChanges(cached, delta);
+  await chrome.storage.local.set({
+    [storageKey]: data,
+    [`${storageKey}SyncToken`]: delta.sync_token,
+  });
+  return data;
+}
+
 // ==================== Canned Messages / Templates API ====================
 
 /**
  * Fetch user-specific canned messages from the backend
+ * Only changes since the last sync are transferred; the full list lives
+ * in Chrome storage.
  * REQUIRES AUTHENTICATION
  */
 export async function getCannedMessages(): Promise<CannedMessage[]> {
   try {
-    const response = await authenticatedFetch(`${BACKEND_URL}/api/responses`);
+    const { url, cached } = await changesUrl('cannedMessages');
+    const response = await authenticatedFetch(url);
     
     if (response.ok) {
-      const data = await response.json();
-      // Cache in Chrome storage
-      chrome.storage.local.set({ cannedMessages: data });
-      return data;
+      const delta: ResponseChanges = await response.json();
+      return await storeChanges('cannedMessages', cached, delta);
     }
     
     throw new Error('Failed to fetch canned messages');
@@ -174,18 +239,18 @@ export async function getResponses(): Promise<CannedMessage[]> {
       });
     }
     
-    // Try backend with authentication
-    const response = await fetch(`${BACKEND_URL}/api/responses`, {
+    // Try backend with authentication, fetching only what changed
+    const { url, cached } = await changesUrl('responses');
+    const response = await fetch(url, {
       headers: {
         'Authorization': `Bearer ${token}`
       }
     });
     
     if (response.ok) {
-      const data = await response.json();
-      // Cache in Chrome storage
-      chrome.storage.local.set({ responses: data });
-      return data;
+      const delta: ResponseChanges = await response.json();
+      // Merge into the Chrome storage cache
+      return await storeChanges('responses', cached, delta);
     }
   } catch (error) {
     console.log("Backend not available, using local storage");